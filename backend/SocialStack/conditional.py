@@ -0,0 +1,54 @@
+"""
+ETag / If-None-Match support for endpoints that clients poll.
+
+Validators are built from change versions that every process sees: the
+social.cache namespaces in the shared cache, or values read from the
+database (a user's profile_version), plus whatever the viewer changes in
+the payload. A poll whose If-None-Match still matches is answered with 304
+before the response body, and its queries, are built.
+
+Versions kept in a process-local cache (LocMem) would differ between
+workers and hand out stale 304s, so validators that need the cache are
+not sent at all there (see social.cache.feed_etag).
+"""
+import hashlib
+from django.utils.cache import get_conditional_response, patch_cache_control
+from SocialStack import metrics
+
+
+def make_etag(request, *parts):
+    """
+    Weak ETag over `parts` and the negotiated media type.
+
+    Weak because the same versions can be sent as different bytes
+    (compression, renderer), which is all a weak validator promises.
+    """
+    parts = (getattr(request, 'accepted_media_type', ''),) + parts
+    digest = hashlib.md5(":".join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return f'W/"{digest}"'
+
+
+def conditional_response(request, etag, build_response):
+    """
+    Returns 304 Not Modified when the request's If-None-Match matches `etag`,
+    otherwise `build_response()` with the ETag attached. A None `etag`
+    (no trustworthy validator) always builds the response.
+
+    Compute `etag` before building: a write that lands in between then only
+    costs the client one extra full response, never a stale 304.
+    """
+    if etag is None:
+        return build_response()
+
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response['ETag'] = etag
+        metrics.buffered.incr("http.not_modified")
+        return response
+
+    response = build_response()
+    if response.status_code == 200:
+        response['ETag'] = etag
+        # Per-user data: browsers may keep it but must revalidate every time
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
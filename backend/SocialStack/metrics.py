@@ -0,0 +1,75 @@
+import atexit
+import threading
+import time
+from collections import Counter
+from configuration import Config
+from django.core.cache import cache
+
+# Counters live in the Django cache. With a shared backend (Redis) every web
+# and worker process adds to one total; with a process-local one (LocMem)
+# each process only counts its own events, which other processes such as
+# show_metrics never see.
+METRICS_KEY_PREFIX = "metrics"
+
+
+def _metric_key(name):
+    return f"{METRICS_KEY_PREFIX}:{name}"
+
+
+def incr(name, amount=1):
+    """
+    Adds `amount` to a named counter, creating it on first use.
+    """
+    key = _metric_key(name)
+    if cache.add(key, amount, timeout=None):
+        return amount
+    try:
+        return cache.incr(key, amount)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, amount, timeout=None)
+        return amount
+
+
+def get(name, default=0):
+    return cache.get(_metric_key(name), default)
+
+
+def snapshot(names):
+    """
+    Returns {name: value} for the given counters.
+    """
+    values = cache.get_many([_metric_key(name) for name in names])
+    return {name: values.get(_metric_key(name), 0) for name in names}
+
+
+class CounterBuffer:
+    """
+    Counters summed in the process and added to the cache at most once every
+    Config.metrics_flush_interval seconds, for paths that count on every
+    request. The cached totals trail by up to that interval; whatever is
+    pending when the process exits is flushed then.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._flushed_at = time.monotonic()
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._pending[name] += amount
+            due = time.monotonic() - self._flushed_at >= Config.metrics_flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._flushed_at = time.monotonic()
+        for name, amount in pending.items():
+            incr(name, amount)
+
+
+buffered = CounterBuffer()
+atexit.register(buffered.flush)
@@ -0,0 +1,121 @@
+import gzip
+from configuration import Config
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from SocialStack import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Server preference when the client accepts several codings equally
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+# Only these bodies are worth compressing; images and archives already are
+COMPRESSIBLE_TYPES = ("application/json", "application/msgpack", "text/")
+
+# Recorded per compressed response (see the show_metrics command)
+COMPRESSION_METRICS = ("compression.responses", "compression.br", "compression.gzip",
+                       "compression.bytes_in", "compression.bytes_out")
+
+
+def parse_accept_encoding(header):
+    """
+    Returns {coding: q} for an Accept-Encoding header.
+    """
+    codings = {}
+    for item in header.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        codings[coding] = quality
+    return codings
+
+
+def choose_encoding(header):
+    """
+    Picks the supported coding with the highest q-value, or None.
+    """
+    codings = parse_accept_encoding(header)
+    best, best_quality = None, 0.0
+    for coding in ENCODINGS:
+        quality = codings.get(coding, codings.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(coding, content):
+    if coding == "br":
+        return brotli.compress(content, quality=Config.compression_brotli_quality)
+    # mtime=0 keeps the output (and anything hashed from it) deterministic
+    return gzip.compress(content, compresslevel=Config.compression_gzip_level, mtime=0)
+
+
+def compression_ratio():
+    """
+    Uncompressed / compressed bytes over every compressed response flushed so far.
+    """
+    counters = metrics.snapshot(COMPRESSION_METRICS)
+    if not counters["compression.bytes_out"]:
+        return None
+    return round(counters["compression.bytes_in"] / counters["compression.bytes_out"], 2)
+
+
+class APICompressionMiddleware(MiddlewareMixin):
+    """
+    Compresses API responses with brotli or gzip, as negotiated via Accept-Encoding.
+
+    Only paths under Config.compression_paths are considered (WhiteNoise
+    serves static files pre-compressed). Bodies smaller than
+    Config.compression_min_size, streaming responses (event streams,
+    exports) and bodies that are already encoded are left alone.
+    """
+
+    def process_response(self, request, response):
+        if not request.path.startswith(tuple(Config.compression_paths)):
+            return response
+        if response.streaming or response.has_header("Content-Encoding"):
+            return response
+        if not response.get("Content-Type", "").startswith(COMPRESSIBLE_TYPES):
+            return response
+
+        # The body depends on Accept-Encoding even when this one stays uncompressed
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        content = response.content
+        if len(content) < Config.compression_min_size:
+            return response
+
+        coding = choose_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if coding is None:
+            return response
+
+        compressed = compress(coding, content)
+        if len(compressed) >= len(content):
+            return response
+
+        # Summed in the process; a cache round trip per counter would cost more than the count
+        metrics.buffered.incr("compression.responses")
+        metrics.buffered.incr(f"compression.{coding}")
+        metrics.buffered.incr("compression.bytes_in", len(content))
+        metrics.buffered.incr("compression.bytes_out", len(compressed))
+
+        response.content = compressed
+        response.headers["Content-Length"] = str(len(compressed))
+        response.headers["Content-Encoding"] = coding
+        # Same representation, different bytes: a strong validator no longer holds
+        etag = response.get("ETag")
+        if etag and not etag.startswith("W/"):
+            response.headers["ETag"] = "W/" + etag
+        return response
@@ -0,0 +1,45 @@
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations
+
+
+class AddIndexConcurrentlyIfPostgres(AddIndexConcurrently):
+    """
+    CREATE INDEX CONCURRENTLY on PostgreSQL, and a no-op elsewhere.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class TrigramExtensionIfPostgres(TrigramExtension):
+    """
+    TrigramExtension whose reverse is a no-op off PostgreSQL too (Django
+    4.2 only guards the forward direction and queries pg_extension).
+    """
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+def postgres_only_index(model_name, index):
+    """
+    Creates a Postgres-only index (GIN full-text or trigram) without adding
+    it to the migration state.
+
+    Indexes in the state are recreated whenever SQLite rebuilds the table
+    for a later AddField/AlterField, where their Postgres syntax fails, so
+    these live only in the database and are left out of Meta.indexes too.
+    Elsewhere the queries fall back to plain LIKE lookups.
+    """
+    return migrations.SeparateDatabaseAndState(
+        database_operations=[AddIndexConcurrentlyIfPostgres(model_name=model_name, index=index)],
+    )
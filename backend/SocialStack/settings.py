@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 from configuration import Config
 from datetime import timedelta
+from importlib.util import find_spec
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/6.0/howto/deployment/checklist/
@@ -32,8 +33,10 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     "accounts",
     "social",
+    "jobs",
     "rest_framework",
     "corsheaders",
     "cloudinary"
@@ -43,6 +46,8 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    # API JSON only; WhiteNoise already serves compressed static files
+    'SocialStack.middleware.APICompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -93,6 +98,22 @@ DATABASES = {
     }
 }
 
+# Scratch database that run_benchmarks generates its datasets in
+# (create it, then: python manage.py migrate --database benchmark)
+DATABASES["benchmark"] = {**DATABASES["default"], "NAME": Config.benchmark_postgres_db}
+
+
+# Cache
+# Shared feed pages, pagination totals and change versions live here; point
+# CACHE_BACKEND at Redis/Memcached so every worker sees the same entries (the
+# compose files run Redis, and run_jobs refuses to start on LocMem).
+CACHES = {
+    "default": {
+        "BACKEND": Config.cache_backend,
+        "LOCATION": Config.cache_location,
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -150,16 +171,27 @@ AUTH_USER_MODEL = "accounts.User"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.CachedJWTAuthentication",
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
-    ]
+    ],
+    # orjson-backed JSON first, so clients that accept anything get JSON
+    'DEFAULT_RENDERER_CLASSES': [
+        'SocialStack.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ] + (
+        # Offered as application/msgpack only when the package is installed
+        ['SocialStack.renderers.MessagePackRenderer'] if find_spec('msgpack') else []
+    ),
 }
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    # Tokens carry versioned profile claims for the header endpoint
+    'TOKEN_OBTAIN_SERIALIZER': 'accounts.tokens.ProfileTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.tokens.ProfileTokenRefreshSerializer',
 }
 
 TIME_ZONE = 'Asia/Kolkata'  # IST (UTC+5:30)
@@ -0,0 +1,45 @@
+"""
+Shared base for the API test suites.
+"""
+from accounts.models import Role, User
+from configuration import Config
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+from unittest import mock
+
+
+class SocialStackTestCase(TestCase):
+    """
+    TestCase with the admin (id 1) and user (id 2) roles in place, an empty
+    cache per test and the shared feed page cache off, so every request
+    builds its page and counts its own queries.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_role, _ = Role.objects.get_or_create(id=1, defaults={"name": "admin", "description": "admin"})
+        cls.user_role, _ = Role.objects.get_or_create(id=2, defaults={"name": "user", "description": "user"})
+
+    def setUp(self):
+        # Versions, cached users and buffered likes must not leak between tests
+        cache.clear()
+        patcher = mock.patch.object(Config, 'feed_cache_ttl', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def use_shared_cache(self):
+        """
+        Treats the test LocMem cache as the shared cache it stands in for
+        (everything runs in this one process), so cache-backed validators are used.
+        """
+        for target in ('social.cache.cache_is_process_local', 'accounts.tokens.cache_is_process_local'):
+            patcher = mock.patch(target, return_value=False)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def api_client(self, user):
+        """APIClient authenticated as `user`, loaded with its role like CachedJWTAuthentication does."""
+        client = APIClient()
+        client.force_authenticate(User.objects.select_related('role').get(id=user.id))
+        return client
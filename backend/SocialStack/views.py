@@ -1,5 +1,9 @@
 # views.py
 from accounts.models import User
+from accounts.tokens import (
+    PROFILE_CLAIMS, claims_are_fresh, current_profile_version, get_token_for_user, profile_claims
+)
+from accounts.variants import avatar_variants
 from configuration import Config
 from django.views.generic import TemplateView
 from django.conf import settings
@@ -10,7 +14,8 @@ from rest_framework import permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from SocialStack.conditional import conditional_response, make_etag
 
 class ReactAppView(TemplateView):
     """
@@ -71,11 +76,16 @@ class HeaderDetails(APIView):
     Used to populate navigation bar, profile dropdowns, and user status indicators.
     
     Permissions: AllowAny - works for both authenticated and anonymous users
+
+    Authentication is stateless: the details are read from the profile claims
+    of the access token (see accounts.tokens). The database is only queried
+    when the claims are older than the user's profile_version.
     
     Returns:
         200 Success (authenticated): User details for header display
         400 Bad Request (anonymous): Empty object {}
     """
+    authentication_classes = [JWTStatelessUserAuthentication]
     permission_classes = [permissions.AllowAny]
 
     def get(self, request):
@@ -88,20 +98,38 @@ class HeaderDetails(APIView):
         Returns:
             Response: User profile data or empty object based on auth status
         """
-        if request.user.is_authenticated:
-            # Construct header information for authenticated users
-            information = {
-                "userId": request.user.id,
-                "fullName": f"{request.user.first_name} {request.user.last_name}",
-                "username": request.user.username,
-                "user_image": request.user.profile_image if request.user.profile_image else "",
-                "gender": request.user.gender,
-                "theme": request.user.theme
-            }
-        else:
+        if not request.user.is_authenticated:
             # Return empty object for anonymous users
-            information = {}
-            
+            return Response({}, status=Config.success)
+
+        user_id = User._meta.pk.to_python(request.user.id)
+        # Everything in the header changes with profile_version, read from the shared
+        # cache (or the database when the cache is process-local)
+        etag = make_etag(request, "header", user_id, current_profile_version(user_id))
+        return conditional_response(
+            request, etag, lambda: self.build_response(request.user.token, user_id)
+        )
+
+    def build_response(self, token, user_id):
+        if claims_are_fresh(token):
+            claims = {claim: token[claim] for claim in PROFILE_CLAIMS}
+        else:
+            # Token predates a profile/theme change (or has no claims): read the user
+            user = User.objects.filter(id=user_id).first()
+            if user is None:
+                return Response({}, status=Config.success)
+            claims = profile_claims(user)
+
+        # Construct header information for authenticated users
+        information = {
+            "userId": user_id,
+            "fullName": claims["full_name"],
+            "username": claims["username"],
+            "user_image": claims["user_image"],
+            "user_image_variants": avatar_variants(claims["user_image"]),
+            "gender": claims["gender"],
+            "theme": claims["theme"]
+        }
         return Response(information, status=Config.success)
 
 
@@ -134,7 +162,7 @@ class GoogleAuthView(APIView):
                 user.set_unusable_password()
                 user.save()
 
-            refresh = RefreshToken.for_user(user)
+            refresh = get_token_for_user(user)
 
             return Response({
                 "access": str(refresh.access_token),
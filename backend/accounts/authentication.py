@@ -0,0 +1,76 @@
+from accounts.tokens import PROFILE_VERSION_CLAIM
+from configuration import Config
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def auth_user_cache_key(user_id, profile_version):
+    return f"accounts:auth_user:{user_id}:{profile_version}"
+
+
+def invalidate_auth_user(users):
+    """
+    Drops cached users so the next request reloads them from the database.
+
+    `users` are (user id, current profile_version) pairs. Entries are keyed
+    on the profile_version claim of the token, so the current and the
+    previous version are dropped; entries for older tokens expire with
+    AUTH_USER_CACHE_TTL.
+    """
+    keys = []
+    for user_id, version in users:
+        keys += [auth_user_cache_key(user_id, version), auth_user_cache_key(user_id, version - 1)]
+    cache.delete_many(keys)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that loads the user together with its role and keeps it
+    in the cache for Config.auth_user_cache_ttl seconds.
+
+    A warm request costs no queries for authentication, request.user.is_admin
+    or str(request.user). Cached users are dropped whenever the user or its
+    role is saved (see accounts.signals), which covers profile, theme,
+    password and role changes.
+
+    The key includes the token's profile_version claim ("hv"): a token
+    issued after a profile change can never be served a user cached before
+    it. request.user may still lag behind the database by up to the TTL, so
+    views that write to the user re-fetch it and save only the fields they
+    change.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        key = auth_user_cache_key(user_id, validated_token.get(PROFILE_VERSION_CLAIM, 0))
+        user = cache.get(key)
+        if user is None:
+            try:
+                user = self.user_model.objects.select_related('role').get(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+
+            if Config.auth_user_cache_ttl > 0:
+                cache.set(key, user, Config.auth_user_cache_ttl)
+
+        # Same checks as simplejwt, applied to cached users as well
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
@@ -0,0 +1,195 @@
+import io
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from configuration import Config
+from PIL import Image, ImageOps, ImageSequence
+from SocialStack import metrics
+
+logger = logging.getLogger(__name__)
+
+# Output format -> file extension
+IMAGE_EXTENSIONS = {"WEBP": "webp", "JPEG": "jpg"}
+
+# Animated formats that are re-encoded frame by frame in their own format
+ANIMATED_EXTENSIONS = {"GIF": "gif", "WEBP": "webp", "PNG": "png"}
+
+# Counters recorded for every processed image (see the show_metrics command)
+IMAGE_METRICS = (
+    "images.processed",
+    "images.bytes_in",
+    "images.bytes_out",
+    "images.bytes_saved",
+)
+
+_executor = None
+
+
+class ProcessedImage:
+    """
+    Result of preprocess_image; plain attributes so it pickles across processes.
+    """
+    def __init__(self, data, extension, width, height, original_size, resized):
+        self.data = data
+        self.extension = extension
+        self.width = width
+        self.height = height
+        self.original_size = original_size
+        self.resized = resized
+
+    @property
+    def bytes_saved(self):
+        return self.original_size - len(self.data)
+
+
+def flatten(image, background=(255, 255, 255)):
+    """
+    Composites an image with transparency onto a solid background, for
+    formats without an alpha channel (JPEG). convert("RGB") would turn
+    transparent pixels into whatever colour they happen to hold, often black.
+    """
+    image = image.convert("RGBA")
+    flat = Image.new("RGB", image.size, background)
+    flat.paste(image, mask=image.getchannel("A"))
+    return flat
+
+
+def has_transparency(image):
+    return "A" in image.getbands() or "transparency" in image.info
+
+
+def preprocess_animated(image, data, max_edge, quality):
+    """
+    Re-encodes every frame of an animated image in its own format, shrunk to
+    `max_edge` and without EXIF, XMP or comments. Frame durations and the
+    loop count are kept.
+    """
+    frames, durations = [], []
+    for frame in ImageSequence.Iterator(image):
+        durations.append(frame.info.get("duration", 100))
+        # convert() copies the pixels; the fresh frame starts without metadata
+        frame = frame.convert("RGBA")
+        frame.info = {}
+        frame.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+        frames.append(frame)
+
+    output = io.BytesIO()
+    frames[0].save(
+        output,
+        format=image.format,
+        save_all=True,
+        append_images=frames[1:],
+        duration=durations,
+        loop=image.info.get("loop", 0),
+        quality=quality,
+    )
+    width, height = frames[0].size
+    return ProcessedImage(output.getvalue(), ANIMATED_EXTENSIONS[image.format], width, height,
+                          len(data), max(image.size) > max_edge)
+
+
+def preprocess_image(data, max_edge, output_format, quality):
+    """
+    Re-encodes raw image bytes for upload.
+
+    - applies the EXIF orientation, then drops EXIF (GPS, camera data, ...)
+    - shrinks the image so its longest edge is at most `max_edge`
+    - encodes as WEBP or JPEG at `quality`, flattening transparency onto
+      white for JPEG
+
+    Animated GIF/WEBP/PNG images keep their format and are re-encoded frame
+    by frame, so their metadata is dropped too. Still files that would only
+    get bigger are returned as is.
+    Runs inside worker processes, so it must only take and return picklable values.
+    """
+    original_size = len(data)
+    image = Image.open(io.BytesIO(data))
+    original_format = image.format
+    has_exif = bool(image.info.get("exif"))
+    icc_profile = image.info.get("icc_profile")
+
+    # Multi-picture JPEGs (MPO) from cameras are handled as their first, still picture
+    if getattr(image, "is_animated", False) and original_format in ANIMATED_EXTENSIONS:
+        return preprocess_animated(image, data, max_edge, quality)
+
+    # Let the JPEG decoder downscale while decoding (much cheaper than a full decode)
+    if original_format in ("JPEG", "MPO"):
+        image.draft("RGB", (max_edge, max_edge))
+
+    image = ImageOps.exif_transpose(image)
+    resized = max(image.size) > max_edge
+    if resized:
+        image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+    if output_format == "JPEG" and has_transparency(image):
+        image = flatten(image)
+    elif output_format == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+    elif image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if has_transparency(image) else "RGB")
+
+    output = io.BytesIO()
+    image.save(
+        output,
+        format=output_format,
+        quality=quality,
+        optimize=output_format == "JPEG",
+        icc_profile=icc_profile,
+    )
+    encoded = output.getvalue()
+
+    if len(encoded) >= original_size and not resized and not has_exif and original_format in IMAGE_EXTENSIONS:
+        # Already small and clean; re-encoding would only lose quality
+        return ProcessedImage(data, IMAGE_EXTENSIONS[original_format], image.width, image.height, original_size, False)
+
+    return ProcessedImage(encoded, IMAGE_EXTENSIONS[output_format], image.width, image.height, original_size, resized)
+
+
+def render_variant(data, size, square=False):
+    """
+    Returns a smaller copy of already preprocessed image bytes (same format).
+
+    `square` centre-crops to size x size (avatars); otherwise the image is
+    shrunk to fit in size x size.
+    """
+    image = Image.open(io.BytesIO(data))
+    image_format = image.format
+    if square:
+        image = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+    else:
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+
+    output = io.BytesIO()
+    image.save(output, format=image_format, quality=Config.image_quality)
+    return output.getvalue()
+
+
+def get_executor():
+    """
+    Lazily starts the process pool used for image work (None when disabled).
+    """
+    global _executor
+    if _executor is None and Config.image_process_workers > 0:
+        _executor = ProcessPoolExecutor(max_workers=Config.image_process_workers)
+    return _executor
+
+
+def process_upload(data):
+    """
+    Preprocesses image bytes in the process pool and records bytes-saved metrics.
+
+    Decoding and resizing large photos is CPU bound, so it runs outside the
+    calling process (and its GIL) unless IMAGE_PROCESS_WORKERS is 0.
+    """
+    args = (data, Config.image_max_edge, Config.image_output_format, Config.image_quality)
+    executor = get_executor()
+    processed = executor.submit(preprocess_image, *args).result() if executor else preprocess_image(*args)
+
+    metrics.incr("images.processed")
+    metrics.incr("images.bytes_in", processed.original_size)
+    metrics.incr("images.bytes_out", len(processed.data))
+    metrics.incr("images.bytes_saved", max(processed.bytes_saved, 0))
+    logger.info(
+        f"Preprocessed image {processed.width}x{processed.height}: "
+        f"{processed.original_size} -> {len(processed.data)} bytes"
+    )
+    return processed
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.27 on 2026-10-18 09:39
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+import django.db.models.functions.text
+from SocialStack.migration_operations import TrigramExtensionIfPostgres, postgres_only_index
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0009_user_gender_user_theme'),
+    ]
+
+    operations = [
+        TrigramExtensionIfPostgres(),
+        postgres_only_index(
+            'user',
+            django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('username'), name='gin_trgm_ops'), name='user_username_trgm'),
+        ),
+        postgres_only_index(
+            'user',
+            django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('first_name'), name='gin_trgm_ops'), name='user_first_name_trgm'),
+        ),
+        postgres_only_index(
+            'user',
+            django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('last_name'), name='gin_trgm_ops'), name='user_last_name_trgm'),
+        ),
+    ]
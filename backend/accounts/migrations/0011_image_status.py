@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-18 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_user_search_trgm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='profile_image_status',
+            field=models.CharField(choices=[('none', 'No image'), ('pending', 'Upload pending'), ('ready', 'Uploaded'), ('failed', 'Upload failed')], default='none', max_length=10),
+        ),
+    ]
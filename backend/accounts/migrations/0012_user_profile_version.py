@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-18 09:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_image_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='profile_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
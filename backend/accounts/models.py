@@ -3,6 +3,18 @@ from django.contrib.auth.models import AbstractUser
 from django.dispatch import receiver
 from django.db.models.signals import post_save
 
+# Lifecycle of an image that is uploaded by a background job
+IMAGE_STATUS_NONE = 'none'
+IMAGE_STATUS_PENDING = 'pending'
+IMAGE_STATUS_READY = 'ready'
+IMAGE_STATUS_FAILED = 'failed'
+IMAGE_STATUS_CHOICES = [
+    (IMAGE_STATUS_NONE, 'No image'),
+    (IMAGE_STATUS_PENDING, 'Upload pending'),
+    (IMAGE_STATUS_READY, 'Uploaded'),
+    (IMAGE_STATUS_FAILED, 'Upload failed'),
+]
+
 # Create your models here.
 class Role(models.Model):
     """
@@ -44,7 +56,9 @@ class User(AbstractUser):
     
     Fields:
         profile_image (ImageField): User profile picture with default avatar
+        profile_image_status (CharField): Background upload state of profile_image
         role (ForeignKey): Single role assignment from Role model (required)
+        profile_version (PositiveIntegerField): Version of the profile claims in issued tokens
         
     Usage:
         user = User.objects.create_user(username='john', email='john@example.com')
@@ -53,6 +67,11 @@ class User(AbstractUser):
         user.save()
     """
     profile_image = models.URLField(blank=True, null=True)
+    profile_image_status = models.CharField(
+        max_length=10,
+        choices=IMAGE_STATUS_CHOICES,
+        default=IMAGE_STATUS_NONE
+    )
     role = models.ForeignKey(
         Role, 
         on_delete=models.PROTECT,  # Changed from CASCADE to prevent role deletion
@@ -85,11 +104,17 @@ class User(AbstractUser):
         default='light'
     )
 
+    # Bumped whenever data embedded in token claims (name, image, theme, ...) changes
+    profile_version = models.PositiveIntegerField(default=1)
+
     class Meta:
         """Model metadata for admin interface and database."""
         verbose_name = "User"
         verbose_name_plural = "Users"
         ordering = ['username']
+        # Trigram indexes on the UPPER() expressions Django emits for icontains/
+        # istartswith (user search and autocomplete) are Postgres-only and live
+        # in migration 0010 alone, outside the migration state
 
     def __str__(self):
         """String representation shows username and role."""
@@ -104,6 +129,13 @@ class User(AbstractUser):
         """
         return self.role.name
 
+    def bump_profile_version(self):
+        """
+        Marks the profile claims in already issued tokens as stale.
+        Takes effect with the next save().
+        """
+        self.profile_version += 1
+
     @property
     def is_admin(self):
         return self.role.name == "admin"
\ No newline at end of file
@@ -1,9 +1,12 @@
-from accounts.cloudinary import upload_image
+from accounts.models import IMAGE_STATUS_PENDING
+from accounts.uploaders import stage_upload
 from configuration import Config
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from jobs.queue import enqueue
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 import logging
@@ -139,6 +142,10 @@ class ProfileInformationSerializer(serializers.Serializer):
         """
         Update user profile information.
 
+        Only the changed columns are written, so concurrent changes to other
+        fields are kept. Pass a freshly loaded (ideally locked) instance, not
+        the cached request.user.
+
         Args:
             user_instance: Django User model instance to update
             post_data (dict): Dictionary containing fields to update
@@ -175,10 +182,14 @@ class ProfileInformationSerializer(serializers.Serializer):
             # Handle special fields
             if field_name == 'imageUrl':
                 try:
-                    cloud_image_info = upload_image(value, "user_profile_images")
-                    cloudinary_url = cloud_image_info["cloudinary_url"]
-                    user_instance.profile_image = cloudinary_url
-                    user_instance.save()
+                    # Upload happens in a background job; profile_image is filled in when it finishes
+                    with transaction.atomic():
+                        user_instance.profile_image_status = IMAGE_STATUS_PENDING
+                        user_instance.save(update_fields=["profile_image_status"])
+                        enqueue("upload_profile_image", {
+                            "user_id": user_instance.id,
+                            "path": stage_upload(value)
+                        })
                     updated_fields.append(field_name)
                 except Exception as e:
                     error_msg = f"Error updating image: {str(e)}"
@@ -205,7 +216,9 @@ class ProfileInformationSerializer(serializers.Serializer):
         # Save the user instance only once with all changes
         if updated_fields:
             try:
-                user_instance.save()
+                user_instance.bump_profile_version()
+                model_fields = [field for field in updated_fields if field != 'imageUrl']
+                user_instance.save(update_fields=[*model_fields, "profile_version"])
                 logger.info(f"Successfully updated fields for user {user_instance.id}: {updated_fields}")
             except Exception as e:
                 error_msg = f"Error saving user instance: {str(e)}"
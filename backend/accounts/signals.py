@@ -0,0 +1,31 @@
+from accounts.authentication import invalidate_auth_user
+from accounts.models import Role, User
+from accounts.tokens import cache_profile_version
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    """Profile, theme and password changes must not be served from the auth cache."""
+    # After commit, so a concurrent request cannot re-cache the old row
+    users = [(instance.id, instance.profile_version)]
+    transaction.on_commit(lambda: invalidate_auth_user(users))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, **kwargs):
+    """Keeps the cached profile_version that token claims are checked against current."""
+    user_id, version = instance.id, instance.profile_version
+    transaction.on_commit(lambda: cache_profile_version(user_id, version))
+
+
+@receiver(post_save, sender=Role)
+def role_saved(sender, instance, created, **kwargs):
+    """Cached users carry their role (is_admin), so drop everyone holding it."""
+    if created:
+        return
+    users = list(User.objects.filter(role=instance).values_list('id', 'profile_version'))
+    transaction.on_commit(lambda: invalidate_auth_user(users))
@@ -0,0 +1,31 @@
+from accounts.models import IMAGE_STATUS_FAILED, IMAGE_STATUS_READY, User
+from accounts.uploaders import discard_staged, upload_staged
+from jobs.queue import register
+
+PROFILE_IMAGES_FOLDER = "user_profile_images"
+
+
+def mark_profile_image_failed(payload, error):
+    user = User.objects.filter(id=payload["user_id"]).first()
+    if user is not None:
+        # save() rather than update() so cached copies of the user are invalidated
+        user.profile_image_status = IMAGE_STATUS_FAILED
+        user.save(update_fields=["profile_image_status"])
+    discard_staged(payload["path"])
+
+
+@register("upload_profile_image", on_failure=mark_profile_image_failed)
+def upload_profile_image(payload):
+    """
+    Uploads a staged profile image and stores its URL on the user.
+    """
+    user = User.objects.filter(id=payload["user_id"]).first()
+    if user is None:
+        discard_staged(payload["path"])
+        return
+
+    cloud_image_info = upload_staged(payload["path"], PROFILE_IMAGES_FOLDER)
+    user.profile_image = cloud_image_info["cloudinary_url"]
+    user.profile_image_status = IMAGE_STATUS_READY
+    user.bump_profile_version()
+    user.save(update_fields=["profile_image", "profile_image_status", "profile_version"])
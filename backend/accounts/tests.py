@@ -1,3 +1,283 @@
-from django.test import TestCase
+import io
+import json
+import zipfile
+from accounts.authentication import CachedJWTAuthentication
+from accounts.images import preprocess_image, process_upload
+from accounts.models import User
+from accounts.tokens import PROFILE_VERSION_CLAIM, get_token_for_user
+from configuration import Config
+from django.core.management import call_command
+from django.test import Client, SimpleTestCase
+from PIL import Image, ImageSequence
+from rest_framework_simplejwt.tokens import AccessToken
+from social import models as social_models
+from SocialStack.testing import SocialStackTestCase
+from unittest import mock
 
-# Create your tests here.
+
+@mock.patch.object(Config, 'export_chunk_size', 2)
+class UserDataExportTests(SocialStackTestCase):
+    """
+    accounts/export/ streams every record the user owns, and nobody else's.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create(username="exporter", email="exporter@example.com")
+        cls.other = User.objects.create(username="other")
+
+        for index in range(3):
+            post = social_models.UserPost.objects.create(user=cls.user, post_desc=f"post {index}")
+            post.add_like(cls.user)
+            post.add_comment(user=cls.other, comment="not mine")
+        other_post = social_models.UserPost.objects.create(user=cls.other, post_desc="theirs")
+        other_post.add_comment(user=cls.user, comment="mine").add_like(cls.user)
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.api_client(self.user)
+
+    def read_lines(self, data):
+        return [json.loads(line) for line in data.decode('utf-8').splitlines()]
+
+    def test_ndjson_export(self):
+        response = self.client.get('/accounts/export/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = self.read_lines(b"".join(response.streaming_content))
+
+        counts = {}
+        for record in records:
+            counts[record['type']] = counts.get(record['type'], 0) + 1
+        self.assertEqual(counts, {"profile": 1, "post": 3, "comment": 1, "post_like": 3, "comment_like": 1})
+        self.assertEqual(records[0]['email'], "exporter@example.com")
+        self.assertEqual([record['comment'] for record in records if record['type'] == 'comment'], ["mine"])
+
+    def test_zip_export(self):
+        response = self.client.get('/accounts/export/', {'archive': 'zip'})
+
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(
+            archive.namelist(),
+            ["profile.ndjson", "posts.ndjson", "comments.ndjson", "post_likes.ndjson", "comment_likes.ndjson"]
+        )
+        posts = self.read_lines(archive.read("posts.ndjson"))
+        self.assertEqual([post['post_desc'] for post in posts], ["post 0", "post 1", "post 2"])
+
+
+class ProfileUpdateTests(SocialStackTestCase):
+    """
+    Profile and password changes write only their own columns, whatever the
+    cached request.user holds.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create(
+            username="writer", first_name="Old", last_name="Name", email="writer@example.com"
+        )
+        cls.user.set_password("old-password-1")
+        cls.user.save()
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.token_client(self.user)
+        # Loads request.user into the auth cache
+        self.assertEqual(self.profile()['first_name'], "Old")
+
+    def token_client(self, user):
+        user.refresh_from_db()
+        return Client(HTTP_AUTHORIZATION=f"Bearer {get_token_for_user(user).access_token}")
+
+    def profile(self):
+        response = self.client.get('/accounts/user-details/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def change_behind_the_cache(self, **fields):
+        # QuerySet.update() sends no signals, so the cached user goes stale
+        User.objects.filter(id=self.user.id).update(**fields)
+
+    def test_profile_update_keeps_concurrent_changes(self):
+        # e.g. the upload job finishing or a theme change from another tab
+        self.change_behind_the_cache(profile_image="avatars/new.webp", theme="dark")
+
+        response = self.client.post('/accounts/user-details/', {
+            "username": "writer", "first_name": "New", "last_name": "Name",
+            "email": "writer@example.com", "imageUrl": None,
+        }, content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        user = User.objects.get(id=self.user.id)
+        self.assertEqual(
+            (user.first_name, user.profile_image, user.theme), ("New", "avatars/new.webp", "dark")
+        )
+        self.assertEqual(user.profile_version, self.user.profile_version + 1)
+
+    def test_password_change_keeps_concurrent_changes(self):
+        self.change_behind_the_cache(first_name="Concurrent")
+
+        response = self.client.post('/accounts/change-user-password/', {
+            "old_password": "old-password-1", "new_password": "New-password-2!",
+            "confirm_password": "New-password-2!",
+        }, content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        user = User.objects.get(id=self.user.id)
+        self.assertEqual(user.first_name, "Concurrent")
+        self.assertTrue(user.check_password("New-password-2!"))
+
+    def test_newer_tokens_skip_older_cached_users(self):
+        old_token = get_token_for_user(self.user).access_token
+        self.change_behind_the_cache(first_name="Fresh", profile_version=self.user.profile_version + 1)
+        self.user.refresh_from_db()
+        new_token = get_token_for_user(self.user).access_token
+
+        authentication = CachedJWTAuthentication()
+        self.assertEqual(authentication.get_user(old_token).first_name, "Old")
+        self.assertEqual(authentication.get_user(new_token).first_name, "Fresh")
+
+    def test_profile_validator_follows_the_database(self):
+        etag = self.client.get('/accounts/user-details/')['ETag']
+        self.assertEqual(self.client.get('/accounts/user-details/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Saved by another worker: this process's cached request.user is stale
+        self.change_behind_the_cache(first_name="Elsewhere", profile_version=self.user.profile_version + 1)
+        response = self.client.get('/accounts/user-details/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['first_name'], "Elsewhere")
+
+
+class ProfileClaimsTests(SocialStackTestCase):
+    """
+    Token refreshes re-issue the profile claims from the user row, and the
+    header falls back to the database for tokens issued before a profile change.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create(username="claims", first_name="Old", last_name="Name", theme="light")
+
+    def setUp(self):
+        super().setUp()
+        self.use_shared_cache()
+        self.refresh = get_token_for_user(self.user)
+
+    def change_profile(self):
+        # Through save(), like the profile endpoints, so the cached profile_version follows on commit
+        self.user.first_name = "New"
+        self.user.theme = "dark"
+        self.user.bump_profile_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save(update_fields=["first_name", "theme", "profile_version"])
+
+    def header(self, access):
+        response = Client(HTTP_AUTHORIZATION=f"Bearer {access}").get('/header/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_refresh_reloads_the_claims(self):
+        self.change_profile()
+
+        response = self.client.post('/auth/refresh/', {"refresh": str(self.refresh)},
+                                    content_type="application/json")
+
+        access = AccessToken(response.json()["access"])
+        self.assertEqual((access["full_name"], access["theme"]), ("New Name", "dark"))
+        self.assertEqual(access[PROFILE_VERSION_CLAIM], self.user.profile_version)
+
+    def test_refresh_reloads_claims_the_cache_calls_fresh(self):
+        # The profile_version cache missed the change (e.g. another process's LocMem)
+        User.objects.filter(id=self.user.id).update(first_name="Behind")
+
+        response = self.client.post('/auth/refresh/', {"refresh": str(self.refresh)},
+                                    content_type="application/json")
+
+        self.assertEqual(AccessToken(response.json()["access"])["full_name"], "Behind Name")
+
+    def test_header_skips_a_process_local_cache(self):
+        access = self.refresh.access_token
+        self.assertEqual(self.header(access)["fullName"], "Old Name")
+
+        # Another worker changes the profile; this process's cache never hears of it
+        with mock.patch('accounts.tokens.cache_is_process_local', return_value=True):
+            User.objects.filter(id=self.user.id).update(first_name="Elsewhere", profile_version=self.user.profile_version + 1)
+            self.assertEqual(self.header(access)["fullName"], "Elsewhere Name")
+
+    def test_header_reads_stale_claims_from_the_database(self):
+        access = self.refresh.access_token
+        with self.assertNumQueries(1):
+            self.assertEqual(self.header(access)["fullName"], "Old Name")
+
+        self.change_profile()
+
+        header = self.header(access)
+        self.assertEqual((header["fullName"], header["theme"]), ("New Name", "dark"))
+
+
+class ImagePreprocessTests(SimpleTestCase):
+    """
+    Uploads lose their metadata, animated or not, and transparency survives JPEG output.
+    """
+
+    def exif(self):
+        exif = Image.Exif()
+        exif[0x010F] = "Camera maker"  # Make
+        return exif.tobytes()
+
+    def encode(self, frames, image_format, **params):
+        output = io.BytesIO()
+        frames[0].save(output, format=image_format, save_all=len(frames) > 1,
+                       append_images=frames[1:], **params)
+        return output.getvalue()
+
+    def test_animated_images_lose_their_metadata(self):
+        frames = [Image.new("RGB", (64, 48), colour) for colour in ("red", "green", "blue")]
+        data = self.encode(frames, "WEBP", exif=self.exif(), duration=[40, 80, 120], loop=0)
+        self.assertTrue(Image.open(io.BytesIO(data)).info.get("exif"))
+
+        processed = preprocess_image(data, max_edge=32, output_format="JPEG", quality=80)
+
+        image = Image.open(io.BytesIO(processed.data))
+        self.assertEqual((image.format, processed.extension), ("WEBP", "webp"))
+        self.assertEqual(image.n_frames, 3)
+        self.assertEqual(image.size, (32, 24))
+        for frame in ImageSequence.Iterator(image):
+            self.assertFalse(frame.info.get("exif"))
+            self.assertFalse(frame.getexif())
+
+    def test_transparency_is_flattened_onto_white_for_jpeg(self):
+        transparent = Image.new("RGBA", (40, 40), (0, 0, 0, 0))
+        transparent.paste((255, 0, 0, 255), (0, 0, 20, 40))
+        data = self.encode([transparent], "PNG")
+
+        processed = preprocess_image(data, max_edge=100, output_format="JPEG", quality=95)
+
+        image = Image.open(io.BytesIO(processed.data))
+        self.assertEqual((image.format, image.mode), ("JPEG", "RGB"))
+        self.assertTrue(all(channel > 245 for channel in image.getpixel((35, 20))))
+        red, green, blue = image.getpixel((5, 20))
+        self.assertTrue(red > 240 and green < 15 and blue < 15)
+
+
+class ShowMetricsTests(SocialStackTestCase):
+    """
+    The image counters recorded by process_upload are readable with show_metrics.
+    """
+
+    @mock.patch.object(Config, 'image_process_workers', 0)
+    def test_image_counters(self):
+        data = io.BytesIO()
+        Image.new("RGB", (300, 200), "white").save(data, format="PNG")
+        process_upload(data.getvalue())
+
+        output = io.StringIO()
+        call_command('show_metrics', stdout=output, stderr=io.StringIO())
+        self.assertIn("images.processed             1", output.getvalue())
+        self.assertIn("images.saved_ratio", output.getvalue())
@@ -0,0 +1,109 @@
+"""
+Identity claims embedded in access tokens.
+
+The header only needs name, username, image, gender and theme, so these are
+issued as claims together with the user's profile_version ("hv"). HeaderDetails
+serves them straight from the validated token and only reads the database
+when the version in the token is older than the user's current one.
+"""
+from accounts.models import User
+from django.core.cache import cache
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from social.cache import cache_is_process_local
+
+PROFILE_VERSION_CLAIM = "hv"
+PROFILE_CLAIMS = ("full_name", "username", "user_image", "gender", "theme")
+
+# Cached current version; kept up to date by accounts.signals
+PROFILE_VERSION_TTL = 24 * 60 * 60
+
+
+def profile_version_cache_key(user_id):
+    return f"accounts:profile_version:{user_id}"
+
+
+def cache_profile_version(user_id, version):
+    cache.set(profile_version_cache_key(user_id), version, PROFILE_VERSION_TTL)
+
+
+def current_profile_version(user_id):
+    """
+    Returns the user's profile_version (None for unknown users), from the
+    cache when it is shared by every process, otherwise from the database.
+    """
+    if cache_is_process_local():
+        # Another worker's profile change would never reach this process's copy
+        return User.objects.filter(id=user_id).values_list('profile_version', flat=True).first()
+    version = cache.get(profile_version_cache_key(user_id))
+    if version is None:
+        version = User.objects.filter(id=user_id).values_list('profile_version', flat=True).first()
+        if version is not None:
+            cache_profile_version(user_id, version)
+    return version
+
+
+def profile_claims(user):
+    return {
+        "full_name": f"{user.first_name} {user.last_name}",
+        "username": user.username,
+        "user_image": user.profile_image if user.profile_image else "",
+        "gender": user.gender,
+        "theme": user.theme,
+    }
+
+
+def add_profile_claims(token, user):
+    for claim, value in profile_claims(user).items():
+        token[claim] = value
+    token[PROFILE_VERSION_CLAIM] = user.profile_version
+    return token
+
+
+def claims_are_fresh(token):
+    """
+    True when the token's profile claims match the user's current profile_version.
+    """
+    version = token.get(PROFILE_VERSION_CLAIM)
+    if version is None:
+        return False
+    return version == current_profile_version(token[api_settings.USER_ID_CLAIM])
+
+
+def get_token_for_user(user):
+    """
+    RefreshToken.for_user() with profile claims; the access token inherits them.
+    """
+    return add_profile_claims(RefreshToken.for_user(user), user)
+
+
+class ProfileTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Login serializer issuing tokens with profile claims.
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        return add_profile_claims(super().get_token(user), user)
+
+
+class ProfileTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh serializer that re-issues the profile claims from the user row.
+
+    Access tokens copy their claims from the refresh token, which still holds
+    the ones issued at login. Refreshes are rare enough to always read the
+    user, so the claims never depend on the cached profile_version.
+    """
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        access = AccessToken(data["access"])
+        user = User.objects.filter(id=access[api_settings.USER_ID_CLAIM]).first()
+        if user is not None:
+            data["access"] = str(add_profile_claims(access, user))
+            if "refresh" in data:
+                # ROTATE_REFRESH_TOKENS: the new refresh token starts from the current claims too
+                data["refresh"] = str(add_profile_claims(RefreshToken(data["refresh"]), user))
+        return data
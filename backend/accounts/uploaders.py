@@ -0,0 +1,74 @@
+import os
+from accounts.images import process_upload, render_variant
+from accounts.variants import AVATAR, FOLDER_VARIANTS, VARIANT_SIZES, rendition_name
+from configuration import Config
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils.module_loading import import_string
+from uuid import uuid4
+
+
+def get_uploader():
+    """
+    Returns the configured upload function (Config.image_uploader).
+
+    Uploaders take (image, folder) and return a dict with "cloudinary_url"
+    and "public_id", like accounts.cloudinary.upload_image.
+    """
+    return import_string(Config.image_uploader)
+
+
+def local_upload(image, folder):
+    """
+    Offline stand-in for Cloudinary that stores images with Django's default
+    storage (MEDIA_ROOT). Select it with IMAGE_UPLOADER=accounts.uploaders.local_upload.
+
+    Also writes the thumb/medium renditions that accounts.variants links to.
+    """
+    filename = os.path.basename(getattr(image, "name", "") or "image")
+    name = default_storage.save(f"{folder}/{filename}", image)
+
+    kind = FOLDER_VARIANTS.get(folder)
+    if kind is not None:
+        image.seek(0)
+        data = image.read()
+        for variant, size in VARIANT_SIZES[kind].items():
+            rendition = render_variant(data, size, square=kind == AVATAR)
+            # Named after the saved (unique) original, so variant URLs can be derived from its URL
+            default_storage.save(rendition_name(name, variant), ContentFile(rendition))
+    return {
+        "cloudinary_url": f"{Config.backend_domain}{default_storage.url(name)}",
+        "public_id": name
+    }
+
+
+def stage_upload(image):
+    """
+    Saves an uploaded file to the staging area so a background job can
+    upload it later. Returns the staged storage path.
+
+    The worker must see the same storage as the web process (shared volume
+    or a remote storage backend).
+    """
+    extension = os.path.splitext(getattr(image, "name", "") or "")[1].lower()
+    return default_storage.save(f"{Config.upload_staging_dir}/{uuid4().hex}{extension}", image)
+
+
+def upload_staged(path, folder):
+    """
+    Preprocesses a staged file (see accounts.images), uploads it with the
+    configured uploader and removes it from staging.
+    """
+    with default_storage.open(path, "rb") as staged_image:
+        processed = process_upload(staged_image.read())
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    result = get_uploader()(ContentFile(processed.data, name=f"{name}.{processed.extension}"), folder)
+    default_storage.delete(path)
+    return result
+
+
+def discard_staged(path):
+    """Removes a staged file that will never be uploaded."""
+    if path and default_storage.exists(path):
+        default_storage.delete(path)
@@ -6,4 +6,5 @@ urlpatterns = [
     path("user-details/", views.UserProfileInformation.as_view()),
     path("theme/", views.ChangeUserTheme.as_view()),
     path("change-user-password/", views.ChangePasswordView.as_view()),
+    path("export/", views.UserDataExport.as_view()),
 ]
@@ -0,0 +1,82 @@
+"""
+Size variants (thumb/medium/full) for profile and post images.
+
+Variant URLs are derived from the stored URL with string operations only,
+so serializers can emit them without touching storage:
+
+- Cloudinary URLs get an on-the-fly transformation inserted after /upload/
+- files stored by accounts.uploaders.local_upload get `<name>_<variant>.<ext>`
+  renditions, which local_upload writes next to the original
+- any other URL (Google avatars, the static default avatar) is returned as
+  is for every variant
+"""
+import posixpath
+from configuration import Config
+from django.conf import settings
+
+AVATAR = "avatar"
+POST_IMAGE = "post"
+
+# Longest edge in px per variant; "full" is always the stored image
+VARIANT_SIZES = {
+    AVATAR: {"thumb": 48, "medium": 160},
+    POST_IMAGE: {"thumb": 320, "medium": 960},
+}
+
+# Upload folder -> variant set, used when generating local renditions
+FOLDER_VARIANTS = {
+    "user_profile_images": AVATAR,
+    "user_posts": POST_IMAGE,
+}
+
+CLOUDINARY_UPLOAD_MARKER = "/upload/"
+
+
+def cloudinary_transformation(kind, size):
+    if kind == AVATAR:
+        # Square crop centred on the face for avatars
+        return f"c_fill,g_face,w_{size},h_{size},f_auto,q_auto"
+    return f"c_limit,w_{size},h_{size},f_auto,q_auto"
+
+
+def rendition_name(name, variant):
+    """
+    Storage name of a local rendition: user_posts/abc.webp -> user_posts/abc_thumb.webp
+    """
+    stem, extension = posixpath.splitext(name)
+    return f"{stem}_{variant}{extension}"
+
+
+def _local_media_prefix():
+    return f"{Config.backend_domain}{settings.MEDIA_URL}"
+
+
+def image_variants(url, kind):
+    """
+    Returns {"thumb", "medium", "full"} URLs for an image, or None without one.
+    """
+    if not url:
+        return None
+
+    sizes = VARIANT_SIZES[kind]
+    if "res.cloudinary.com" in url and CLOUDINARY_UPLOAD_MARKER in url:
+        head, tail = url.split(CLOUDINARY_UPLOAD_MARKER, 1)
+        variants = {
+            variant: f"{head}{CLOUDINARY_UPLOAD_MARKER}{cloudinary_transformation(kind, size)}/{tail}"
+            for variant, size in sizes.items()
+        }
+    elif url.startswith(_local_media_prefix()):
+        variants = {variant: rendition_name(url, variant) for variant in sizes}
+    else:
+        variants = {variant: url for variant in sizes}
+
+    variants["full"] = url
+    return variants
+
+
+def avatar_variants(url):
+    return image_variants(url, AVATAR)
+
+
+def post_image_variants(url):
+    return image_variants(url, POST_IMAGE)
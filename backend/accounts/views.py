@@ -1,10 +1,16 @@
+from accounts.authentication import CachedJWTAuthentication
+from accounts.export import export_ndjson, export_zip, iterate_in_thread
 from accounts.models import User
 from accounts.serializers import ChangePasswordSerializer, ProfileInformationSerializer, UserRegistrationSerializer
 from configuration import Config
 from django.contrib.auth import update_session_auth_hash
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from rest_framework import permissions, generics
 from rest_framework.response import Response
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework.views import APIView
+from SocialStack.conditional import conditional_response, make_etag
 
 # Create your views here.
 
@@ -77,7 +83,7 @@ class UserProfileInformation(generics.UpdateAPIView):
         GET: 200 - Current user profile data
         POST: 200 - Success message or 400 - Validation errors
     """
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = ProfileInformationSerializer
 
@@ -89,11 +95,20 @@ class UserProfileInformation(generics.UpdateAPIView):
             request: Authenticated HTTP request
             
         Returns:
-            Response: User profile data from serializer.get()
+            Response: User profile data from serializer.get(), or 304 Not Modified
+                when the client's ETag still matches
         """
+        # Every profile edit bumps profile_version. It is read from the row, not
+        # from the cached request.user, which can lag behind other workers' edits
+        version = User.objects.filter(id=request.user.id).values_list('profile_version', flat=True).get()
+        etag = make_etag(request, "profile", request.user.id, version)
         # Fetch current user profile using serializer's custom get method
-        user_details = self.serializer_class().get(request.user)
-        return Response(user_details, status=Config.success)
+        return conditional_response(
+            request, etag,
+            lambda: Response(
+                self.serializer_class().get(User.objects.get(id=request.user.id)), status=Config.success
+            )
+        )
 
     def post(self, request):
         """
@@ -108,8 +123,10 @@ class UserProfileInformation(generics.UpdateAPIView):
         serializer = self.get_serializer(data=request.data)
         
         if serializer.is_valid():
-            # Update user profile using serializer's custom post method
-            self.serializer_class().post(request.user, request.data)
+            # request.user may be a cached copy; update the locked row instead
+            with transaction.atomic():
+                user = User.objects.select_for_update().get(id=request.user.id)
+                self.serializer_class().post(user, request.data)
             return Response(
                 {"message": "Data saved successfully."},
                 status=Config.success
@@ -141,7 +158,7 @@ class ChangePasswordView(generics.UpdateAPIView):
         200 Success: Password changed successfully
         400 Bad Request: Invalid old password or validation errors
     """
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = ChangePasswordSerializer
 
@@ -181,9 +198,10 @@ class ChangePasswordView(generics.UpdateAPIView):
                     status=Config.bad_request
                 )
 
-            # Set and save new password
+            # Set and save new password; user is the cached request.user, so
+            # only the password column is written
             user.set_password(serializer.validated_data['new_password'])
-            user.save()
+            user.save(update_fields=["password"])
 
             # Update session to prevent logout after password change
             update_session_auth_hash(request, user)
@@ -198,13 +216,51 @@ class ChangePasswordView(generics.UpdateAPIView):
 
 
 class ChangeUserTheme(generics.UpdateAPIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = ChangePasswordSerializer
 
     def post(self, request, *args, **kwargs):
         theme = request.data
-        current_user = User.objects.filter(id=request.user.id).first()
-        current_user.theme = theme
-        current_user.save()
-        return Response(status=Config.success)
\ No newline at end of file
+        with transaction.atomic():
+            current_user = User.objects.select_for_update().filter(id=request.user.id).first()
+            current_user.theme = theme
+            current_user.bump_profile_version()
+            current_user.save(update_fields=["theme", "profile_version"])
+        return Response(status=Config.success)
+
+class UserDataExport(APIView):
+    """
+    API endpoint streaming a full export of the authenticated user's data.
+
+    Profile, posts, comments, post likes and comment likes are streamed as
+    NDJSON (one JSON object per line, each with a "type"). `?archive=zip`
+    sends a zip with one NDJSON file per section instead.
+
+    Authentication: JWT required
+    Permissions: Authenticated users only
+
+    Returns:
+        200: application/x-ndjson or application/zip attachment
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        archive = request.query_params.get("archive") == "zip"
+        if archive:
+            chunks = export_zip(request.user)
+            content_type, extension = "application/zip", "zip"
+        else:
+            chunks = export_ndjson(request.user)
+            content_type, extension = "application/x-ndjson", "ndjson"
+
+        if isinstance(request._request, ASGIRequest):
+            chunks = iterate_in_thread(chunks)
+
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response["Content-Disposition"] = (
+            f'attachment; filename="socialstack-export-{request.user.username}.{extension}"'
+        )
+        response["Cache-Control"] = "no-store"
+        return response
@@ -30,6 +30,22 @@ class Config:
 
     """Project Variables"""
     posts_per_page = os.getenv('POSTS_PER_PAGE', '50')
+    pagination_page_window = int(os.getenv('PAGINATION_PAGE_WINDOW', '2'))
+    pagination_count_strategy = os.getenv('PAGINATION_COUNT_STRATEGY', 'exact')  # exact | cached | estimated
+    pagination_count_cache_ttl = int(os.getenv('PAGINATION_COUNT_CACHE_TTL', '60'))
+    pagination_estimate_threshold = int(os.getenv('PAGINATION_ESTIMATE_THRESHOLD', '100000'))
+    comments_per_post = int(os.getenv('COMMENTS_PER_POST', '3'))
+    comments_page_size = int(os.getenv('COMMENTS_PAGE_SIZE', '20'))
+    feed_cache_ttl = int(os.getenv('FEED_CACHE_TTL', '30'))  # 0 disables the shared feed page cache
+    autocomplete_limit = int(os.getenv('AUTOCOMPLETE_LIMIT', '8'))
+    autocomplete_min_length = int(os.getenv('AUTOCOMPLETE_MIN_LENGTH', '3'))  # trigram indexes need 3 characters
+    autocomplete_cache_ttl = int(os.getenv('AUTOCOMPLETE_CACHE_TTL', '60'))
+    user_search_candidates = int(os.getenv('USER_SEARCH_CANDIDATES', '200'))  # users ranked per search on Postgres
+
+    """Cache Configuration"""
+    cache_backend = os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+    cache_location = os.getenv('CACHE_LOCATION', '')
+    backend_domain = os.getenv('VITE_BACKEND_DOMAIN', '')
     default_image = f"{os.getenv('VITE_BACKEND_DOMAIN')}/static/user_profile_images/default-avatar.png"
     GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 
@@ -39,6 +55,56 @@ class Config:
     postgres_password = os.getenv("POSTGRES_PASSWORD")
     postgres_host = os.getenv("POSTGRES_HOST")
     postgres_port = os.getenv("POSTGRES_PORT", 5432)
+    # Scratch database on the same server for run_benchmarks; never the one above
+    benchmark_postgres_db = os.getenv("BENCHMARK_POSTGRES_DB", f"{postgres_db}_benchmark")
+
+    """Likes Configuration"""
+    likes_batch_max_size = int(os.getenv('LIKES_BATCH_MAX_SIZE', '100'))  # operations per batch request
+    # Write-behind mode: likes are buffered in the cache and written by flush_like_buffer
+    likes_write_behind = os.getenv('LIKES_WRITE_BEHIND', 'False') == 'True'
+    likes_buffer_flush_size = int(os.getenv('LIKES_BUFFER_FLUSH_SIZE', '5000'))  # buffered actions per flush
+    likes_buffer_lock_timeout = int(os.getenv('LIKES_BUFFER_LOCK_TIMEOUT', '60'))  # seconds
+
+    """Real-time Events Configuration"""
+    events_channel_layer = os.getenv('EVENTS_CHANNEL_LAYER', 'social.events.InMemoryChannelLayer')
+    events_heartbeat = int(os.getenv('EVENTS_HEARTBEAT', '15'))  # seconds between keepalive comments
+    events_max_duration = int(os.getenv('EVENTS_MAX_DURATION', '300'))  # seconds before a stream is recycled
+    events_queue_size = int(os.getenv('EVENTS_QUEUE_SIZE', '100'))  # undelivered events kept per client
+    events_retry_ms = int(os.getenv('EVENTS_RETRY_MS', '3000'))  # client reconnect delay
+    events_ticket_ttl = int(os.getenv('EVENTS_TICKET_TTL', '30'))  # seconds to open a stream with a ticket
+    events_redis_url = os.getenv('EVENTS_REDIS_URL', 'redis://localhost:6379/1')  # RedisChannelLayer
+
+    """Data Export Configuration"""
+    export_chunk_size = int(os.getenv('EXPORT_CHUNK_SIZE', '1000'))  # rows fetched and written per chunk
+
+    """Response Compression Configuration"""
+    compression_paths = os.getenv('COMPRESSION_PATHS', '/social/,/accounts/,/header/').split(",")
+    compression_paths = [o.strip() for o in compression_paths if o.strip()]
+    compression_min_size = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))  # bytes; smaller bodies are sent as-is
+    compression_gzip_level = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))
+    compression_brotli_quality = int(os.getenv('COMPRESSION_BROTLI_QUALITY', '5'))  # 0-11; higher costs more CPU
+
+    """Metrics Configuration"""
+    metrics_flush_interval = int(os.getenv('METRICS_FLUSH_INTERVAL', '30'))  # seconds buffered counters stay in the process
+
+    """Authentication Configuration"""
+    auth_user_cache_ttl = int(os.getenv('AUTH_USER_CACHE_TTL', '300'))  # seconds, 0 disables
+
+    """Background Jobs Configuration"""
+    jobs_max_attempts = int(os.getenv('JOBS_MAX_ATTEMPTS', '3'))
+    jobs_retry_delay = int(os.getenv('JOBS_RETRY_DELAY', '10'))  # seconds, doubled per attempt
+    jobs_lock_timeout = int(os.getenv('JOBS_LOCK_TIMEOUT', '300'))  # seconds before a running job is reclaimed
+
+    """Image Upload Configuration"""
+    # Swap for accounts.uploaders.local_upload to keep uploads on the local filesystem
+    image_uploader = os.getenv('IMAGE_UPLOADER', 'accounts.cloudinary.upload_image')
+    upload_staging_dir = os.getenv('UPLOAD_STAGING_DIR', 'pending_uploads')
+
+    """Image Preprocessing Configuration"""
+    image_max_edge = int(os.getenv('IMAGE_MAX_EDGE', '2048'))  # px, longest side
+    image_output_format = os.getenv('IMAGE_OUTPUT_FORMAT', 'WEBP').upper()  # WEBP or JPEG
+    image_quality = int(os.getenv('IMAGE_QUALITY', '82'))
+    image_process_workers = int(os.getenv('IMAGE_PROCESS_WORKERS', '2'))  # 0 processes images inline
 
     """Cloudinary Configuration"""
     cloudinary_url = os.getenv('CLOUDINARY_URL')
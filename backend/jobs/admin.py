@@ -0,0 +1,9 @@
+from django.contrib import admin
+from jobs.models import Job
+# Register your models here.
+
+class AdminJob(admin.ModelAdmin):
+    list_display = ("id", "name", "status", "attempts", "run_after", "updated_at",)
+    list_filter = ("status", "name",)
+
+admin.site.register(Job, AdminJob)
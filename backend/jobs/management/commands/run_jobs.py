@@ -0,0 +1,50 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from jobs.queue import run_pending
+from social.cache import cache_is_process_local
+
+
+class Command(BaseCommand):
+    """
+    Background worker that executes queued jobs (image uploads, ...).
+
+    Jobs invalidate cached feed pages and users by bumping cache versions,
+    so the worker refuses to start on a process-local cache (LocMem), where
+    the API processes would never see those bumps.
+
+    Usage:
+        python manage.py run_jobs             # poll forever
+        python manage.py run_jobs --once      # drain the queue and exit
+        python manage.py run_jobs --sleep 2   # poll interval when idle
+    """
+    help = "Run background jobs from the database queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true",
+                            help="Process all runnable jobs, then exit.")
+        parser.add_argument("--sleep", type=float, default=1.0,
+                            help="Seconds to wait between polls when the queue is empty.")
+        parser.add_argument("--max-jobs", type=int, default=None,
+                            help="Exit after processing this many jobs.")
+
+    def handle(self, *args, **options):
+        if cache_is_process_local():
+            raise CommandError(
+                "CACHE_BACKEND is process-local; point it at the cache the API uses (e.g. Redis)."
+            )
+        max_jobs = options["max_jobs"]
+        processed = 0
+
+        while True:
+            remaining = None if max_jobs is None else max_jobs - processed
+            ran = run_pending(max_jobs=remaining)
+            processed += ran
+            if ran:
+                self.stdout.write(f"Processed {ran} job(s)")
+
+            if options["once"] or (max_jobs is not None and processed >= max_jobs):
+                break
+            if not ran:
+                time.sleep(options["sleep"])
+
+        self.stdout.write(self.style.SUCCESS(f"Worker finished after {processed} job(s)."))
@@ -0,0 +1,136 @@
+import logging
+import traceback
+from configuration import Config
+from datetime import timedelta
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from jobs.models import Job
+
+logger = logging.getLogger(__name__)
+
+# name -> Task; filled by @register in each app's tasks.py
+_registry = {}
+
+
+class Task:
+    """
+    A registered job handler plus an optional hook for jobs that ran out of retries.
+    """
+    def __init__(self, name, handler, on_failure=None):
+        self.name = name
+        self.handler = handler
+        self.on_failure = on_failure
+
+
+def register(name, on_failure=None):
+    """
+    Decorator registering `handler(payload)` under `name`.
+
+    `on_failure(payload, error)` is called once a job has exhausted its attempts.
+    """
+    def decorator(handler):
+        _registry[name] = Task(name, handler, on_failure)
+        return handler
+    return decorator
+
+
+def enqueue(name, payload=None, max_attempts=None):
+    """
+    Stores a job for the worker. When called inside a transaction, the job
+    only becomes visible to workers once that transaction commits.
+    """
+    if name not in _registry:
+        raise ValueError(f"No job handler registered for '{name}'")
+
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        max_attempts=max_attempts or Config.jobs_max_attempts,
+    )
+
+
+def claim_next():
+    """
+    Atomically marks the next runnable job as running and returns it.
+
+    Jobs left running by a crashed worker become claimable again after
+    Config.jobs_lock_timeout seconds. On Postgres, SKIP LOCKED lets several
+    workers poll the table without blocking each other.
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=Config.jobs_lock_timeout)
+
+    with transaction.atomic():
+        queryset = Job.objects.filter(
+            Q(status=Job.STATUS_QUEUED, run_after__lte=now) |
+            Q(status=Job.STATUS_RUNNING, locked_at__lt=stale_before)
+        ).order_by('run_after', 'id')
+
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+
+        job = queryset.first()
+        if job is None:
+            return None
+
+        job.status = Job.STATUS_RUNNING
+        job.locked_at = now
+        job.attempts += 1
+        job.save(update_fields=['status', 'locked_at', 'attempts', 'updated_at'])
+    return job
+
+
+def run_job(job):
+    """
+    Runs a claimed job and records the outcome. Returns True on success.
+    """
+    task = _registry.get(job.name)
+
+    try:
+        if task is None:
+            raise LookupError(f"No job handler registered for '{job.name}'")
+        task.handler(job.payload)
+    except Exception as e:
+        job.last_error = traceback.format_exc()
+        job.locked_at = None
+
+        if job.attempts >= job.max_attempts or task is None:
+            job.status = Job.STATUS_FAILED
+            logger.error(f"Job {job.id} ({job.name}) failed permanently: {e}")
+            if task is not None and task.on_failure is not None:
+                try:
+                    task.on_failure(job.payload, e)
+                except Exception:
+                    # The job has failed either way; a broken hook must not stop the worker
+                    logger.exception(f"on_failure hook of job {job.id} ({job.name}) raised")
+        else:
+            # Exponential backoff between attempts
+            job.status = Job.STATUS_QUEUED
+            job.run_after = timezone.now() + timedelta(
+                seconds=Config.jobs_retry_delay * (2 ** (job.attempts - 1))
+            )
+            logger.warning(f"Job {job.id} ({job.name}) failed, retrying: {e}")
+
+        job.save(update_fields=['status', 'locked_at', 'last_error', 'run_after', 'updated_at'])
+        return False
+
+    job.status = Job.STATUS_DONE
+    job.locked_at = None
+    job.last_error = ""
+    job.save(update_fields=['status', 'locked_at', 'last_error', 'updated_at'])
+    return True
+
+
+def run_pending(max_jobs=None):
+    """
+    Runs queued jobs until none are runnable (or max_jobs ran). Returns the count.
+    """
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        job = claim_next()
+        if job is None:
+            break
+        run_job(job)
+        processed += 1
+    return processed
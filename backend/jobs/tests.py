@@ -0,0 +1,65 @@
+from datetime import timedelta
+from django.utils import timezone
+from jobs import queue
+from jobs.models import Job
+from SocialStack.testing import SocialStackTestCase
+from unittest import mock
+
+
+class QueueTests(SocialStackTestCase):
+    """
+    Failed jobs are retried with backoff, then marked failed with their
+    on_failure hook called once, and the worker carries on whatever the hook does.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.handler = mock.Mock(side_effect=RuntimeError("upload failed"))
+        self.on_failure = mock.Mock()
+        registry = mock.patch.dict(queue._registry, {
+            "flaky": queue.Task("flaky", self.handler, self.on_failure),
+            "ok": queue.Task("ok", mock.Mock()),
+        })
+        registry.start()
+        self.addCleanup(registry.stop)
+
+    def make_runnable(self):
+        Job.objects.update(run_after=timezone.now() - timedelta(seconds=1))
+
+    def test_retries_then_fails(self):
+        job = queue.enqueue("flaky", {"n": 1}, max_attempts=2)
+
+        with self.assertLogs("jobs.queue", level="WARNING"):
+            self.assertEqual(queue.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_QUEUED, 1))
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn("upload failed", job.last_error)
+        # Backing off: nothing is runnable yet
+        self.assertEqual(queue.run_pending(), 0)
+        self.on_failure.assert_not_called()
+
+        self.make_runnable()
+        with self.assertLogs("jobs.queue", level="ERROR"):
+            self.assertEqual(queue.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_FAILED, 2))
+        self.assertEqual(self.handler.call_count, 2)
+        self.on_failure.assert_called_once()
+        self.assertEqual(self.on_failure.call_args.args[0], {"n": 1})
+
+    def test_failing_hook_does_not_stop_the_worker(self):
+        self.on_failure.side_effect = RuntimeError("hook failed")
+        failing = queue.enqueue("flaky", max_attempts=1)
+        following = queue.enqueue("ok")
+
+        with self.assertLogs("jobs.queue", level="ERROR") as logs:
+            self.assertEqual(queue.run_pending(), 2)
+
+        self.assertTrue(any("on_failure hook" in line for line in logs.output))
+        self.assertEqual(Job.objects.get(id=failing.id).status, Job.STATUS_FAILED)
+        self.assertEqual(Job.objects.get(id=following.id).status, Job.STATUS_DONE)
+
+    def test_unknown_names_are_refused(self):
+        with self.assertRaises(ValueError):
+            queue.enqueue("missing")
@@ -1,6 +1,19 @@
 from django.apps import AppConfig
+from django.core.exceptions import ImproperlyConfigured
 
 
 class SocialConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'social'
+
+    def ready(self):
+        # Register cache invalidation receivers
+        from social import signals  # noqa: F401
+        from social.cache import cache_is_process_local
+        from social.like_buffer import enabled
+
+        if enabled() and cache_is_process_local():
+            # Each process would buffer, count and flush its own likes
+            raise ImproperlyConfigured(
+                "LIKES_WRITE_BEHIND needs a shared cache; set CACHE_BACKEND to Redis or Memcached."
+            )
@@ -0,0 +1,91 @@
+import hashlib
+import time
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from SocialStack.conditional import make_etag
+
+# Version namespaces that cached data is keyed on
+POSTS_VERSION = "posts"  # post creates/deletes (page totals)
+FEED_VERSION = "feed"    # anything rendered in a feed page: posts, likes, comments, authors
+USERS_VERSION = "users"  # user creates and profile changes (autocomplete results)
+LIKES_VERSION = "likes"  # likes held by the write-behind buffer (feed overlays, not cached pages)
+
+
+def cache_is_process_local():
+    """
+    True when the default cache only lives in this process (LocMem, Dummy),
+    so versions bumped here are never seen by the API or other workers.
+    """
+    return isinstance(caches["default"], (LocMemCache, DummyCache))
+
+
+def _version_key(namespace):
+    return f"social:version:{namespace}"
+
+
+def get_version(namespace):
+    """
+    Returns the current version number for a namespace.
+
+    A missing version is seeded from the clock, so a cold or evicted cache
+    never hands out a version that older cached entries were keyed on.
+    """
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(namespace):
+    """
+    Invalidates everything keyed on the namespace by moving it to a new version.
+    """
+    key = _version_key(namespace)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Key was missing or evicted; seed it and retry once
+        get_version(namespace)
+        return cache.incr(key)
+
+
+def feed_page_cache_key(request):
+    """
+    Cache key for the user-independent part of a global feed page.
+
+    The absolute URL covers page, page size, cursor and payload version (and
+    the host the pagination links are built from); the feed version makes
+    every write invalidate all cached pages at once.
+    """
+    digest = hashlib.md5(request.build_absolute_uri().encode('utf-8')).hexdigest()
+    return f"social:feed:{get_version(FEED_VERSION)}:{digest}"
+
+
+def autocomplete_cache_key(prefix):
+    """
+    Cache key for user autocomplete results of a (case-insensitive) prefix.
+    """
+    digest = hashlib.md5(prefix.lower().encode('utf-8')).hexdigest()
+    return f"social:autocomplete:{get_version(USERS_VERSION)}:{digest}"
+
+
+def feed_etag(request, *parts):
+    """
+    Validator for a viewer's feed or dashboard page.
+
+    The absolute URL covers page, cursor and payload version; the viewer's id
+    and admin flag cover same_user and permissionToDelete; the feed version
+    covers everything else rendered in a page, and the likes version the
+    buffered likes that are overlaid on top of it.
+
+    None on a process-local cache, where each worker has its own versions.
+    """
+    if cache_is_process_local():
+        return None
+    return make_etag(
+        request, *parts, request.build_absolute_uri(), request.user.id, request.user.is_admin,
+        get_version(FEED_VERSION), get_version(LIKES_VERSION)
+    )
@@ -0,0 +1,186 @@
+"""
+Real-time feed events pushed to clients over Server-Sent Events.
+
+Writes publish small events (new post, like counts, new comment) once their
+transaction commits; `social/events/` streams them to every connected
+client. The stream is an async view served by its own ASGI service
+(uvicorn), so an idle connection is a parked coroutine rather than a
+thread, while the API stays on WSGI.
+
+EventSource cannot send an Authorization header, so clients first POST to
+`social/events/ticket/` with their access token and open the stream with
+the returned `?ticket=`. Tickets are random, short-lived and single use,
+so no credential ends up in URLs and access logs.
+
+The channel layer is pluggable (Config.events_channel_layer).
+InMemoryChannelLayer fans events out inside the current process, which
+covers runserver and the tests. RedisChannelLayer carries events from the
+API and worker processes to the separate stream service.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import secrets
+import threading
+import time
+from configuration import Config
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+POST_CREATED = "post.created"
+POST_DELETED = "post.deleted"
+POST_LIKES = "post.likes"
+COMMENT_CREATED = "comment.created"
+COMMENT_LIKES = "comment.likes"
+
+
+class Subscription:
+    """
+    One connected client: a bounded queue owned by the client's event loop.
+    """
+    def __init__(self, loop, max_queued):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=max_queued)
+
+    def offer(self, event):
+        # Runs on the subscriber's loop; a slow client loses its oldest events
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class InMemoryChannelLayer:
+    """
+    Process-local fan-out. publish() may be called from any thread.
+    """
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def subscribe(self):
+        """Must be called from the event loop that will read the subscription."""
+        subscription = Subscription(asyncio.get_running_loop(), Config.events_queue_size)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event):
+        self._fan_out({"id": next(self._ids), **event})
+
+    def _fan_out(self, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # The subscriber's loop is closed
+                self.unsubscribe(subscription)
+
+
+class RedisChannelLayer(InMemoryChannelLayer):
+    """
+    Cross-process fan-out over Redis pub/sub (Config.events_redis_url).
+
+    publish() sends the event to a Redis channel from any process. Processes
+    with subscribers run one listener thread that hands every received event
+    to the local subscriptions, the way InMemoryChannelLayer does.
+    """
+    CHANNEL = "social:events"
+    ID_KEY = "social:events:id"
+
+    def __init__(self):
+        import redis
+
+        super().__init__()
+        self._redis = redis.Redis.from_url(Config.events_redis_url)
+        self._listener = None
+
+    def subscribe(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name="events-listener", daemon=True)
+                self._listener.start()
+        return super().subscribe()
+
+    def publish(self, event):
+        # Ids come from Redis, so they are ordered across every publishing process
+        event = {"id": self._redis.incr(self.ID_KEY), **event}
+        self._redis.publish(self.CHANNEL, json.dumps(event))
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.CHANNEL)
+                for message in pubsub.listen():
+                    self._fan_out(json.loads(message["data"]))
+            except Exception:
+                logger.exception("Event listener lost its Redis connection; reconnecting")
+                time.sleep(1)
+
+
+_channel_layer = None
+
+
+def get_channel_layer():
+    global _channel_layer
+    if _channel_layer is None:
+        _channel_layer = import_string(Config.events_channel_layer)()
+    return _channel_layer
+
+
+def publish(event_type, data):
+    """
+    Publishes an event to connected clients after the current transaction commits.
+    """
+    event = {"type": event_type, "data": data}
+    transaction.on_commit(lambda: get_channel_layer().publish(event))
+
+
+def _ticket_key(ticket):
+    return f"social:events:ticket:{ticket}"
+
+
+def issue_stream_ticket(user_id):
+    """
+    Returns a random single-use ticket that opens one event stream for the
+    user within Config.events_ticket_ttl seconds.
+    """
+    ticket = secrets.token_urlsafe(32)
+    cache.set(_ticket_key(ticket), user_id, Config.events_ticket_ttl)
+    return ticket
+
+
+async def redeem_stream_ticket(ticket):
+    """
+    Returns the user id of a valid ticket and invalidates it, or None.
+
+    Claiming the ticket with add() is atomic, so of two requests racing with
+    the same ticket only one gets the stream.
+    """
+    if not ticket:
+        return None
+    user_id = await cache.aget(_ticket_key(ticket))
+    if user_id is None or not await cache.aadd(f"{_ticket_key(ticket)}:used", 1, Config.events_ticket_ttl):
+        return None
+    await cache.adelete(_ticket_key(ticket))
+    return user_id
+
+
+def format_sse(event):
+    """Encodes an event in the text/event-stream wire format."""
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
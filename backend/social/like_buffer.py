@@ -0,0 +1,334 @@
+"""
+Optional write-behind buffer for post likes (Config.likes_write_behind).
+
+With the buffer on, like/unlike requests never write PostLike or UserPost:
+- the viewer's intent per (user, post) is kept in the cache as a chain of
+  transitions; each one is claimed with cache.add, so of two concurrent
+  requests only one changes the state and logs it
+- every effective change is appended to a cache-backed log (seq -> slot)
+- pending likes and unlikes are counted per post (incr only, since
+  memcached cannot decrement below zero)
+
+`manage.py flush_like_buffer` drains the log periodically. It coalesces the
+slots per (user, post), applies them with one bulk insert and one delete,
+and moves the touched counters by the rows that changed (reconcile_counters
+does the exact recount). Reads add the pending state on top of
+the database (see pending_state), so users see their own action at once.
+
+Pending actions live only in the cache until flushed: a persistent shared
+cache (e.g. Redis) is required, and LocMem is refused at startup (see
+SocialConfig.ready). A cache flush loses them, like any write-behind scheme.
+
+The log position (SEQ_KEY, FLUSHED_KEY) and the pending counters are
+written without a timeout and must never be evicted: an evicted counter
+skews that post's displayed count, and an evicted FLUSHED_KEY makes the
+flusher re-walk deleted slots. Run Redis with a volatile-* eviction policy
+(see docker-compose), which only evicts keys that have a timeout.
+"""
+from accounts.models import User
+from collections import defaultdict
+from configuration import Config
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.functions import Greatest
+from social import events, models
+from social.cache import FEED_VERSION, LIKES_VERSION, bump_version
+
+SEQ_KEY = "social:likebuf:seq"
+FLUSHED_KEY = "social:likebuf:flushed"
+STALL_KEY = "social:likebuf:stall"
+LOCK_KEY = "social:likebuf:lock"
+
+# Written by the flusher over a slot it gave up waiting for
+SKIPPED_SLOT = "skipped"
+
+# Intents only feed reads, slots must survive until the next flush
+INTENT_TTL = 24 * 60 * 60
+SLOT_TTL = 7 * 24 * 60 * 60
+
+
+def _intent_key(user_id, post_id, n):
+    """Transition n of the (user, post) intent; n = 0 is the state in the database."""
+    return f"social:likebuf:intent:{user_id}:{post_id}:{n}"
+
+
+def _head_key(user_id, post_id):
+    """Latest known (n, liked) of the (user, post) intent, for reads."""
+    return f"social:likebuf:head:{user_id}:{post_id}"
+
+
+def _count_keys(post_id):
+    """Pending (likes, unlikes) counters of a post; the delta is their difference."""
+    return f"social:likebuf:likes:{post_id}", f"social:likebuf:unlikes:{post_id}"
+
+
+def _slot_key(seq):
+    return f"social:likebuf:slot:{seq}"
+
+
+def enabled():
+    return Config.likes_write_behind
+
+
+def _incr(key, amount=1):
+    """incr that creates a missing counter (never expiring)."""
+    cache.add(key, 0, timeout=None)
+    return cache.incr(key, amount)
+
+
+def _add_delta(post_id, delta):
+    likes_key, unlikes_key = _count_keys(post_id)
+    if delta > 0:
+        _incr(likes_key, delta)
+    elif delta < 0:
+        _incr(unlikes_key, -delta)
+
+
+def pending_state(user_id, post_ids):
+    """
+    Returns ({post_id: liked} for the user's buffered intents,
+    {post_id: pending likes_count delta}) with a single cache round trip.
+    """
+    keys = {}
+    for post_id in post_ids:
+        keys[_head_key(user_id, post_id)] = ('intent', post_id)
+        likes_key, unlikes_key = _count_keys(post_id)
+        keys[likes_key] = ('likes', post_id)
+        keys[unlikes_key] = ('unlikes', post_id)
+
+    intents, deltas = {}, defaultdict(int)
+    for key, value in cache.get_many(list(keys)).items():
+        kind, post_id = keys[key]
+        if kind == 'intent':
+            intents[post_id] = value[1]
+        elif kind == 'likes':
+            deltas[post_id] += value
+        else:
+            deltas[post_id] -= value
+    return intents, {post_id: delta for post_id, delta in deltas.items() if delta}
+
+
+def _set_head(user_id, post_id, n, liked):
+    """
+    Publishes transition n as the latest for reads. A transition claimed
+    meanwhile may have published its head before this one; it is followed
+    and republished, so the head always ends up at the newest.
+    """
+    while True:
+        cache.set(_head_key(user_id, post_id), (n, liked), INTENT_TTL)
+        later = cache.get(_intent_key(user_id, post_id, n + 1))
+        if later is None:
+            return
+        while later is not None:
+            n, liked = n + 1, later
+            later = cache.get(_intent_key(user_id, post_id, n + 1))
+
+
+def _transition(user_id, post_id, n, current, liked):
+    """
+    Moves the (user, post) intent from `current` (its state at transition n)
+    to `liked`. Transition n + 1 is claimed with cache.add, so when requests
+    race only one of them makes (and logs) the change.
+
+    Returns True when this call changed the intent.
+    """
+    while True:
+        later = cache.get(_intent_key(user_id, post_id, n + 1))
+        if later is not None:
+            n, current = n + 1, later
+            continue
+        if current == liked:
+            return False
+        if cache.add(_intent_key(user_id, post_id, n + 1), liked, INTENT_TTL):
+            _set_head(user_id, post_id, n + 1, liked)
+            return True
+
+
+def _append_slot(user_id, post_id, liked):
+    """
+    Logs a change under a new sequence number. A slot the flusher already
+    skipped as stalled (see _read_slots) is taken, and is logged again.
+    """
+    while True:
+        seq = _incr(SEQ_KEY)
+        if cache.add(_slot_key(seq), (user_id, post_id, liked), SLOT_TTL):
+            return seq
+
+
+def record_likes(user, operations):
+    """
+    Buffers (post_id, liked) operations for a user, in order.
+
+    Only operations that change the user's current state (buffered intent,
+    else the database) are logged, so repeats stay idempotent. Returns
+    {post_id: (liked, likes_count)} for the posts that exist, counts
+    including pending changes.
+    """
+    wanted = {}
+    for post_id, liked in operations:
+        wanted[post_id] = liked
+
+    stored_counts = dict(
+        models.UserPost.objects.filter(id__in=wanted).values_list('id', 'likes_count')
+    )
+    heads = cache.get_many([_head_key(user.id, post_id) for post_id in stored_counts])
+    states = {
+        post_id: heads[_head_key(user.id, post_id)]
+        for post_id in stored_counts if _head_key(user.id, post_id) in heads
+    }
+
+    unknown = [post_id for post_id in stored_counts if post_id not in states]
+    if unknown:
+        liked_in_db = set(
+            models.PostLike.objects.filter(user=user, post_id__in=unknown).values_list('post_id', flat=True)
+        )
+        for post_id in unknown:
+            states[post_id] = (0, post_id in liked_in_db)
+
+    changed = []
+    for post_id in stored_counts:
+        liked = wanted[post_id]
+        n, current = states[post_id]
+        if not _transition(user.id, post_id, n, current, liked):
+            continue
+        changed.append(post_id)
+        _append_slot(user.id, post_id, liked)
+        _add_delta(post_id, 1 if liked else -1)
+
+    if changed:
+        # Overlaid feed pages change before the flush bumps the feed version
+        bump_version(LIKES_VERSION)
+
+    _, deltas = pending_state(user.id, stored_counts)
+    results = {
+        post_id: (wanted[post_id], max(count + deltas.get(post_id, 0), 0))
+        for post_id, count in stored_counts.items()
+    }
+    for post_id in changed:
+        events.publish(events.POST_LIKES, {"post_id": post_id, "likes_count": results[post_id][1]})
+    return results
+
+
+def _read_slots(max_slots):
+    """
+    Returns (flushed, last, {(user_id, post_id): liked}, {post_id: delta},
+    skipped seqs) for the log slots after `flushed` up to `last`.
+
+    A missing slot is normally one whose writer sits between incr() and add();
+    reading stops before it. If it is still missing on the next flush
+    (evicted, or the writer died), SKIPPED_SLOT is added in its place: a
+    writer that finishes later then fails its add() and logs the change
+    again under a new seq, instead of leaving it (and its delta) unflushed.
+    """
+    flushed = cache.get(FLUSHED_KEY) or 0
+    latest = cache.get(SEQ_KEY) or 0
+    if latest < flushed:
+        # Sequence counter was evicted and restarted
+        flushed = 0
+        cache.set(FLUSHED_KEY, flushed, timeout=None)
+
+    start, end = flushed + 1, min(latest, flushed + max_slots)
+    slots = cache.get_many([_slot_key(seq) for seq in range(start, end + 1)])
+    stalled_at = cache.get(STALL_KEY)
+
+    final, deltas, skipped = {}, defaultdict(int), set()
+    last = flushed
+    for seq in range(start, end + 1):
+        slot = slots.get(_slot_key(seq))
+        if slot is None:
+            if seq != stalled_at:
+                cache.set(STALL_KEY, seq, SLOT_TTL)
+                break
+            if cache.add(_slot_key(seq), SKIPPED_SLOT, SLOT_TTL):
+                skipped.add(seq)
+            else:
+                # The writer finished just now
+                slot = cache.get(_slot_key(seq))
+        if slot is not None and slot != SKIPPED_SLOT:
+            user_id, post_id, liked = slot
+            final[(user_id, post_id)] = liked
+            deltas[post_id] += 1 if liked else -1
+        last = seq
+    return flushed, last, final, deltas, skipped
+
+
+def _apply(final):
+    """
+    Writes coalesced intents to PostLike and moves the touched counters by
+    the rows actually inserted and deleted.
+
+    Counters are adjusted with F() instead of recounted, so a flush costs
+    the same on a post with millions of likes. With the buffer on, only the
+    flusher (under LOCK_KEY) writes PostLike; any drift is repaired by
+    reconcile_counters.
+    """
+    post_ids = {post_id for _, post_id in final}
+    user_ids = {user_id for user_id, _ in final}
+    existing_posts = set(models.UserPost.objects.filter(id__in=post_ids).values_list('id', flat=True))
+    existing_users = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+    wanted = {
+        (user_id, post_id): liked for (user_id, post_id), liked in final.items()
+        if post_id in existing_posts and user_id in existing_users
+    }
+    if not wanted:
+        return
+
+    pairs = Q()
+    for user_id, post_id in wanted:
+        pairs |= Q(user_id=user_id, post_id=post_id)
+
+    with transaction.atomic():
+        liked_now = set(models.PostLike.objects.filter(pairs).values_list('user_id', 'post_id'))
+        likes, unlikes, deltas = [], Q(), defaultdict(int)
+        for (user_id, post_id), liked in wanted.items():
+            if liked and (user_id, post_id) not in liked_now:
+                likes.append(models.PostLike(user_id=user_id, post_id=post_id))
+                deltas[post_id] += 1
+            elif not liked and (user_id, post_id) in liked_now:
+                unlikes |= Q(user_id=user_id, post_id=post_id)
+                deltas[post_id] -= 1
+
+        if likes:
+            models.PostLike.objects.bulk_create(likes, ignore_conflicts=True)
+        if unlikes:
+            models.PostLike.objects.filter(unlikes).delete()
+        deltas = {post_id: delta for post_id, delta in deltas.items() if delta}
+        if deltas:
+            change = Case(
+                *[When(id=post_id, then=Value(delta)) for post_id, delta in deltas.items()],
+                default=Value(0), output_field=IntegerField()
+            )
+            models.UserPost.objects.filter(id__in=deltas).update(
+                likes_count=Greatest(F('likes_count') + change, Value(0))
+            )
+
+
+def flush(max_slots=None):
+    """
+    Applies buffered likes to the database. Returns the number of log slots consumed.
+    """
+    max_slots = max_slots or Config.likes_buffer_flush_size
+    if not cache.add(LOCK_KEY, 1, timeout=Config.likes_buffer_lock_timeout):
+        # Another flusher is running
+        return 0
+
+    try:
+        flushed, last, final, deltas, skipped = _read_slots(max_slots)
+        if last == flushed:
+            return 0
+
+        if final:
+            _apply(final)
+
+        cache.set(FLUSHED_KEY, last, timeout=None)
+        # Skipped markers stay until they expire, so late writers keep finding them
+        cache.delete_many([_slot_key(seq) for seq in range(flushed + 1, last + 1) if seq not in skipped])
+        # The database counts now include these changes
+        for post_id, delta in deltas.items():
+            _add_delta(post_id, -delta)
+        if final:
+            bump_version(FEED_VERSION)
+        return last - flushed
+    finally:
+        cache.delete(LOCK_KEY)
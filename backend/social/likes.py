@@ -0,0 +1,154 @@
+"""
+Idempotent like/unlike for posts and comments.
+
+On Postgres a like or unlike is one statement: the PostLike/CommentLike row
+is inserted with ON CONFLICT DO NOTHING (or deleted), the target's
+likes_count is adjusted only if a row actually changed, and the new count
+comes back via RETURNING. Nothing else on the post/comment row is written
+(no updated_at bump) and repeating a request is a no-op.
+
+Other backends use an equivalent ORM path inside a transaction.
+"""
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+
+def _names(like_model, target_field):
+    quote = connection.ops.quote_name
+    fk = like_model._meta.get_field(target_field)
+    target_model = fk.related_model
+    return {
+        "like_table": quote(like_model._meta.db_table),
+        "user_column": quote(like_model._meta.get_field('user').column),
+        "target_column": quote(fk.column),
+        "created_column": quote(like_model._meta.get_field('created_at').column),
+        "target_table": quote(target_model._meta.db_table),
+        "target_pk": quote(target_model._meta.pk.column),
+    }
+
+
+# Both statements return one (likes_count, changed) row, or no row when the target doesn't exist.
+# The fallback SELECT reads the pre-statement snapshot, which is only used when nothing changed.
+LIKE_SQL = """
+WITH inserted AS (
+    INSERT INTO {like_table} ({user_column}, {target_column}, {created_column})
+    SELECT %(user_id)s, %(target_id)s, %(now)s
+    WHERE EXISTS (SELECT 1 FROM {target_table} WHERE {target_pk} = %(target_id)s)
+    ON CONFLICT ({user_column}, {target_column}) DO NOTHING
+    RETURNING 1
+), updated AS (
+    UPDATE {target_table} SET likes_count = likes_count + 1
+    WHERE {target_pk} = %(target_id)s AND EXISTS (SELECT 1 FROM inserted)
+    RETURNING likes_count
+)
+SELECT likes_count, TRUE FROM updated
+UNION ALL
+SELECT likes_count, FALSE FROM {target_table}
+WHERE {target_pk} = %(target_id)s AND NOT EXISTS (SELECT 1 FROM updated)
+"""
+
+UNLIKE_SQL = """
+WITH deleted AS (
+    DELETE FROM {like_table}
+    WHERE {user_column} = %(user_id)s AND {target_column} = %(target_id)s
+    RETURNING 1
+), updated AS (
+    UPDATE {target_table} SET likes_count = GREATEST(likes_count - (SELECT COUNT(*) FROM deleted), 0)
+    WHERE {target_pk} = %(target_id)s AND EXISTS (SELECT 1 FROM deleted)
+    RETURNING likes_count
+)
+SELECT likes_count, TRUE FROM updated
+UNION ALL
+SELECT likes_count, FALSE FROM {target_table}
+WHERE {target_pk} = %(target_id)s AND NOT EXISTS (SELECT 1 FROM updated)
+"""
+
+
+def _set_like_postgres(like_model, target_field, user_id, target_id, liked):
+    sql = (LIKE_SQL if liked else UNLIKE_SQL).format(**_names(like_model, target_field))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {"user_id": user_id, "target_id": target_id, "now": timezone.now()})
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    likes_count, changed = row
+    return changed, likes_count
+
+
+def _set_like_orm(like_model, target_field, user_id, target_id, liked):
+    target_model = like_model._meta.get_field(target_field).related_model
+    target = target_model.objects.filter(pk=target_id)
+    lookup = {"user_id": user_id, f"{target_field}_id": target_id}
+
+    with transaction.atomic():
+        if not target.exists():
+            return None
+
+        if liked:
+            try:
+                with transaction.atomic():
+                    like_model.objects.create(**lookup)
+                changed = True
+            except IntegrityError:
+                changed = False
+            if changed:
+                target.update(likes_count=F('likes_count') + 1)
+        else:
+            deleted, _ = like_model.objects.filter(**lookup).delete()
+            changed = bool(deleted)
+            if changed:
+                target.update(likes_count=Greatest(F('likes_count') - deleted, 0))
+
+        likes_count = target.values_list('likes_count', flat=True).get()
+    return changed, likes_count
+
+
+def set_like(like_model, target_field, user_id, target_id, liked):
+    """
+    Makes `user_id` like (liked=True) or not like the target.
+
+    Returns (changed, likes_count) with the count after the operation, or
+    None when the target doesn't exist.
+    """
+    if connection.vendor == 'postgresql':
+        return _set_like_postgres(like_model, target_field, user_id, target_id, liked)
+    return _set_like_orm(like_model, target_field, user_id, target_id, liked)
+
+
+def toggle_like(set_like, target_id, user):
+    """
+    Unlikes if liked, likes otherwise, through the model's `set_like`
+    (UserPost.set_like, UserComment.set_like).
+
+    Returns (liked, likes_count), or None when the target doesn't exist.
+    """
+    result = set_like(target_id, user, False)
+    if result is None:
+        return None
+    changed, likes_count = result
+    if changed:
+        return False, likes_count
+
+    result = set_like(target_id, user, True)
+    if result is None:
+        return None
+    return True, result[1]
+
+
+def count_subquery(model, fk_name):
+    """
+    Correlated COUNT(*) of `model` rows pointing at the outer row through `fk_name`.
+    """
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{fk_name: OuterRef('pk')})
+            .order_by()
+            .values(fk_name)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
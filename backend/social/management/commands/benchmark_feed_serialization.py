@@ -0,0 +1,116 @@
+import statistics
+import time
+from accounts.models import Role, User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import BooleanField, Case, Prefetch, Value, When
+from social import models, projections, serializers
+
+
+class Rollback(Exception):
+    """Raised to discard the benchmark fixture data."""
+
+
+class Command(BaseCommand):
+    """
+    Compares building a feed page through the DRF serializers with the
+    values_list()/__slots__ projection used by the feed endpoints.
+
+    Fixture posts and comments are created inside a transaction that is
+    rolled back at the end, so the command leaves the database untouched.
+
+    Usage:
+        python manage.py benchmark_feed_serialization
+        python manage.py benchmark_feed_serialization --sizes 10 50 --repeat 200
+    """
+    help = "Benchmark serializer vs projection feed page building."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[10, 50],
+                            help="Page sizes to benchmark.")
+        parser.add_argument("--repeat", type=int, default=100,
+                            help="Timed runs per page size and path.")
+        parser.add_argument("--comments-per-post", type=int, default=3,
+                            help="Embedded comments created for each fixture post.")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                viewer = self.create_fixtures(max(options["sizes"]), options["comments_per_post"])
+                for size in options["sizes"]:
+                    self.run_size(viewer, size, options["repeat"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def create_fixtures(self, post_count, comments_per_post):
+        role, _ = Role.objects.get_or_create(name="user", defaults={"description": "user"})
+        authors = [
+            User(username=f"bench_feed_{index}", first_name="Bench", last_name=str(index), role=role)
+            for index in range(10)
+        ]
+        User.objects.bulk_create(authors)
+        authors = list(User.objects.filter(username__startswith="bench_feed_"))
+
+        posts = models.UserPost.objects.bulk_create([
+            models.UserPost(
+                user=authors[index % len(authors)],
+                post_desc=f"benchmark post {index} " * 5,
+                comments_count=comments_per_post,
+            )
+            for index in range(post_count)
+        ])
+        models.UserComment.objects.bulk_create([
+            models.UserComment(
+                user=authors[(index + offset) % len(authors)],
+                post=post,
+                comment=f"benchmark comment {offset}",
+            )
+            for index, post in enumerate(posts)
+            for offset in range(comments_per_post)
+        ])
+        return authors[0]
+
+    def page_queryset(self, viewer):
+        return models.UserPost.objects.filter(
+            user__username__startswith="bench_feed_"
+        ).annotate(
+            same_user=Case(
+                When(user__username=viewer.username, then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField()
+            )
+        ).order_by('-created_at', '-id')
+
+    def serializer_page(self, viewer, size):
+        posts = self.page_queryset(viewer).select_related('user').prefetch_related(
+            Prefetch('comments', queryset=models.UserComment.objects.select_related('user').order_by('-created_at'))
+        )[:size]
+        return serializers.PostSerializer(posts, many=True).data
+
+    def projection_page(self, viewer, size):
+        posts = list(projections.post_rows(self.page_queryset(viewer))[:size])
+        comments = projections.comment_rows(
+            models.UserComment.objects.filter(
+                post__id__in=[post.id for post in posts]
+            ).order_by('-created_at')
+        )
+        return projections.full_posts_payload(posts, comments)["socialPosts"]
+
+    def time_path(self, build, viewer, size, repeat):
+        build(viewer, size)  # warm up
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            build(viewer, size)
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def run_size(self, viewer, size, repeat):
+        serializer_ms = self.time_path(self.serializer_page, viewer, size, repeat)
+        projection_ms = self.time_path(self.projection_page, viewer, size, repeat)
+        self.stdout.write(
+            f"page_size={size}: serializers {serializer_ms:.2f} ms, "
+            f"projection {projection_ms:.2f} ms, "
+            f"speedup {serializer_ms / projection_ms:.1f}x"
+        )
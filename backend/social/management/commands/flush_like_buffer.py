@@ -0,0 +1,36 @@
+import time
+from django.core.management.base import BaseCommand
+from social import like_buffer
+
+
+class Command(BaseCommand):
+    """
+    Writes buffered likes (LIKES_WRITE_BEHIND=true) to the database.
+
+    Usage:
+        python manage.py flush_like_buffer                # flush once
+        python manage.py flush_like_buffer --interval 2   # flush every 2 seconds
+    """
+    help = "Flush the write-behind like buffer to PostLike/UserPost."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=None,
+                            help="Keep running and flush every N seconds.")
+        parser.add_argument("--max-slots", type=int, default=None,
+                            help="Buffered actions to consume per flush (default LIKES_BUFFER_FLUSH_SIZE).")
+
+    def handle(self, *args, **options):
+        while True:
+            # Drain everything that is pending, one bounded flush at a time
+            total = 0
+            while True:
+                flushed = like_buffer.flush(options["max_slots"])
+                total += flushed
+                if not flushed:
+                    break
+            if total:
+                self.stdout.write(f"Flushed {total} buffered like action(s)")
+
+            if options["interval"] is None:
+                break
+            time.sleep(options["interval"])
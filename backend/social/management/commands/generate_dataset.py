@@ -0,0 +1,336 @@
+import csv
+import io
+import itertools
+import time
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from random import Random
+from accounts.models import Role, User
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from social import models
+from social.cache import FEED_VERSION, POSTS_VERSION, USERS_VERSION, bump_version
+
+FIRST_NAMES = ["Aarav", "Diya", "Kabir", "Meera", "Rohan", "Sara", "Vihaan", "Anaya", "Arjun", "Isha"]
+LAST_NAMES = ["Sharma", "Patel", "Iyer", "Khan", "Das", "Singh", "Nair", "Gupta", "Rao", ""]
+WORDS = (
+    "the a to and of in is for on with today new post photo friends weekend coffee code "
+    "travel music love great day work team launch idea happy thanks life city food"
+).split()
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def zipf_cum_weights(rng, count, exponent):
+    """
+    Cumulative Zipf weights (1 / rank ** exponent) with ranks shuffled over
+    the items, for Random.choices(cum_weights=...).
+    """
+    ranks = list(range(1, count + 1))
+    rng.shuffle(ranks)
+    return list(itertools.accumulate(1.0 / rank ** exponent for rank in ranks))
+
+
+def zipf_counts(rng, count, total, exponent, cap):
+    """
+    Splits roughly `total` occurrences over `count` items by Zipf popularity,
+    capping each item at `cap`. A few items get most of them, most get few.
+    """
+    ranks = list(range(1, count + 1))
+    rng.shuffle(ranks)
+    weights = [1.0 / rank ** exponent for rank in ranks]
+    scale = total / sum(weights) if weights else 0
+    counts = array('l')
+    for weight in weights:
+        expected = weight * scale
+        value = int(expected)
+        if rng.random() < expected - value:
+            value += 1
+        counts.append(min(value, cap))
+    return counts
+
+
+def distinct_choices(rng, population, cum_weights, k):
+    """
+    k distinct indexes in range(population), drawn by weight.
+
+    Heavy posts that need a large share of all users are sampled uniformly,
+    and a draw that keeps hitting the same popular users is topped up
+    uniformly from the rest.
+    """
+    if k == 0:
+        return []
+    if k * 2 >= population:
+        return rng.sample(range(population), k)
+
+    picked = {}
+    for _ in range(4):
+        for index in rng.choices(range(population), cum_weights=cum_weights, k=2 * (k - len(picked))):
+            if index not in picked:
+                picked[index] = None
+                if len(picked) == k:
+                    return list(picked)
+    rest = [index for index in range(population) if index not in picked]
+    return list(picked) + rng.sample(rest, k - len(picked))
+
+
+@contextmanager
+def explicit_timestamps(*model_classes):
+    """
+    Turns off auto_now/auto_now_add so bulk_create keeps the generated timestamps.
+    """
+    fields = [
+        field for model in model_classes for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    """
+    Generates a large synthetic dataset for scale and performance testing.
+
+    Who posts, which posts get liked and who comments follow Zipf
+    distributions, so there are a few power users and viral posts and a
+    long tail of quiet ones. Denormalized likes_count/comments_count
+    columns are filled in consistently. The same --seed (and --until)
+    always produces the same data.
+
+    Rows are written with Postgres COPY when available, otherwise with
+    bulk_create, in --batch-size chunks inside one transaction.
+
+    Usage:
+        python manage.py generate_dataset --users 1000 --posts 10000
+        python manage.py generate_dataset --users 100000 --posts 1000000 --likes-per-post 10
+        python manage.py generate_dataset --seed 7 --prefix load_ --no-copy
+    """
+    help = "Generate a deterministic, Zipf-skewed synthetic dataset."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--posts", type=int, default=10000)
+        parser.add_argument("--likes-per-post", type=float, default=10.0,
+                            help="Average likes per post.")
+        parser.add_argument("--comments-per-post", type=float, default=2.0,
+                            help="Average comments per post.")
+        parser.add_argument("--likes-per-comment", type=float, default=1.0,
+                            help="Average likes per comment.")
+        parser.add_argument("--zipf-exponent", type=float, default=1.1,
+                            help="Skew of every popularity distribution (higher is more skewed).")
+        parser.add_argument("--days", type=int, default=365,
+                            help="Spread content over this many days before --until.")
+        parser.add_argument("--until", default=None,
+                            help="End of the time window (YYYY-MM-DD, UTC). Defaults to today.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--prefix", default="gen_",
+                            help="Username prefix of generated users.")
+        parser.add_argument("--batch-size", type=int, default=50000,
+                            help="Rows written per COPY / bulk_create call.")
+        parser.add_argument("--no-copy", action="store_true",
+                            help="Use bulk_create even on Postgres.")
+
+    def handle(self, *args, **options):
+        if options["users"] < 1 or options["posts"] < 0:
+            raise CommandError("--users must be at least 1 and --posts not negative.")
+        if User.objects.filter(username__startswith=options["prefix"]).exists():
+            raise CommandError(
+                f"Users prefixed '{options['prefix']}' already exist; use another --prefix or a fresh database."
+            )
+
+        self.rng = Random(options["seed"])
+        self.exponent = options["zipf_exponent"]
+        self.batch_size = options["batch_size"]
+        self.use_copy = connection.vendor == "postgresql" and not options["no_copy"]
+
+        until = (
+            datetime.strptime(options["until"], "%Y-%m-%d") if options["until"]
+            else datetime.now(dt_timezone.utc).replace(tzinfo=None)
+        ).replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=dt_timezone.utc)
+        self.until = until.timestamp()
+        self.start = (until - timedelta(days=options["days"])).timestamp()
+
+        self.stdout.write(f"Writing with {'COPY' if self.use_copy else 'bulk_create'}")
+        started = time.perf_counter()
+        with transaction.atomic(), explicit_timestamps(User, models.UserPost, models.UserComment,
+                                                       models.PostLike, models.CommentLike):
+            user_ids = self.create_users(options["users"], options["prefix"])
+            post_ids, post_times = self.create_posts(
+                user_ids, options["posts"], options["likes_per_post"], options["comments_per_post"]
+            )
+            self.create_post_likes(user_ids, post_ids, post_times)
+            comment_ids, comment_times = self.create_comments(user_ids, post_ids, post_times,
+                                                              options["likes_per_comment"])
+            self.create_comment_likes(user_ids, comment_ids, comment_times)
+
+        if self.use_copy:
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+        for namespace in (POSTS_VERSION, FEED_VERSION, USERS_VERSION):
+            bump_version(namespace)
+        self.stdout.write(self.style.SUCCESS(f"Dataset generated in {time.perf_counter() - started:.1f}s"))
+
+    # Writing
+
+    def insert(self, model, columns, rows):
+        """
+        Writes tuples of `columns` values in batches; returns the number of rows.
+
+        Columns left out get their model defaults, which COPY would not apply.
+        """
+        extra = [
+            field for field in model._meta.concrete_fields
+            if not field.primary_key and field.attname not in columns
+        ]
+        if extra:
+            columns = list(columns) + [field.attname for field in extra]
+            defaults = tuple(field.get_default() for field in extra)
+            rows = (row + defaults for row in rows)
+
+        started, count = time.perf_counter(), 0
+        for batch in batched(rows, self.batch_size):
+            if self.use_copy:
+                self.copy(model, columns, batch)
+            else:
+                model.objects.bulk_create([model(**dict(zip(columns, row))) for row in batch])
+            count += len(batch)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{model.__name__}: {count} rows in {elapsed:.1f}s ({count / max(elapsed, 1e-9):,.0f} rows/s)"
+        )
+        return count
+
+    def copy(self, model, columns, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([r"\N" if value is None else value for value in row])
+        buffer.seek(0)
+
+        quote = connection.ops.quote_name
+        db_columns = ", ".join(quote(model._meta.get_field(column).column) for column in columns)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {quote(model._meta.db_table)} ({db_columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                buffer
+            )
+
+    def inserted_ids(self, model, after_id):
+        """Ids of the rows written after `after_id`, in insertion order."""
+        return array('q', model.objects.filter(id__gt=after_id).order_by('id').values_list('id', flat=True))
+
+    def last_id(self, model):
+        return model.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+
+    def timestamp(self, seconds):
+        return datetime.fromtimestamp(seconds, dt_timezone.utc)
+
+    def later(self, seconds):
+        """A random moment between `seconds` and the end of the window."""
+        return seconds + self.rng.random() * (self.until - seconds)
+
+    # Tables
+
+    def create_users(self, count, prefix):
+        rng = self.rng
+        role, _ = Role.objects.get_or_create(name="user", defaults={"description": "user"})
+        span = self.until - self.start
+
+        def rows():
+            for index in range(count):
+                username = f"{prefix}{index}"
+                yield (
+                    username, UNUSABLE_PASSWORD_PREFIX, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES),
+                    f"{username}@example.com", rng.choice("MFO"), rng.choice(("light", "dark")),
+                    role.id, self.timestamp(self.start + rng.random() * span),
+                )
+
+        after = self.last_id(User)
+        self.insert(User, ("username", "password", "first_name", "last_name", "email",
+                           "gender", "theme", "role_id", "date_joined"), rows())
+        return self.inserted_ids(User, after)
+
+    def create_posts(self, user_ids, count, likes_per_post, comments_per_post):
+        rng = self.rng
+        # Power users write most posts
+        authors = rng.choices(range(len(user_ids)), cum_weights=zipf_cum_weights(rng, len(user_ids), self.exponent), k=count)
+        span = self.until - self.start
+        post_times = array('d', sorted(self.start + rng.random() * span for _ in range(count)))
+        self.like_counts = zipf_counts(rng, count, count * likes_per_post, self.exponent, len(user_ids))
+        self.comment_counts = zipf_counts(rng, count, count * comments_per_post, self.exponent, 10 ** 6)
+
+        def rows():
+            for index in range(count):
+                created_at = self.timestamp(post_times[index])
+                yield (
+                    user_ids[authors[index]], " ".join(rng.choices(WORDS, k=rng.randint(4, 30))),
+                    self.like_counts[index], self.comment_counts[index], created_at, created_at,
+                )
+
+        after = self.last_id(models.UserPost)
+        self.insert(models.UserPost, ("user_id", "post_desc", "likes_count", "comments_count",
+                                      "created_at", "updated_at"), rows())
+        return self.inserted_ids(models.UserPost, after), post_times
+
+    def create_post_likes(self, user_ids, post_ids, post_times):
+        rng = self.rng
+        likers = zipf_cum_weights(rng, len(user_ids), self.exponent)
+
+        def rows():
+            for index, post_id in enumerate(post_ids):
+                for user_index in distinct_choices(rng, len(user_ids), likers, self.like_counts[index]):
+                    yield user_ids[user_index], post_id, self.timestamp(self.later(post_times[index]))
+
+        self.insert(models.PostLike, ("user_id", "post_id", "created_at"), rows())
+
+    def create_comments(self, user_ids, post_ids, post_times, likes_per_comment):
+        rng = self.rng
+        # A separate, long-tail set of commenters
+        commenters = zipf_cum_weights(rng, len(user_ids), self.exponent)
+        total = sum(self.comment_counts)
+        self.comment_like_counts = zipf_counts(rng, total, total * likes_per_comment, self.exponent, len(user_ids))
+        comment_times = array('d')
+
+        def rows():
+            position = 0
+            for index, post_id in enumerate(post_ids):
+                count = self.comment_counts[index]
+                for user_index in rng.choices(range(len(user_ids)), cum_weights=commenters, k=count):
+                    seconds = self.later(post_times[index])
+                    comment_times.append(seconds)
+                    created_at = self.timestamp(seconds)
+                    yield (
+                        user_ids[user_index], post_id, " ".join(rng.choices(WORDS, k=rng.randint(2, 15))),
+                        self.comment_like_counts[position], created_at, created_at,
+                    )
+                    position += 1
+
+        after = self.last_id(models.UserComment)
+        self.insert(models.UserComment, ("user_id", "post_id", "comment", "likes_count",
+                                         "created_at", "updated_at"), rows())
+        return self.inserted_ids(models.UserComment, after), comment_times
+
+    def create_comment_likes(self, user_ids, comment_ids, comment_times):
+        rng = self.rng
+        likers = zipf_cum_weights(rng, len(user_ids), self.exponent)
+
+        def rows():
+            for index, comment_id in enumerate(comment_ids):
+                for user_index in distinct_choices(rng, len(user_ids), likers, self.comment_like_counts[index]):
+                    yield user_ids[user_index], comment_id, self.timestamp(self.later(comment_times[index]))
+
+        self.insert(models.CommentLike, ("user_id", "comment_id", "created_at"), rows())
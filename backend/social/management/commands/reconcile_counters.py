@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+from social import models
+from social.likes import count_subquery
+
+
+class Command(BaseCommand):
+    """
+    Rebuilds the denormalized likes_count/comments_count columns from the
+    PostLike, UserComment and CommentLike tables.
+
+    Only rows whose stored counter has drifted are rewritten, so the command
+    is cheap to run periodically.
+
+    Usage:
+        python manage.py reconcile_counters
+        python manage.py reconcile_counters --dry-run
+    """
+    help = "Rebuild and reconcile denormalized like/comment counters."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report drifted rows without updating them.",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+
+        # (model, {counter column: (counted model, fk name)})
+        targets = [
+            (models.UserPost, {
+                "likes_count": (models.PostLike, 'post'),
+                "comments_count": (models.UserComment, 'post'),
+            }),
+            (models.UserComment, {
+                "likes_count": (models.CommentLike, 'comment'),
+            }),
+        ]
+
+        for model, counters in targets:
+            actual = {
+                column: count_subquery(counted_model, fk_name)
+                for column, (counted_model, fk_name) in counters.items()
+            }
+
+            drift_filter = Q()
+            for column in counters:
+                drift_filter |= ~Q(**{column: F(f"actual_{column}")})
+
+            drifted_ids = list(
+                model.objects.annotate(
+                    **{f"actual_{column}": expression for column, expression in actual.items()}
+                ).filter(drift_filter).values_list('id', flat=True)
+            )
+            self.stdout.write(
+                f"{model.__name__}: {len(drifted_ids)} row(s) with drifted counters"
+            )
+
+            if dry_run or not drifted_ids:
+                continue
+
+            with transaction.atomic():
+                model.objects.filter(id__in=drifted_ids).update(**actual)
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING("Dry run: no counters were updated."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Counters reconciled."))
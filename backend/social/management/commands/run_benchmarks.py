@@ -0,0 +1,325 @@
+import gc
+import json
+import math
+import platform
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+from accounts.models import User
+from accounts.tokens import get_token_for_user
+from configuration import Config
+from django import get_version
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+from io import StringIO
+from social import models
+from social.cache import FEED_VERSION, LIKES_VERSION, POSTS_VERSION, USERS_VERSION, bump_version
+from unittest import mock
+
+PERCENTILES = (50, 90, 95, 99)
+
+# Metrics checked against the baseline: (name, kind) where kind picks the tolerance
+COMPARED_METRICS = (("p50_ms", "latency"), ("p95_ms", "latency"), ("queries", "queries"),
+                    ("peak_memory_kb", "memory"))
+
+
+class Rollback(Exception):
+    """Raised to discard the benchmark dataset."""
+
+
+class QueryCounter:
+    """
+    Database execute wrapper counting queries.
+
+    CaptureQueriesContext slices connection.queries, which the test client
+    resets at the start of every request.
+    """
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def use_database(alias):
+    """
+    Points the default connection at `alias`, so the ORM, raw cursors and
+    transactions of the code under test all run against it.
+    """
+    default = connections[DEFAULT_DB_ALIAS]
+    connections[DEFAULT_DB_ALIAS] = connections[alias]
+    try:
+        yield
+    finally:
+        connections[DEFAULT_DB_ALIAS] = default
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    """
+    Benchmarks the feed, dashboard, search, like and comment endpoints
+    in-process through the test client, against generated datasets of
+    several sizes.
+
+    Everything runs against the scratch database named by --database, which
+    must not be the default (production) one. Every size is generated there
+    with generate_dataset inside a transaction that is rolled back
+    afterwards. Requests carry a real access token, so authentication is
+    part of each timing.
+
+    Per scenario it records latency percentiles over --repeat requests, the
+    queries per request and the peak Python memory (tracemalloc) of a
+    request. Query count and memory are measured in separate runs so they
+    do not slow down the timed ones. Likes are written directly even when
+    LIKES_WRITE_BEHIND is on, since the buffer would outlive the dataset.
+
+    Results are written as JSON with --output. With --baseline, they are
+    compared against an earlier results file, and the command fails when a
+    metric is worse than its tolerance allows.
+
+    Usage:
+        python manage.py migrate --database benchmark
+        python manage.py run_benchmarks --database benchmark --output benchmarks.json
+        python manage.py run_benchmarks --database benchmark --sizes 1000 10000 --repeat 100
+        python manage.py run_benchmarks --database benchmark --baseline benchmarks.json --latency-tolerance 0.3
+    """
+    help = "Benchmark the API hot paths and compare them against a baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=None,
+                            help="Alias of the scratch database to benchmark against (e.g. benchmark).")
+        parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000],
+                            help="Posts in each generated dataset (users are a tenth of that).")
+        parser.add_argument("--repeat", type=int, default=50,
+                            help="Timed requests per scenario.")
+        parser.add_argument("--warmup", type=int, default=3,
+                            help="Untimed requests per scenario before timing.")
+        parser.add_argument("--scenarios", nargs="+", default=None,
+                            help="Only run these scenarios.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output", default=None,
+                            help="Write the results as JSON to this file.")
+        parser.add_argument("--baseline", default=None,
+                            help="Compare against a results file written earlier with --output.")
+        parser.add_argument("--latency-tolerance", type=float, default=0.25,
+                            help="Allowed relative latency increase (0.25 = 25%%).")
+        parser.add_argument("--query-tolerance", type=int, default=0,
+                            help="Allowed extra queries per request.")
+        parser.add_argument("--memory-tolerance", type=float, default=0.25,
+                            help="Allowed relative peak memory increase.")
+
+    def handle(self, *args, **options):
+        self.check_database(options["database"])
+        baseline = None
+        if options["baseline"]:
+            try:
+                with open(options["baseline"]) as baseline_file:
+                    baseline = json.load(baseline_file)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Could not read baseline {options['baseline']}: {e}")
+
+        results = {
+            "meta": {
+                "created_at": timezone.now().isoformat(),
+                "database": connections[options["database"]].vendor,
+                "python": platform.python_version(),
+                "django": get_version(),
+                "seed": options["seed"],
+                "repeat": options["repeat"],
+            },
+            "results": {},
+        }
+
+        # The test client's host, whatever the deployment allows
+        with use_database(options["database"]), \
+                override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            for size in options["sizes"]:
+                self.stdout.write(f"Dataset: {size} posts")
+                results["results"][str(size)] = self.run_size(size, options)
+
+        if options["output"]:
+            with open(options["output"], "w") as output_file:
+                json.dump(results, output_file, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            regressions = self.compare(results["results"], baseline.get("results", {}), options)
+            if regressions:
+                raise CommandError(f"{len(regressions)} metric(s) regressed beyond tolerance.")
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
+
+    def check_database(self, alias):
+        """
+        Refuses to generate data anywhere but a separate, non-production database.
+        """
+        if not alias:
+            raise CommandError("Pass --database with the alias of a scratch database (e.g. benchmark).")
+        if alias not in settings.DATABASES:
+            raise CommandError(f"Unknown database alias '{alias}'.")
+
+        target = connections[alias].settings_dict
+        production = connections[DEFAULT_DB_ALIAS].settings_dict
+        same_database = all(
+            target.get(key) == production.get(key) for key in ("ENGINE", "NAME", "HOST", "PORT")
+        )
+        if alias == DEFAULT_DB_ALIAS or same_database:
+            raise CommandError(
+                f"'{alias}' is the production database; benchmark against a scratch database instead."
+            )
+
+    def run_size(self, size, options):
+        # Buffered likes would outlive the rolled-back posts they point at
+        no_write_behind = mock.patch.object(Config, "likes_write_behind", False)
+        try:
+            with transaction.atomic(), no_write_behind:
+                call_command(
+                    "generate_dataset", users=max(size // 10, 10), posts=size,
+                    seed=options["seed"], prefix=f"bench_{size}_", stdout=StringIO()
+                )
+                size_results = {}
+                for name, scenario in self.scenarios(size).items():
+                    if options["scenarios"] and name not in options["scenarios"]:
+                        continue
+                    size_results[name] = self.measure(scenario, options["repeat"], options["warmup"])
+                    self.report(name, size_results[name])
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            # Drop cached pages and counts that were built from the rolled-back data
+            for namespace in (POSTS_VERSION, FEED_VERSION, USERS_VERSION, LIKES_VERSION):
+                bump_version(namespace)
+        return size_results
+
+    def scenarios(self, size):
+        """
+        Returns {name: (client, method, path, data factory, patches)}, using
+        the dataset's most active author and most commented post.
+        """
+        prefix = f"bench_{size}_"
+        viewer = User.objects.filter(username__startswith=prefix).annotate(
+            post_total=Count('posts')
+        ).order_by('-post_total', 'id').first()
+        post = models.UserPost.objects.filter(
+            user__username__startswith=prefix
+        ).order_by('-comments_count', 'id').first()
+
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {get_token_for_user(viewer).access_token}")
+        toggle = {"liked": False}
+
+        def next_like():
+            # Alternate so that every request changes the like
+            toggle["liked"] = not toggle["liked"]
+            return dict(toggle)
+
+        uncached = [mock.patch.object(Config, "feed_cache_ttl", 0)]
+        return {
+            "feed": (client, "get", "/social/posts/", None, []),
+            "feed_uncached": (client, "get", "/social/posts/", None, uncached),
+            "feed_v2_uncached": (client, "get", "/social/posts/?version=2", None, uncached),
+            "dashboard": (client, "get", f"/social/dashboard/{viewer.id}/", None, []),
+            "search": (client, "get", "/social/search/coffee/", None, []),
+            "like": (client, "post", f"/social/like/{post.id}/", next_like, []),
+            "comments": (client, "get", f"/social/comment/{post.id}/", None, []),
+        }
+
+    def request(self, scenario):
+        client, method, path, data, _ = scenario
+        if method == "post":
+            response = client.post(path, data(), content_type="application/json")
+        else:
+            response = client.get(path)
+        if response.status_code != 200:
+            raise CommandError(f"{method.upper()} {path} returned {response.status_code}")
+        return response
+
+    def measure(self, scenario, repeat, warmup):
+        patches = scenario[4]
+        for patch in patches:
+            patch.start()
+        try:
+            for _ in range(warmup):
+                self.request(scenario)
+
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                self.request(scenario)
+                timings.append((time.perf_counter() - started) * 1000)
+
+            # Two requests each, so a like and an unlike are both covered whatever the state
+            queries = QueryCounter()
+            with connection.execute_wrapper(queries):
+                for _ in range(2):
+                    self.request(scenario)
+
+            # Garbage from earlier requests would otherwise be counted against this one
+            gc.collect()
+            tracemalloc.start()
+            try:
+                for _ in range(2):
+                    self.request(scenario)
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        finally:
+            for patch in patches:
+                patch.stop()
+
+        timings.sort()
+        result = {f"p{pct}_ms": round(percentile(timings, pct), 3) for pct in PERCENTILES}
+        result.update({
+            "mean_ms": round(statistics.mean(timings), 3),
+            "max_ms": round(timings[-1], 3),
+            "queries": queries.count / 2,
+            "peak_memory_kb": round(peak / 1024, 1),
+        })
+        return result
+
+    def report(self, name, result):
+        self.stdout.write(
+            f"  {name:<18} p50 {result['p50_ms']:8.2f} ms  p95 {result['p95_ms']:8.2f} ms  "
+            f"p99 {result['p99_ms']:8.2f} ms  {result['queries']:5.1f} queries  "
+            f"{result['peak_memory_kb']:9.1f} KB"
+        )
+
+    def compare(self, results, baseline, options):
+        """
+        Prints every metric that is worse than its baseline by more than the
+        tolerance and returns them as (size, scenario, metric, baseline, current).
+        """
+        regressions = []
+        for size, scenarios in results.items():
+            for name, current in scenarios.items():
+                previous = baseline.get(size, {}).get(name)
+                if previous is None:
+                    continue
+                for metric, kind in COMPARED_METRICS:
+                    if metric not in previous:
+                        continue
+                    if kind == "queries":
+                        allowed = previous[metric] + options["query_tolerance"]
+                    else:
+                        allowed = previous[metric] * (1 + options[f"{kind}_tolerance"])
+                    if current[metric] > allowed:
+                        regressions.append((size, name, metric, previous[metric], current[metric]))
+
+        for size, name, metric, previous, current in regressions:
+            self.stdout.write(self.style.ERROR(
+                f"Regression: {size} posts / {name} / {metric}: {previous} -> {current}"
+            ))
+        return regressions
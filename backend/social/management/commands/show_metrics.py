@@ -0,0 +1,41 @@
+from accounts.images import IMAGE_METRICS
+from django.core.management.base import BaseCommand
+from social.cache import cache_is_process_local
+from SocialStack import metrics
+from SocialStack.middleware import COMPRESSION_METRICS, compression_ratio
+
+
+class Command(BaseCommand):
+    """
+    Prints the counters recorded in the shared cache.
+
+    Compression and 304 counters are flushed by each web process every
+    METRICS_FLUSH_INTERVAL seconds, so they trail by up to that long.
+
+    Usage:
+        python manage.py show_metrics
+    """
+    help = "Show the image processing, response compression and 304 counters."
+
+    def handle(self, *args, **options):
+        if cache_is_process_local():
+            self.stderr.write(self.style.WARNING(
+                "The cache is process-local: only counters recorded by this command's process are shown."
+            ))
+
+        counters = metrics.snapshot(IMAGE_METRICS)
+        for name, value in counters.items():
+            self.stdout.write(f"{name:<28} {value}")
+
+        if counters["images.bytes_in"]:
+            saved = counters["images.bytes_saved"] / counters["images.bytes_in"]
+            self.stdout.write(f"{'images.saved_ratio':<28} {saved:.1%}")
+
+        for name, value in metrics.snapshot(COMPRESSION_METRICS).items():
+            self.stdout.write(f"{name:<28} {value}")
+
+        ratio = compression_ratio()
+        if ratio is not None:
+            self.stdout.write(f"{'compression.ratio':<28} {ratio}")
+
+        self.stdout.write(f"{'http.not_modified':<28} {metrics.get('http.not_modified')}")
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.27 on 2026-10-18 09:32
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _count_subquery(model, fk_name):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{fk_name: OuterRef('pk')})
+            .order_by()
+            .values(fk_name)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def backfill_counters(apps, schema_editor):
+    UserPost = apps.get_model('social', 'UserPost')
+    UserComment = apps.get_model('social', 'UserComment')
+    PostLike = apps.get_model('social', 'PostLike')
+    CommentLike = apps.get_model('social', 'CommentLike')
+
+    UserPost.objects.update(
+        likes_count=_count_subquery(PostLike, 'post'),
+        comments_count=_count_subquery(UserComment, 'post'),
+    )
+    UserComment.objects.update(likes_count=_count_subquery(CommentLike, 'comment'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0004_alter_usercomment_imageurl_alter_userpost_imageurl'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usercomment',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userpost',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userpost',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
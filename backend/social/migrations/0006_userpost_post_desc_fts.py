@@ -0,0 +1,22 @@
+# Generated by Django 4.2.27 on 2026-10-18 09:38
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+from SocialStack.migration_operations import postgres_only_index
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('social', '0005_denormalized_counters'),
+    ]
+
+    operations = [
+        postgres_only_index(
+            'userpost',
+            django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('post_desc', config='english'), name='userpost_post_desc_fts'),
+        ),
+    ]
@@ -1,5 +1,8 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from accounts import models as acc_models
+from social import events, likes
+from social.cache import FEED_VERSION, bump_version
 
 # Create your models here.
 class UserPost(models.Model):
@@ -10,7 +13,16 @@ class UserPost(models.Model):
     post_desc = models.TextField()
     # imageurl = models.ImageField(upload_to='user_posts', blank=True, null=True)
     imageurl = models.URLField(blank=True, null=True)
+    # Set to pending while a background job uploads the image
+    image_status = models.CharField(
+        max_length=10,
+        choices=acc_models.IMAGE_STATUS_CHOICES,
+        default=acc_models.IMAGE_STATUS_NONE
+    )
     likes = models.ManyToManyField(acc_models.User, through='PostLike', related_name='liked_posts', blank=True)
+    # Denormalized counters, kept in sync by set_like (social.likes) and add_comment
+    likes_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
     editedPost = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -20,6 +32,8 @@ class UserPost(models.Model):
         indexes = [
             models.Index(fields=['-created_at']),
             models.Index(fields=['user', '-created_at']),
+            # The full-text GIN index (userpost_post_desc_fts) is Postgres-only and
+            # lives in migration 0006 alone, outside the migration state
         ]
 
     def __str__(self):
@@ -39,14 +53,93 @@ class UserPost(models.Model):
         """Check if a specific user has liked this post"""
         return self.likes.filter(id=user.id).exists()
 
+    @classmethod
+    def set_like(cls, post_id, user, liked):
+        """
+        Like or unlike a post by id without loading it (see social.likes).
+        Returns (changed, likes_count), or None if the post doesn't exist.
+        """
+        result = likes.set_like(PostLike, 'post', user.id, post_id, liked)
+        if result is not None and result[0]:
+            bump_version(FEED_VERSION)
+            events.publish(events.POST_LIKES, {"post_id": post_id, "likes_count": result[1]})
+        return result
+
+    @classmethod
+    def set_likes(cls, user, operations):
+        """
+        Applies a batch of (post_id, liked) operations for one user.
+
+        Each post appears at most once (PostsLikeBatch rejects repeats). All
+        likes are inserted with one bulk INSERT ... ON CONFLICT DO NOTHING and
+        all unlikes removed with one DELETE, in a single transaction. Counters of
+        the touched posts are recomputed from PostLike, which stays exact even if
+        single likes race with the batch.
+
+        Returns {post_id: (liked, likes_count)} for the posts that exist.
+        """
+        wanted = dict(operations)
+
+        with transaction.atomic():
+            existing = set(cls.objects.filter(id__in=wanted).values_list('id', flat=True))
+            currently_liked = set(
+                PostLike.objects.filter(user=user, post_id__in=existing).values_list('post_id', flat=True)
+            )
+            to_like = [post_id for post_id in existing if wanted[post_id] and post_id not in currently_liked]
+            to_unlike = [post_id for post_id in existing if not wanted[post_id] and post_id in currently_liked]
+
+            if to_like:
+                PostLike.objects.bulk_create(
+                    [PostLike(user=user, post_id=post_id) for post_id in to_like],
+                    ignore_conflicts=True
+                )
+            if to_unlike:
+                PostLike.objects.filter(user=user, post_id__in=to_unlike).delete()
+
+            changed = to_like + to_unlike
+            if changed:
+                cls.objects.filter(id__in=changed).update(
+                    likes_count=likes.count_subquery(PostLike, 'post')
+                )
+            counts = dict(cls.objects.filter(id__in=existing).values_list('id', 'likes_count'))
+
+        if changed:
+            bump_version(FEED_VERSION)
+            for post_id in changed:
+                events.publish(events.POST_LIKES, {"post_id": post_id, "likes_count": counts[post_id]})
+        return {post_id: (wanted[post_id], counts[post_id]) for post_id in existing}
+
+    def add_like(self, user):
+        """Like the post for a user; returns True when a like was added"""
+        result = UserPost.set_like(self.pk, user, True)
+        return bool(result and result[0])
+
+    def remove_like(self, user):
+        """Unlike the post for a user; returns True when a like was removed"""
+        result = UserPost.set_like(self.pk, user, False)
+        return bool(result and result[0])
+
+    def add_comment(self, **comment_fields):
+        """Create a comment on this post and bump comments_count in the same transaction"""
+        with transaction.atomic():
+            comment = UserComment.objects.create(post=self, **comment_fields)
+            UserPost.objects.filter(pk=self.pk).update(comments_count=F('comments_count') + 1)
+        bump_version(FEED_VERSION)
+        events.publish(events.COMMENT_CREATED, {
+            "post_id": self.pk, "comment_id": comment.id, "user_id": comment.user_id
+        })
+        return comment
+
     def toggle_like(self, user):
-        """Toggle like for a user - returns (liked: bool, count: int)"""
-        if self.is_liked_by(user):
-            self.likes.remove(user)
-            return False, self.like_count
-        else:
-            self.likes.add(user)
-            return True, self.like_count
+        """
+        Toggle like for a user - returns (liked: bool, count: int), or None if
+        the post no longer exists. Built on set_like, so caches are only
+        invalidated and an event only published when a like actually changed.
+        """
+        result = likes.toggle_like(UserPost.set_like, self.pk, user)
+        if result is not None:
+            self.likes_count = result[1]
+        return result
 
 
 class PostLike(models.Model):
@@ -82,6 +175,7 @@ class UserComment(models.Model):
     # imageurl = models.ImageField(upload_to='user_comments', blank=True, null=True)
     imageurl = models.URLField(blank=True, null=True)
     likes = models.ManyToManyField(acc_models.User, through='CommentLike', related_name='liked_comments', blank=True)
+    likes_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -104,14 +198,38 @@ class UserComment(models.Model):
         """Check if a specific user has liked this comment"""
         return self.likes.filter(id=user.id).exists()
 
+    @classmethod
+    def set_like(cls, comment_id, user, liked):
+        """
+        Like or unlike a comment by id without loading it (see social.likes).
+        Returns (changed, likes_count), or None if the comment doesn't exist.
+        """
+        result = likes.set_like(CommentLike, 'comment', user.id, comment_id, liked)
+        if result is not None and result[0]:
+            # Comment like counts are part of rendered feed pages
+            bump_version(FEED_VERSION)
+            events.publish(events.COMMENT_LIKES, {"comment_id": comment_id, "likes_count": result[1]})
+        return result
+
+    def add_like(self, user):
+        """Like the comment for a user; returns True when a like was added"""
+        result = UserComment.set_like(self.pk, user, True)
+        return bool(result and result[0])
+
+    def remove_like(self, user):
+        """Unlike the comment for a user; returns True when a like was removed"""
+        result = UserComment.set_like(self.pk, user, False)
+        return bool(result and result[0])
+
     def toggle_like(self, user):
-        """Toggle like for a user - returns (liked: bool, count: int)"""
-        if self.is_liked_by(user):
-            self.likes.remove(user)
-            return False, self.like_count
-        else:
-            self.likes.add(user)
-            return True, self.like_count
+        """
+        Toggle like for a user - returns (liked: bool, count: int), or None if
+        the comment no longer exists (see UserPost.toggle_like).
+        """
+        result = likes.toggle_like(UserComment.set_like, self.pk, user)
+        if result is not None:
+            self.likes_count = result[1]
+        return result
 
 
 class CommentLike(models.Model):
@@ -0,0 +1,272 @@
+import base64
+import binascii
+import hashlib
+import json
+from collections import OrderedDict
+from configuration import Config
+from datetime import datetime
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import connection
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import ParseError
+from rest_framework.pagination import BasePagination, PageNumberPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+from social.cache import POSTS_VERSION, get_version
+from social.search import SEARCH_ORDER_RELEVANCE
+
+
+def estimate_row_count(model):
+    """
+    Planner estimate of a table's row count from pg_class.reltuples.
+
+    Returns None on non-Postgres databases or for tables that were never analyzed.
+    """
+    if connection.vendor != 'postgresql':
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+            [model._meta.db_table]
+        )
+        row = cursor.fetchone()
+
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+def get_total_count(queryset):
+    """
+    Counts a paginated queryset according to Config.pagination_count_strategy.
+
+    - exact: COUNT(*) on every request.
+    - cached: COUNT(*) cached for pagination_count_cache_ttl seconds, keyed on
+      the query and the posts version so creates/deletes invalidate it.
+    - estimated: unfiltered querysets use the pg_class.reltuples estimate once
+      it is above pagination_estimate_threshold; anything else is cached.
+    """
+    strategy = Config.pagination_count_strategy
+
+    if strategy == 'estimated':
+        if not queryset.query.where:
+            estimate = estimate_row_count(queryset.model)
+            if estimate is not None and estimate >= Config.pagination_estimate_threshold:
+                return estimate
+        strategy = 'cached'
+
+    if strategy == 'cached':
+        try:
+            # Key on the bare row set so per-user annotations share one entry
+            sql, params = queryset.order_by().values('pk').query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        digest = hashlib.md5(f"{sql}{params}".encode('utf-8')).hexdigest()
+        key = f"social:count:{get_version(POSTS_VERSION)}:{digest}"
+        return cache.get_or_set(key, queryset.count, Config.pagination_count_cache_ttl)
+
+    return queryset.count()
+
+
+class PostPaginator(DjangoPaginator):
+    """
+    Django paginator whose total comes from the configured count strategy.
+    """
+    @cached_property
+    def count(self):
+        return get_total_count(self.object_list)
+
+
+class CustomPostPagination(PageNumberPagination):
+    """
+    Page-number paginator that returns a bounded window of page URLs.
+
+    Only the first and last pages plus `page_window` pages either side of
+    the current one are listed, so response size no longer grows with the
+    number of posts.
+    """
+    django_paginator_class = PostPaginator
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = int(Config.posts_per_page)
+    page_window = Config.pagination_page_window
+
+    def get_page_numbers(self, current_page, total_pages):
+        window_start = max(1, current_page - self.page_window)
+        window_end = min(total_pages, current_page + self.page_window)
+        return sorted({1, total_pages, *range(window_start, window_end + 1)})
+
+    def get_paginated_response(self, data):
+        total_pages = self.page.paginator.num_pages
+        current_page = self.page.number
+        url = self.request.build_absolute_uri()
+
+        # Build metadata for the windowed set of pages
+        page_urls = [
+            {
+                'page': page_num,
+                'url': replace_query_param(url, self.page_query_param, page_num),
+                'is_current': page_num == current_page
+            }
+            for page_num in self.get_page_numbers(current_page, total_pages)
+        ]
+
+        return Response(OrderedDict([
+            ('count', self.page.paginator.count),
+            ('total_pages', total_pages),
+            ('current_page', current_page),
+            ('page_size', self.page_size),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('pages', page_urls),
+            ('results', data)
+        ]))
+
+
+class KeysetPostPagination(BasePagination):
+    """
+    Cursor paginator that seeks on (created_at, id) instead of using OFFSET.
+
+    Pages are fetched with a range predicate that the `-created_at` and
+    `(user, -created_at)` indexes can satisfy directly, and no COUNT(*) is
+    issued, so every page costs the same regardless of its depth.
+    Cursors are opaque base64 tokens; `previous` cursors walk back towards
+    newer posts.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = int(Config.posts_per_page)
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        reverse = False
+        queryset = queryset.order_by('-created_at', '-id')
+        if position is not None:
+            created_at, post_id, reverse = position
+            if reverse:
+                # Walking backwards: fetch the newer rows closest to the cursor first
+                queryset = queryset.filter(
+                    Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=post_id)
+                ).order_by('created_at', 'id')
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=post_id)
+                )
+
+        # One extra row tells us whether another page exists without counting
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if reverse:
+            rows.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.build_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            # Past the end of the feed: step back to the newest page
+            url = self.request.build_absolute_uri()
+            return remove_query_param(url, self.cursor_query_param)
+        return self.build_link(self.page[0], reverse=True)
+
+    def build_link(self, item, reverse):
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.mode_query_param, 'cursor')
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(item, reverse))
+
+    def encode_cursor(self, item, reverse):
+        payload = {"t": item.created_at.isoformat(), "i": item.id}
+        if reverse:
+            payload["r"] = 1
+        encoded = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(encoded).decode('ascii')
+
+    def decode_cursor(self, request):
+        """
+        Returns (created_at, id, reverse) for the requested cursor, or None for
+        the first page. Malformed cursors are a 400 Bad Request.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            created_at = datetime.fromisoformat(payload["t"])
+            post_id = int(payload["i"])
+            reverse = bool(payload.get("r"))
+        except (binascii.Error, ValueError, TypeError, KeyError, UnicodeError):
+            raise ParseError(self.invalid_cursor_message)
+
+        # Cursors are always issued with an offset; a naive one was not made here
+        if created_at.tzinfo is None:
+            raise ParseError(self.invalid_cursor_message)
+
+        return created_at, post_id, reverse
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('page_size', self.page_size),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+
+class KeysetCommentPagination(KeysetPostPagination):
+    """
+    Cursor paginator for a single post's comments, seeking on the
+    (post, -created_at) index.
+    """
+    page_size = Config.comments_page_size
+
+
+def get_post_paginator(request):
+    """
+    Picks the paginator for a feed-style request.
+
+    Cursor mode is opt-in via `?pagination=cursor` (or any request carrying a
+    `cursor`); everything else keeps the page-number behaviour. Cursors
+    follow recency, so relevance-ordered searches always use page numbers.
+    """
+    params = request.query_params
+    if params.get('order') == SEARCH_ORDER_RELEVANCE:
+        return CustomPostPagination()
+    if (params.get(KeysetPostPagination.mode_query_param) == 'cursor'
+            or KeysetPostPagination.cursor_query_param in params):
+        return KeysetPostPagination()
+    return CustomPostPagination()
@@ -0,0 +1,280 @@
+"""
+Read-only projection of feed rows.
+
+Feed pages are built from `values_list()` tuples wrapped in small
+`__slots__` records instead of going through DRF ModelSerializers. Each
+record emits exactly the JSON that PostSerializer/CommentSerializer (v1) and
+the Compact*/SideloadedUser serializers (v2) produce; the serializers are
+still used for writes and single-object responses.
+
+Datetimes are emitted in the current time zone, as DateTimeField does, and
+left to the renderer to write as ISO 8601.
+"""
+from accounts.variants import avatar_variants, post_image_variants
+from collections import defaultdict
+from django.db.models.query import ValuesListIterable
+from django.utils import timezone
+
+
+class PostRow:
+    """
+    One feed post, with the author columns it needs flattened in.
+    """
+    columns = (
+        'id', 'imageurl', 'user_id', 'user__username', 'user__profile_image',
+        'user__first_name', 'user__last_name', 'user__gender', 'post_desc',
+        'editedPost', 'created_at', 'likes_count', 'comments_count',
+    )
+    __slots__ = (
+        'id', 'imageurl', 'user_id', 'username', 'user_profile_image',
+        'first_name', 'last_name', 'gender', 'post_desc',
+        'editedPost', 'created_at', 'likes_count', 'comments_count', 'same_user',
+        'is_liked', 'comments',
+    )
+
+    def __init__(self, id, imageurl, user_id, username, user_profile_image,
+                 first_name, last_name, gender, post_desc, editedPost,
+                 created_at, likes_count, comments_count):
+        self.id = id
+        self.imageurl = imageurl
+        self.user_id = user_id
+        self.username = username
+        self.user_profile_image = user_profile_image
+        self.first_name = first_name
+        self.last_name = last_name
+        self.gender = gender
+        self.post_desc = post_desc
+        self.editedPost = editedPost
+        self.created_at = created_at
+        self.likes_count = likes_count
+        self.comments_count = comments_count
+        # Viewer-specific flags are filled in by the feed's per-user overlay
+        self.same_user = False
+        self.is_liked = False
+        self.comments = []
+
+    def to_dict(self):
+        """Same keys, order and value types as PostSerializer"""
+        return {
+            'id': self.id,
+            'imageurl': self.imageurl,
+            'imageurl_variants': post_image_variants(self.imageurl),
+            'user_id': str(self.user_id),
+            'username': self.username,
+            'user_profile_image': self.user_profile_image or "",
+            'user_profile_image_variants': avatar_variants(self.user_profile_image),
+            'first_name': self.first_name,
+            'last_name': self.last_name,
+            'post_desc': self.post_desc,
+            'editedPost': self.editedPost,
+            'created_at_str': timezone.localtime(self.created_at),
+            'likes_count': self.likes_count,
+            'comments_count': self.comments_count,
+            'same_user': self.same_user,
+            'is_liked': self.is_liked,
+            'comments': self.comments,
+            'gender': self.gender,
+        }
+
+    def to_compact_dict(self):
+        """Same keys, order and value types as CompactPostSerializer"""
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'imageurl': self.imageurl,
+            'imageurl_variants': post_image_variants(self.imageurl),
+            'post_desc': self.post_desc,
+            'editedPost': self.editedPost,
+            'created_at_str': timezone.localtime(self.created_at),
+            'likes_count': self.likes_count,
+            'comments_count': self.comments_count,
+            'same_user': self.same_user,
+            'is_liked': self.is_liked,
+            'comments': self.comments,
+        }
+
+    def author(self):
+        return UserRow(
+            self.user_id, self.username, self.first_name,
+            self.last_name, self.gender, self.user_profile_image
+        )
+
+
+class CommentRow:
+    """
+    One embedded comment, with the author columns it needs flattened in.
+    """
+    columns = (
+        'id', 'post_id', 'user_id', 'user__username', 'user__first_name',
+        'user__last_name', 'user__gender', 'user__profile_image', 'comment',
+        'created_at', 'likes_count',
+    )
+    __slots__ = (
+        'id', 'post_id', 'user_id', 'username', 'first_name',
+        'last_name', 'gender', 'user_image', 'comment', 'created_at',
+        'likes_count', 'is_liked',
+    )
+
+    def __init__(self, id, post_id, user_id, username, first_name,
+                 last_name, gender, user_image, comment, created_at, likes_count):
+        self.id = id
+        self.post_id = post_id
+        self.user_id = user_id
+        self.username = username
+        self.first_name = first_name
+        self.last_name = last_name
+        self.gender = gender
+        self.user_image = user_image
+        self.comment = comment
+        self.created_at = created_at
+        self.likes_count = likes_count
+        # Filled in by the feed's per-user overlay
+        self.is_liked = False
+
+    def to_dict(self):
+        """Same keys, order and value types as CommentSerializer"""
+        return {
+            'id': self.id,
+            # Mirrors AbstractUser.get_full_name()
+            'user': f"{self.first_name} {self.last_name}".strip(),
+            'user_image': self.user_image or "",
+            'user_image_variants': avatar_variants(self.user_image),
+            'post_id': self.post_id,
+            'comment': self.comment,
+            'timestamp': timezone.localtime(self.created_at),
+            'likes_count': self.likes_count,
+            'is_liked': self.is_liked,
+        }
+
+    def to_compact_dict(self):
+        """Same keys, order and value types as CompactCommentSerializer"""
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'comment': self.comment,
+            'timestamp': timezone.localtime(self.created_at),
+            'likes_count': self.likes_count,
+            'is_liked': self.is_liked,
+        }
+
+    def author(self):
+        return UserRow(
+            self.user_id, self.username, self.first_name,
+            self.last_name, self.gender, self.user_image
+        )
+
+
+class UserRow:
+    """
+    Sideloaded author for the compact (v2) payload.
+    """
+    __slots__ = ('id', 'username', 'first_name', 'last_name', 'gender', 'user_image')
+
+    def __init__(self, id, username, first_name, last_name, gender, user_image):
+        self.id = id
+        self.username = username
+        self.first_name = first_name
+        self.last_name = last_name
+        self.gender = gender
+        self.user_image = user_image
+
+    def to_dict(self):
+        """Same keys, order and value types as SideloadedUserSerializer"""
+        return {
+            'id': self.id,
+            'username': self.username,
+            'first_name': self.first_name,
+            'last_name': self.last_name,
+            'full_name': f"{self.first_name} {self.last_name}".strip(),
+            'gender': self.gender,
+            'user_image': self.user_image or "",
+            'user_image_variants': avatar_variants(self.user_image),
+        }
+
+
+class RowIterable(ValuesListIterable):
+    """
+    values_list() iterable that wraps each tuple in `row_class`.
+    """
+    row_class = None
+
+    def __iter__(self):
+        row_class = self.row_class
+        for values in super().__iter__():
+            yield row_class(*values)
+
+
+class PostRowIterable(RowIterable):
+    row_class = PostRow
+
+
+class CommentRowIterable(RowIterable):
+    row_class = CommentRow
+
+
+def project(queryset, iterable_class):
+    """
+    Turns a queryset into one that yields the iterable's row records.
+
+    The result is still a lazy queryset (clones keep the iterable class), so
+    paginators can order, filter and slice it before any row is fetched.
+    """
+    queryset = queryset.values_list(*iterable_class.row_class.columns)
+    queryset._iterable_class = iterable_class
+    return queryset
+
+
+def post_rows(queryset):
+    return project(queryset, PostRowIterable)
+
+
+def comment_rows(queryset):
+    return project(queryset, CommentRowIterable)
+
+
+def full_posts_payload(posts, comments):
+    """
+    Original (v1) feed shape: author details repeated on every post and
+    comment, with comments both nested and grouped under userComments.
+    """
+    comments_dict = defaultdict(list)
+    for comment in comments:
+        comments_dict[comment.post_id].append(comment.to_dict())
+
+    social_posts = []
+    for post in posts:
+        post.comments = comments_dict.get(post.id, [])
+        social_posts.append(post.to_dict())
+
+    return {
+        "socialPosts": social_posts,
+        "userComments": dict(comments_dict)
+    }
+
+
+def compact_posts_payload(posts, comments):
+    """
+    Compact (v2) feed shape: posts and comments reference user_id, every
+    comment appears once, and authors are sideloaded in a single users map.
+    """
+    comments_dict = defaultdict(list)
+    authors = {}
+
+    for post in posts:
+        authors[post.user_id] = post
+
+    for comment in comments:
+        comments_dict[comment.post_id].append(comment.to_compact_dict())
+        authors.setdefault(comment.user_id, comment)
+
+    social_posts = []
+    for post in posts:
+        post.comments = comments_dict.get(post.id, [])
+        social_posts.append(post.to_compact_dict())
+
+    return {
+        "socialPosts": social_posts,
+        "users": {
+            user_id: row.author().to_dict() for user_id, row in authors.items()
+        }
+    }
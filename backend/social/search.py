@@ -0,0 +1,124 @@
+from accounts.models import User
+from configuration import Config
+from django.contrib.postgres.lookups import TrigramWordSimilar
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+)
+from django.db import connection
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce, Greatest, Upper
+
+# Text search configuration shared by the GIN index and the queries; they
+# must build the exact same to_tsvector() expression for the index to be used.
+POST_SEARCH_CONFIG = 'english'
+
+SEARCH_ORDER_RECENT = 'recent'
+SEARCH_ORDER_RELEVANCE = 'relevance'
+
+# Fields matched by user search and autocomplete; each has a trigram index
+USER_SEARCH_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def post_search_vector():
+    """
+    tsvector expression over UserPost.post_desc, matching the GIN index.
+    """
+    return SearchVector('post_desc', config=POST_SEARCH_CONFIG)
+
+
+def full_text_search_available():
+    return connection.vendor == 'postgresql'
+
+
+def search_posts(queryset, search_text, order=SEARCH_ORDER_RECENT):
+    """
+    Filters posts matching `search_text`.
+
+    On PostgreSQL this is a full-text match served by the GIN index, ordered
+    by recency or by SearchRank relevance. Other databases (SQLite dev
+    setups) fall back to an icontains scan ordered by recency.
+    """
+    if not full_text_search_available():
+        return queryset.filter(post_desc__icontains=search_text).order_by('-created_at')
+
+    query = SearchQuery(search_text, config=POST_SEARCH_CONFIG, search_type='websearch')
+    queryset = queryset.annotate(
+        search_vector=post_search_vector()
+    ).filter(search_vector=query)
+
+    if order == SEARCH_ORDER_RELEVANCE:
+        return queryset.annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', '-created_at')
+
+    return queryset.order_by('-created_at')
+
+
+def _user_matches(search_text, lookup):
+    condition = Q()
+    for field in USER_SEARCH_FIELDS:
+        condition |= Q(**{f"{field}__{lookup}": search_text})
+    return User.objects.filter(condition)
+
+
+def _rank_users(queryset, search_text):
+    """
+    Orders matches by their best trigram word similarity on Postgres, or
+    alphabetically elsewhere.
+
+    On Postgres only a bounded candidate set is ranked: matches that are also
+    word-similar (the %> operator, above pg_trgm.word_similarity_threshold)
+    on the UPPER() trigram indexes, at most Config.user_search_candidates of
+    them. A short, common prefix would otherwise rank every matching user
+    before the LIMIT.
+    """
+    if not full_text_search_available():
+        return queryset.order_by('username')
+
+    similar = Q()
+    for field in USER_SEARCH_FIELDS:
+        similar |= Q(TrigramWordSimilar(Upper(field), search_text.upper()))
+    # Unordered, so the subquery stops at the first candidates found
+    candidates = queryset.filter(similar).order_by().values('id')[:Config.user_search_candidates]
+
+    return User.objects.filter(id__in=candidates).annotate(
+        similarity=Greatest(*[
+            TrigramWordSimilarity(search_text, field) for field in USER_SEARCH_FIELDS
+        ])
+    ).order_by('-similarity', 'username')
+
+
+def search_users(search_text, limit=10):
+    """
+    Returns up to `limit` users whose username or name contains `search_text`,
+    most similar first. The UPPER(...) LIKE lookups are served by the
+    gin_trgm_ops indexes on accounts.User.
+    """
+    default_image = ""
+    queryset = _rank_users(_user_matches(search_text, 'icontains'), search_text)
+    return list(
+        queryset.annotate(
+            imageUrl=Coalesce('profile_image', Value(default_image))
+        ).values(
+            "id", "first_name", "last_name", "username", "imageUrl", "gender"
+        )[:limit]
+    )
+
+
+def autocomplete_users(prefix, limit=10):
+    """
+    Lightweight typeahead: users whose username or name starts with `prefix`,
+    projected to id, username, name and image only.
+    """
+    queryset = _rank_users(_user_matches(prefix, 'istartswith'), prefix)
+    return [
+        {
+            "id": user_id,
+            "username": username,
+            "name": f"{first_name} {last_name}".strip(),
+            "imageUrl": profile_image or "",
+        }
+        for user_id, username, first_name, last_name, profile_image in queryset.values_list(
+            "id", "username", "first_name", "last_name", "profile_image"
+        )[:limit]
+    ]
@@ -1,7 +1,12 @@
-from accounts.cloudinary import upload_image
+from accounts.models import IMAGE_STATUS_PENDING
+from accounts.uploaders import stage_upload
+from accounts.variants import avatar_variants, post_image_variants
 from configuration import Config
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from jobs.queue import enqueue
 import logging
+from collections import Counter
 from rest_framework import serializers
 from social import models
 
@@ -14,18 +19,51 @@ class SearchUsersPostsSerializer(serializers.Serializer):
     posts = serializers.DictField()
 
 
+class LikeOperationListSerializer(serializers.ListSerializer):
+    """
+    A batch of like/unlike actions, at most one per post
+    """
+
+    def validate(self, attrs):
+        counts = Counter(item["post_id"] for item in attrs)
+        duplicates = sorted(post_id for post_id, count in counts.items() if count > 1)
+        if duplicates:
+            # Each entry reports the result of its own action, which only exists once per post
+            raise serializers.ValidationError(
+                f"Each post may appear only once per batch; repeated: {duplicates}"
+            )
+        return attrs
+
+
+class LikeOperationSerializer(serializers.Serializer):
+    """
+    One queued like/unlike action in a batch
+    """
+    post_id = serializers.IntegerField()
+    liked = serializers.BooleanField()
+
+    class Meta:
+        list_serializer_class = LikeOperationListSerializer
+
+
 class CommentSerializer(serializers.ModelSerializer):
     """
     Serializer for UserComment model with user details
     """
     user = serializers.CharField(source='user.get_full_name', read_only=True)
     user_image = serializers.SerializerMethodField()
-    timestamp = serializers.CharField(source='created_at', read_only=True)
-    post_id = serializers.IntegerField(source='post.id', read_only=True)
+    user_image_variants = serializers.SerializerMethodField()
+    timestamp = serializers.DateTimeField(source='created_at', read_only=True)
+    post_id = serializers.IntegerField(read_only=True)
+    likes_count = serializers.IntegerField(read_only=True)
+    is_liked = serializers.BooleanField(read_only=True, default=False)
 
     class Meta:
         model = models.UserComment
-        fields = ['id', 'user', 'user_image', 'post_id', 'comment', 'timestamp']
+        fields = [
+            'id', 'user', 'user_image', 'user_image_variants', 'post_id',
+            'comment', 'timestamp', 'likes_count', 'is_liked'
+        ]
 
     def get_user_image(self, obj):
         """
@@ -36,6 +74,12 @@ class CommentSerializer(serializers.ModelSerializer):
             return profile_image
         return ""
 
+    def get_user_image_variants(self, obj):
+        """
+        thumb/medium/full URLs of the comment author's profile image
+        """
+        return avatar_variants(obj.user.profile_image)
+
 
 class PostSerializer(serializers.ModelSerializer):
     """
@@ -43,12 +87,15 @@ class PostSerializer(serializers.ModelSerializer):
     """
     user_id = serializers.CharField(source='user.id', read_only=True)
     username = serializers.CharField(source='user.username', read_only=True)
+    imageurl_variants = serializers.SerializerMethodField()
     user_profile_image = serializers.SerializerMethodField()
+    user_profile_image_variants = serializers.SerializerMethodField()
     first_name = serializers.CharField(source='user.first_name', read_only=True)
     last_name = serializers.CharField(source='user.last_name', read_only=True)
     gender = serializers.CharField(source='user.gender', read_only=True)
-    created_at_str = serializers.CharField(source='created_at', read_only=True)
+    created_at_str = serializers.DateTimeField(source='created_at', read_only=True)
     likes_count = serializers.IntegerField(read_only=True)
+    comments_count = serializers.IntegerField(read_only=True)
     same_user = serializers.BooleanField(read_only=True)
     is_liked = serializers.BooleanField(read_only=True, default=False)
     comments = CommentSerializer(many=True, read_only=True)
@@ -58,15 +105,18 @@ class PostSerializer(serializers.ModelSerializer):
         fields = [
             'id',
             'imageurl',
+            'imageurl_variants',
             'user_id',
             'username',
             'user_profile_image',
+            'user_profile_image_variants',
             'first_name',
             'last_name',
             'post_desc',
             'editedPost',
             'created_at_str',
             'likes_count',
+            'comments_count',
             'same_user',
             'is_liked',
             'comments',
@@ -82,6 +132,92 @@ class PostSerializer(serializers.ModelSerializer):
             return profile_image
         return ""
 
+    def get_imageurl_variants(self, obj):
+        """
+        thumb/medium/full URLs of the post image
+        """
+        return post_image_variants(obj.imageurl)
+
+    def get_user_profile_image_variants(self, obj):
+        """
+        thumb/medium/full URLs of the post author's profile image
+        """
+        return avatar_variants(obj.user.profile_image)
+
+
+class SideloadedUserSerializer(serializers.ModelSerializer):
+    """
+    Author details sent once per page in the compact (v2) feed payload
+    """
+    full_name = serializers.CharField(source='get_full_name', read_only=True)
+    user_image = serializers.SerializerMethodField()
+    user_image_variants = serializers.SerializerMethodField()
+
+    class Meta:
+        model = User
+        fields = [
+            'id', 'username', 'first_name', 'last_name', 'full_name',
+            'gender', 'user_image', 'user_image_variants'
+        ]
+
+    def get_user_image(self, obj):
+        """
+        Get the user's profile image URL
+        """
+        return obj.profile_image or ""
+
+    def get_user_image_variants(self, obj):
+        """
+        thumb/medium/full URLs of the user's profile image
+        """
+        return avatar_variants(obj.profile_image)
+
+
+class CompactCommentSerializer(serializers.ModelSerializer):
+    """
+    Compact (v2) comment that references its author by user_id
+    """
+    timestamp = serializers.DateTimeField(source='created_at', read_only=True)
+    is_liked = serializers.BooleanField(read_only=True, default=False)
+
+    class Meta:
+        model = models.UserComment
+        fields = ['id', 'user_id', 'comment', 'timestamp', 'likes_count', 'is_liked']
+
+
+class CompactPostSerializer(serializers.ModelSerializer):
+    """
+    Compact (v2) post that references its author by user_id
+    """
+    imageurl_variants = serializers.SerializerMethodField()
+    created_at_str = serializers.DateTimeField(source='created_at', read_only=True)
+    same_user = serializers.BooleanField(read_only=True)
+    is_liked = serializers.BooleanField(read_only=True, default=False)
+    comments = CompactCommentSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = models.UserPost
+        fields = [
+            'id',
+            'user_id',
+            'imageurl',
+            'imageurl_variants',
+            'post_desc',
+            'editedPost',
+            'created_at_str',
+            'likes_count',
+            'comments_count',
+            'same_user',
+            'is_liked',
+            'comments'
+        ]
+
+    def get_imageurl_variants(self, obj):
+        """
+        thumb/medium/full URLs of the post image
+        """
+        return post_image_variants(obj.imageurl)
+
 
 class CreatePostSerializer(serializers.ModelSerializer):
     """
@@ -107,13 +243,20 @@ class CreatePostSerializer(serializers.ModelSerializer):
             "post_desc": validated_data.get('post_desc'),
         }
 
-        # Handle image upload if provided
+        # Images are uploaded by a background job; the post is saved right away as pending
         imageurl = validated_data.get('imageurl')
         if imageurl:
-            cloud_image_info = upload_image(imageurl, "user_posts")
-            filters["imageurl"] = cloud_image_info["cloudinary_url"]
+            filters["image_status"] = IMAGE_STATUS_PENDING
+
+        with transaction.atomic():
+            post = models.UserPost.objects.create(**filters)
+            if imageurl:
+                enqueue("upload_post_image", {
+                    "post_id": post.id,
+                    "path": stage_upload(imageurl)
+                })
 
-        return models.UserPost.objects.create(**filters)
+        return post
 
 
 class UpdatePostSerializer(serializers.Serializer):
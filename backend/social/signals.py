@@ -0,0 +1,40 @@
+from accounts.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from social import events, models
+from social.cache import FEED_VERSION, POSTS_VERSION, USERS_VERSION, bump_version
+
+
+@receiver(post_save, sender=models.UserPost)
+def post_saved(sender, instance, created, **kwargs):
+    """New posts change page totals and edits change feed pages."""
+    if created:
+        bump_version(POSTS_VERSION)
+        events.publish(events.POST_CREATED, {"post_id": instance.id, "user_id": instance.user_id})
+    bump_version(FEED_VERSION)
+
+
+@receiver(post_delete, sender=models.UserPost)
+def post_deleted(sender, instance, **kwargs):
+    """Deleted posts change page totals and feed pages."""
+    bump_version(POSTS_VERSION)
+    bump_version(FEED_VERSION)
+    events.publish(events.POST_DELETED, {"post_id": instance.id})
+
+
+# User fields embedded in cached feed pages and autocomplete results
+PUBLIC_PROFILE_FIELDS = frozenset({'username', 'first_name', 'last_name', 'gender', 'profile_image'})
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Author names and images are embedded in cached feed pages and autocomplete
+    results. Saves limited to other fields (last_login, password, theme, ...)
+    leave those caches alone.
+    """
+    if not created and update_fields is not None and not PUBLIC_PROFILE_FIELDS & update_fields:
+        return
+    bump_version(USERS_VERSION)
+    if not created:
+        bump_version(FEED_VERSION)
@@ -0,0 +1,29 @@
+from accounts.models import IMAGE_STATUS_FAILED, IMAGE_STATUS_READY
+from accounts.uploaders import discard_staged, upload_staged
+from jobs.queue import register
+from social import models
+
+POST_IMAGES_FOLDER = "user_posts"
+
+
+def mark_post_image_failed(payload, error):
+    models.UserPost.objects.filter(id=payload["post_id"]).update(image_status=IMAGE_STATUS_FAILED)
+    discard_staged(payload["path"])
+
+
+@register("upload_post_image", on_failure=mark_post_image_failed)
+def upload_post_image(payload):
+    """
+    Uploads a staged post image and stores its URL on the post.
+    """
+    post = models.UserPost.objects.filter(id=payload["post_id"]).first()
+    if post is None:
+        # Post was deleted before the upload ran
+        discard_staged(payload["path"])
+        return
+
+    cloud_image_info = upload_staged(payload["path"], POST_IMAGES_FOLDER)
+    post.imageurl = cloud_image_info["cloudinary_url"]
+    post.image_status = IMAGE_STATUS_READY
+    # save() (not update()) so the feed cache is invalidated by the post_save signal
+    post.save(update_fields=["imageurl", "image_status", "updated_at"])
@@ -1,3 +1,1083 @@
-from django.test import TestCase
+import base64
+from asgiref.sync import async_to_sync
+import gzip
+import io
+import json
+import msgpack
+import tempfile
+from accounts.models import IMAGE_STATUS_FAILED, IMAGE_STATUS_PENDING, IMAGE_STATUS_READY, User
+from accounts.tokens import get_token_for_user
+from configuration import Config
+from django.apps import apps
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.backends.postgresql.base import DatabaseWrapper as PostgresDatabaseWrapper
+from django.db.models import BooleanField, Case, Prefetch, Value, When
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from jobs.models import Job
+from jobs.queue import run_pending
+from PIL import Image
+from rest_framework.fields import DateTimeField
+from rest_framework.utils import encoders
+from social import events, like_buffer, models, projections, search, serializers
+from social.cache import FEED_VERSION, USERS_VERSION, get_version
+from social.pagination import CustomPostPagination, get_total_count
+from SocialStack import metrics
+from SocialStack.middleware import choose_encoding
+from SocialStack.renderers import FastJSONRenderer, MessagePackRenderer
+from SocialStack.testing import SocialStackTestCase
+from unittest import mock
 
-# Create your tests here.
+
+class FeedProjectionParityTests(SocialStackTestCase):
+    """
+    Feed pages built by the projection must carry exactly what the
+    serializers produce for the same posts.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+
+        cls.viewer = User.objects.create(
+            username="viewer", first_name="View", last_name="Er", gender="F",
+            profile_image="https://example.com/viewer.png"
+        )
+        cls.author = User.objects.create(
+            username="author", first_name="Au", last_name="",
+            profile_image="https://res.cloudinary.com/demo/image/upload/v1/user_profile_images/author.jpg"
+        )
+
+        # One image per kind of URL that variants are derived from
+        post_images = {
+            1: "https://res.cloudinary.com/demo/image/upload/v1/user_posts/post.jpg",
+            2: "/media/user_posts/post.webp",
+            3: "https://example.com/post.png",
+        }
+        for index in range(5):
+            post = models.UserPost.objects.create(
+                user=cls.author if index % 2 else cls.viewer,
+                post_desc=f"post {index}",
+                imageurl=post_images.get(index),
+                editedPost=index == 1,
+            )
+            for comment_index in range(index):
+                comment = post.add_comment(
+                    user=cls.viewer if comment_index % 2 else cls.author,
+                    comment=f"comment {comment_index}"
+                )
+                if comment_index % 2 == 0:
+                    comment.add_like(cls.author)
+                if comment_index == 1:
+                    comment.add_like(cls.viewer)
+            if index % 2 == 0:
+                post.add_like(cls.viewer)
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.api_client(self.viewer)
+
+    def render(self, data):
+        # Through the API renderer, so both sides are compared as clients receive them
+        return FastJSONRenderer().render(data)
+
+    def serialized_page(self, post_serializer_class, comment_serializer_class):
+        """
+        A feed page the way it was built before the projection: PostSerializer
+        over the real queryset with the latest comments prefetched and the
+        viewer's likes set on the instances.
+        """
+        liked_posts = set(models.PostLike.objects.filter(user=self.viewer).values_list('post_id', flat=True))
+        liked_comments = set(
+            models.CommentLike.objects.filter(user=self.viewer).values_list('comment_id', flat=True)
+        )
+        # Feed pages embed only each post's latest comments
+        latest_ids = [
+            comment_id for post in models.UserPost.objects.all()
+            for comment_id in post.comments.order_by('-created_at', '-id').values_list(
+                'id', flat=True
+            )[:Config.comments_per_post]
+        ]
+        latest_comments = models.UserComment.objects.filter(id__in=latest_ids).select_related(
+            'user'
+        ).order_by('-created_at', '-id')
+        posts = list(
+            models.UserPost.objects.annotate(
+                same_user=Case(
+                    When(user__username=self.viewer.username, then=Value(True)),
+                    default=Value(False),
+                    output_field=BooleanField()
+                )
+            ).select_related('user').prefetch_related(
+                Prefetch('comments', queryset=latest_comments)
+            ).order_by('-created_at')
+        )
+        for post in posts:
+            post.is_liked = post.id in liked_posts
+            for comment in post.comments.all():
+                comment.is_liked = comment.id in liked_comments
+
+        comments = sorted(
+            (comment for post in posts for comment in post.comments.all()),
+            key=lambda comment: comment.created_at, reverse=True
+        )
+        return posts, comments, post_serializer_class(posts, many=True).data
+
+    def feed(self, **params):
+        response = self.client.get('/social/posts/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_v1_payload_matches_serializers(self):
+        _, comments, expected_posts = self.serialized_page(serializers.PostSerializer, serializers.CommentSerializer)
+        expected_comments = {}
+        for item in serializers.CommentSerializer(comments, many=True).data:
+            expected_comments.setdefault(item['post_id'], []).append(item)
+
+        results = self.feed()
+
+        self.assertTrue(any(post['comments'] for post in expected_posts))
+        self.assertEqual(self.render(results['socialPosts']), self.render(expected_posts))
+        self.assertEqual(
+            json.loads(self.render(results['userComments'])), json.loads(self.render(expected_comments))
+        )
+
+    def test_v2_payload_matches_serializers(self):
+        posts, comments, expected_posts = self.serialized_page(
+            serializers.CompactPostSerializer, serializers.CompactCommentSerializer
+        )
+        authors = {post.user_id: post.user for post in posts}
+        for comment in comments:
+            authors.setdefault(comment.user_id, comment.user)
+        expected_users = {
+            item['id']: item
+            for item in serializers.SideloadedUserSerializer(authors.values(), many=True).data
+        }
+
+        results = self.feed(version=2)
+
+        self.assertEqual(self.render(results['socialPosts']), self.render(expected_posts))
+        self.assertEqual(json.loads(self.render(results['users'])), json.loads(self.render(expected_users)))
+
+
+class KeysetPaginationTests(SocialStackTestCase):
+    """
+    Cursor pages walk the whole feed in both directions, ties on created_at
+    included, and malformed cursors are rejected.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.viewer = User.objects.create(username="viewer")
+        posts = [models.UserPost.objects.create(user=cls.viewer, post_desc=f"post {index}") for index in range(8)]
+        # Three posts share one timestamp, so only the id orders them
+        tied_at = posts[4].created_at
+        models.UserPost.objects.filter(id__in=[post.id for post in posts[3:6]]).update(created_at=tied_at)
+        cls.expected = list(
+            models.UserPost.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.api_client(self.viewer)
+
+    def get_page(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [post['id'] for post in response.data['results']['socialPosts']], response.data
+
+    def test_walk_forward_and_back(self):
+        pages, data = [], {'next': '/social/posts/?pagination=cursor&page_size=3'}
+        while data['next']:
+            ids, data = self.get_page(data['next'])
+            pages.append(ids)
+        self.assertEqual([post_id for page in pages for post_id in page], self.expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 2])
+
+        # Back from the last page, one page at a time
+        back = [pages[-1]]
+        while data['previous']:
+            ids, data = self.get_page(data['previous'])
+            back.append(ids)
+        self.assertEqual(back[::-1], pages)
+
+    def test_malformed_cursors_are_bad_requests(self):
+        def encode(value):
+            return base64.urlsafe_b64encode(value.encode()).decode()
+
+        for cursor in ["not base64!", encode("not json"), encode('{"i": 1}'), encode('[1, 2]'),
+                       encode('{"t": "yesterday", "i": 1}'), encode('{"t": "2026-01-01T00:00:00", "i": 1}'),
+                       encode('{"t": "2026-01-01T00:00:00+00:00", "i": "x"}')]:
+            response = self.client.get('/social/posts/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 400, cursor)
+            self.assertEqual(response.data, {"detail": "Invalid cursor"})
+
+
+class PageNumberPaginationTests(SocialStackTestCase):
+    """
+    Page-number pages list a clamped window of page links, reject pages past
+    the end, and every count strategy reports the number of posts.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.viewer = User.objects.create(username="viewer")
+        cls.other = User.objects.create(username="other")
+        for index in range(25):
+            models.UserPost.objects.create(user=cls.viewer if index % 5 else cls.other, post_desc=f"post {index}")
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.api_client(self.viewer)
+
+    def get_page(self, page, page_size=2):
+        return self.client.get('/social/posts/', {'page': page, 'page_size': page_size})
+
+    def test_page_window_is_clamped(self):
+        pagination = CustomPostPagination()
+        pagination.page_window = 2
+        self.assertEqual(pagination.get_page_numbers(1, 13), [1, 2, 3, 13])
+        self.assertEqual(pagination.get_page_numbers(7, 13), [1, 5, 6, 7, 8, 9, 13])
+        self.assertEqual(pagination.get_page_numbers(13, 13), [1, 11, 12, 13])
+        self.assertEqual(pagination.get_page_numbers(1, 1), [1])
+
+    def test_first_last_and_out_of_range_pages(self):
+        data = self.get_page(1).data
+        self.assertEqual((data['count'], data['total_pages'], data['current_page']), (25, 13, 1))
+        self.assertIsNone(data['previous'])
+        self.assertEqual(
+            [(page['page'], page['is_current']) for page in data['pages']],
+            [(1, True), (2, False), (3, False), (13, False)]
+        )
+
+        data = self.get_page('last').data
+        self.assertEqual(data['current_page'], 13)
+        self.assertIsNone(data['next'])
+        self.assertEqual(len(data['results']['socialPosts']), 1)
+
+        for page in (14, 0, 'x'):
+            self.assertEqual(self.get_page(page).status_code, 404, page)
+
+    def test_exact_count(self):
+        queryset = models.UserPost.objects.all()
+        with mock.patch.object(Config, 'pagination_count_strategy', 'exact'):
+            with self.assertNumQueries(1):
+                self.assertEqual(get_total_count(queryset), 25)
+            with self.assertNumQueries(1):
+                self.assertEqual(get_total_count(queryset.filter(user=self.other)), 5)
+
+    @mock.patch.object(Config, 'pagination_count_strategy', 'cached')
+    def test_cached_count_follows_creates(self):
+        queryset = models.UserPost.objects.all()
+        self.assertEqual(get_total_count(queryset), 25)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_total_count(queryset), 25)
+        # Filters are part of the key
+        self.assertEqual(get_total_count(queryset.filter(user=self.other)), 5)
+
+        models.UserPost.objects.create(user=self.other, post_desc="new")
+        self.assertEqual(get_total_count(queryset), 26)
+        self.assertEqual(get_total_count(queryset.none()), 0)
+
+    @mock.patch.object(Config, 'pagination_count_strategy', 'estimated')
+    @mock.patch.object(Config, 'pagination_estimate_threshold', 1000)
+    def test_estimated_count(self):
+        queryset = models.UserPost.objects.all()
+        # SQLite has no estimate: counted (and cached) instead
+        self.assertEqual(get_total_count(queryset), 25)
+
+        with mock.patch('social.pagination.estimate_row_count', return_value=50000):
+            self.assertEqual(get_total_count(queryset), 50000)
+            # Filtered querysets are never estimated
+            self.assertEqual(get_total_count(queryset.filter(user=self.other)), 5)
+        with mock.patch('social.pagination.estimate_row_count', return_value=10):
+            # Below the threshold the estimate is too coarse
+            self.assertEqual(get_total_count(queryset), 25)
+
+
+class PostSearchTests(SocialStackTestCase):
+    """
+    Post search matches case-insensitively on SQLite, builds a websearch
+    query on Postgres, and relevance ordering always pages by page number.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.viewer = User.objects.create(username="viewer")
+        for desc in ("Morning COFFEE", "tea time", "coffee and cake", "more coffee", "no match"):
+            models.UserPost.objects.create(user=cls.viewer, post_desc=desc)
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.api_client(self.viewer)
+
+    def search(self, text, **params):
+        response = self.client.get(f'/social/search/{text}/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['posts']
+
+    def descriptions(self, posts):
+        return [post['post_desc'] for post in posts['results']['socialPosts']]
+
+    def test_fallback_matches_case_insensitively_by_recency(self):
+        posts = self.search('coffee')
+        self.assertEqual(posts['count'], 3)
+        self.assertEqual(self.descriptions(posts), ["more coffee", "coffee and cake", "Morning COFFEE"])
+        # SQLite cannot rank: relevance falls back to recency
+        self.assertEqual(self.descriptions(self.search('coffee', order='relevance')), self.descriptions(posts))
+
+    def test_relevance_ignores_cursor_pagination(self):
+        posts = self.search('coffee', pagination='cursor', page_size=2)
+        self.assertNotIn('total_pages', posts)
+        self.assertIn('cursor=', posts['next'])
+
+        posts = self.search('coffee', pagination='cursor', page_size=2, order='relevance')
+        self.assertEqual((posts['count'], posts['total_pages']), (3, 2))
+        self.assertNotIn('cursor=', posts['next'])
+        # A cursor carried over from a recency page is ignored too
+        self.assertEqual(self.search('coffee', cursor='anything', order='relevance')['count'], 3)
+
+    def test_full_text_query_on_postgres(self):
+        with mock.patch('social.search.full_text_search_available', return_value=True):
+            recent = search.search_posts(models.UserPost.objects.all(), 'coffee -tea')
+            relevant = search.search_posts(models.UserPost.objects.all(), 'coffee -tea', search.SEARCH_ORDER_RELEVANCE)
+
+        for queryset in (recent, relevant):
+            self.assertIn("@@ (websearch_to_tsquery(english::regconfig", str(queryset.query))
+        self.assertEqual(recent.query.order_by, ('-created_at',))
+        self.assertEqual(relevant.query.order_by, ('-search_rank', '-created_at'))
+
+
+class CommentLikeHydrationTests(SocialStackTestCase):
+    """
+    is_liked on comments costs one CommentLike query per page, however many
+    comments and comment likes the page holds.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.viewer = User.objects.create(username="viewer", first_name="View", last_name="Er")
+        cls.posts = [
+            models.UserPost.objects.create(user=cls.viewer, post_desc=f"post {index}")
+            for index in range(3)
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.api_client(self.viewer)
+
+    def add_liked_comments(self, per_post):
+        for post in self.posts:
+            for index in range(per_post):
+                post.add_comment(user=self.viewer, comment=f"comment {index}").add_like(self.viewer)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_feed_query_count_is_constant(self):
+        self.add_liked_comments(1)
+        few, _ = self.count_queries('/social/posts/')
+
+        self.add_liked_comments(Config.comments_per_post)
+        many, response = self.count_queries('/social/posts/')
+
+        self.assertEqual(few, many)
+        comments = [comment for post in response.data['results']['socialPosts'] for comment in post['comments']]
+        self.assertEqual(len(comments), len(self.posts) * Config.comments_per_post)
+        self.assertTrue(all(comment['is_liked'] and comment['likes_count'] == 1 for comment in comments))
+
+    def test_comments_endpoint_hydrates_with_one_query(self):
+        post = self.posts[0]
+        self.add_liked_comments(2)
+        # Post lookup, comment page, then one CommentLike query
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/social/comment/{post.id}/')
+
+        comments = response.data['results']['comments']
+        self.assertTrue(comments and all(comment['is_liked'] for comment in comments))
+
+    def test_like_endpoint_is_idempotent(self):
+        comment = self.posts[0].add_comment(user=self.viewer, comment="like me")
+        url = f'/social/comment/{comment.id}/like/'
+
+        for liked, expected in [(True, 1), (True, 1), (False, 0), (False, 0)]:
+            response = self.client.post(url, {"liked": liked}, format='json')
+            self.assertEqual(response.data, {"liked": liked, "likes_count": expected})
+
+        response = self.client.post('/social/comment/0/like/', {"liked": True}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class ConditionalFeedTests(SocialStackTestCase):
+    """
+    Feed and dashboard polls whose ETag still matches get a 304 without touching the database.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.viewer = User.objects.create(username="viewer", first_name="View", last_name="Er")
+        cls.other = User.objects.create(username="other", first_name="Oth", last_name="Er")
+        cls.post = models.UserPost.objects.create(user=cls.other, post_desc="post")
+
+    def setUp(self):
+        super().setUp()
+        self.use_shared_cache()
+        self.client = self.api_client(self.viewer)
+
+    def assert_revalidates(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        return etag
+
+    def test_feed_not_modified_until_a_like(self):
+        etag = self.assert_revalidates('/social/posts/')
+
+        models.UserPost.set_like(self.post.id, self.other, True)
+        response = self.client.get('/social/posts/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    @mock.patch.object(Config, 'metrics_flush_interval', 3600)
+    def test_not_modified_is_counted_in_the_process(self):
+        etag = self.client.get('/social/posts/')['ETag']
+        with mock.patch.object(metrics, 'buffered', metrics.CounterBuffer()):
+            with mock.patch.object(metrics, 'incr') as incr:
+                self.client.get('/social/posts/', HTTP_IF_NONE_MATCH=etag)
+            incr.assert_not_called()
+
+            metrics.buffered.flush()
+        self.assertEqual(metrics.get("http.not_modified"), 1)
+
+    def test_etag_depends_on_page_and_viewer(self):
+        etag = self.assert_revalidates('/social/posts/')
+        self.assertNotEqual(self.assert_revalidates('/social/posts/?version=2'), etag)
+
+        self.client = self.api_client(self.other)
+        response = self.client.get('/social/posts/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_dashboard_not_modified_until_profile_edit(self):
+        url = f'/social/dashboard/{self.other.id}/'
+        etag = self.assert_revalidates(url)
+
+        self.other.first_name = "Renamed"
+        self.other.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results']['userDashboardInformation']['fullName'], "Renamed Er")
+
+    def test_dashboard_not_modified_until_email_edit(self):
+        url = f'/social/dashboard/{self.other.id}/'
+        etag = self.assert_revalidates(url)
+
+        # The email is not in any feed page, so the feed version stays put
+        feed_version = get_version(FEED_VERSION)
+        client = self.api_client(self.other)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/accounts/user-details/', {
+                "username": "other", "first_name": "Oth", "last_name": "Er",
+                "email": "new@example.com", "imageUrl": None,
+            }, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_version(FEED_VERSION), feed_version)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results']['userDashboardInformation']['email'], "new@example.com")
+
+    def test_no_validator_on_a_process_local_cache(self):
+        with mock.patch('social.cache.cache_is_process_local', return_value=True):
+            response = self.client.get('/social/posts/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+
+class LikeTests(SocialStackTestCase):
+    """
+    Likes are idempotent, keep likes_count exact and only invalidate or
+    publish when something changed.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.author = User.objects.create(username="author")
+        cls.fan = User.objects.create(username="fan")
+        cls.post = models.UserPost.objects.create(user=cls.author, post_desc="post")
+        cls.comment = cls.post.add_comment(user=cls.author, comment="comment")
+
+    def likes_count(self, target):
+        return type(target).objects.values_list('likes_count', flat=True).get(id=target.id)
+
+    def test_set_like_is_idempotent(self):
+        for model, target, like_model, fk_name in ((models.UserPost, self.post, models.PostLike, 'post'),
+                                                   (models.UserComment, self.comment, models.CommentLike, 'comment')):
+            self.assertEqual(model.set_like(target.id, self.fan, True), (True, 1))
+            self.assertEqual(model.set_like(target.id, self.fan, True), (False, 1))
+            self.assertEqual(model.set_like(target.id, self.author, True), (True, 2))
+            self.assertEqual(model.set_like(target.id, self.fan, False), (True, 1))
+            self.assertEqual(model.set_like(target.id, self.fan, False), (False, 1))
+            self.assertEqual(self.likes_count(target), like_model.objects.filter(**{fk_name: target}).count())
+            self.assertIsNone(model.set_like(0, self.fan, True))
+
+    def test_only_changes_invalidate_and_publish(self):
+        with mock.patch('social.models.events.publish') as publish:
+            version = get_version(FEED_VERSION)
+            self.post.add_like(self.fan)
+            self.assertNotEqual(get_version(FEED_VERSION), version)
+            self.assertEqual(publish.call_count, 1)
+
+            version = get_version(FEED_VERSION)
+            self.assertFalse(self.post.add_like(self.fan))
+            self.assertFalse(self.post.remove_like(self.author))
+            self.assertEqual(get_version(FEED_VERSION), version)
+            self.assertEqual(publish.call_count, 1)
+
+    def test_batch_reports_each_action(self):
+        client = self.api_client(self.fan)
+        response = client.post('/social/likes/batch/', [
+            {"post_id": self.post.id, "liked": True}, {"post_id": 0, "liked": True},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"], [
+            {"post_id": self.post.id, "status": "ok", "liked": True, "likes_count": 1},
+            {"post_id": 0, "status": "not_found"},
+        ])
+
+    def test_batch_rejects_repeated_posts(self):
+        client = self.api_client(self.fan)
+        response = client.post('/social/likes/batch/', [
+            {"post_id": self.post.id, "liked": True}, {"post_id": self.post.id, "liked": False},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(models.PostLike.objects.exists())
+
+    def test_toggle_like(self):
+        self.assertEqual(self.post.toggle_like(self.fan), (True, 1))
+        self.assertEqual(self.post.toggle_like(self.fan), (False, 0))
+        self.assertEqual(self.comment.toggle_like(self.fan), (True, 1))
+        self.assertEqual((self.post.likes_count, self.comment.likes_count), (0, 1))
+
+        models.UserPost.objects.filter(id=self.post.id).delete()
+        self.assertIsNone(self.post.toggle_like(self.fan))
+        self.assertIsNone(self.comment.toggle_like(self.fan))
+
+
+class CounterTests(SocialStackTestCase):
+    """
+    Post edits leave the denormalized counters alone, and reconcile_counters
+    repairs them when they drift.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.author = User.objects.create(username="author")
+        cls.fan = User.objects.create(username="fan")
+        cls.post = models.UserPost.objects.create(user=cls.author, post_desc="post")
+        cls.comment = cls.post.add_comment(user=cls.fan, comment="comment")
+        cls.post.add_like(cls.fan)
+        cls.comment.add_like(cls.author)
+
+    def counts(self):
+        post = models.UserPost.objects.get(id=self.post.id)
+        comment = models.UserComment.objects.get(id=self.comment.id)
+        return post.likes_count, post.comments_count, comment.likes_count
+
+    def test_post_edit_keeps_concurrent_counts(self):
+        get = models.UserPost.objects.get
+
+        def get_then_like(*args, **kwargs):
+            # A like landing between the edit's read and its save
+            post = get(*args, **kwargs)
+            models.UserPost.set_like(post.id, self.author, True)
+            return post
+
+        client = self.api_client(self.author)
+        with mock.patch.object(models.UserPost.objects, 'get', side_effect=get_then_like):
+            response = client.patch('/social/posts/', {
+                "postId": self.post.id, "editedComment": "edited",
+            }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        post = models.UserPost.objects.get(id=self.post.id)
+        self.assertEqual((post.post_desc, post.editedPost, post.likes_count), ("edited", True, 2))
+
+    def test_reconcile_counters_repairs_drift(self):
+        models.UserPost.objects.filter(id=self.post.id).update(likes_count=7, comments_count=0)
+        models.UserComment.objects.filter(id=self.comment.id).update(likes_count=3)
+
+        output = io.StringIO()
+        call_command('reconcile_counters', '--dry-run', stdout=output)
+        self.assertIn("UserPost: 1 row(s) with drifted counters", output.getvalue())
+        self.assertEqual(self.counts(), (7, 0, 3))
+
+        call_command('reconcile_counters', stdout=io.StringIO())
+        self.assertEqual(self.counts(), (1, 1, 1))
+
+        output = io.StringIO()
+        call_command('reconcile_counters', stdout=output)
+        self.assertIn("UserComment: 0 row(s) with drifted counters", output.getvalue())
+
+
+@mock.patch.object(Config, 'likes_write_behind', True)
+class LikeBufferTests(SocialStackTestCase):
+    """
+    Write-behind likes: one logged change per effective action, exact
+    pending counts, and nothing left behind by stalled writers.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.fan = User.objects.create(username="fan")
+        cls.post = models.UserPost.objects.create(user=cls.fan, post_desc="post")
+
+    def like(self, liked, user=None):
+        response = self.api_client(user or self.fan).post(
+            f'/social/like/{self.post.id}/', {"liked": liked}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()["likes_count"]
+
+    def test_buffered_likes_are_flushed(self):
+        self.assertEqual(self.like(True), 1)
+        self.assertEqual(self.like(True), 1)
+        self.assertFalse(models.PostLike.objects.exists())
+        self.assertEqual(like_buffer.pending_state(self.fan.id, [self.post.id]), ({self.post.id: True}, {self.post.id: 1}))
+
+        self.assertEqual(like_buffer.flush(), 1)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+        self.assertTrue(models.PostLike.objects.filter(user=self.fan, post=self.post).exists())
+        # The pending counters only ever grow; they now cancel out
+        self.assertEqual(like_buffer.pending_state(self.fan.id, [self.post.id]), ({self.post.id: True}, {}))
+        self.assertEqual(self.like(False), 0)
+
+    def test_flush_moves_counters_without_recounting(self):
+        # Likes the table does not show here, e.g. counted before a partial restore
+        models.UserPost.objects.filter(id=self.post.id).update(likes_count=10)
+        other = User.objects.create(username="other")
+        models.PostLike.objects.create(user=other, post=self.post)
+        self.like(True)
+        # Already in the database: flushed without moving the counter
+        like_buffer._append_slot(other.id, self.post.id, True)
+        like_buffer._add_delta(self.post.id, 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(like_buffer.flush(), 2)
+
+        self.assertFalse([query for query in queries if "COUNT(" in query['sql']])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 11)
+        self.assertEqual(models.PostLike.objects.filter(post=self.post).count(), 2)
+
+    def test_racing_requests_change_the_intent_once(self):
+        # Both requests read the intent (not liked, from the database) before either writes
+        self.assertTrue(like_buffer._transition(self.fan.id, self.post.id, 0, False, True))
+        self.assertFalse(like_buffer._transition(self.fan.id, self.post.id, 0, False, True))
+        # A stale reader wanting the other state still sees the newer transition first
+        self.assertTrue(like_buffer._transition(self.fan.id, self.post.id, 0, False, False))
+        self.assertEqual(like_buffer.pending_state(self.fan.id, [self.post.id])[0], {self.post.id: False})
+
+    def test_refused_on_a_process_local_cache(self):
+        with self.assertRaises(ImproperlyConfigured):
+            apps.get_app_config('social').ready()
+
+    def test_stalled_slots_are_logged_again(self):
+        self.like(True)
+        # A writer that took a seq but has not added its slot yet
+        stalled_seq = like_buffer._incr(like_buffer.SEQ_KEY)
+
+        self.assertEqual(like_buffer.flush(), 1)
+        self.assertEqual(like_buffer.flush(), 1)  # given up on and marked skipped
+
+        # The late writer cannot take the skipped slot, and logs under the next seq
+        self.assertFalse(cache.add(like_buffer._slot_key(stalled_seq), (self.fan.id, self.post.id, False)))
+        self.assertEqual(like_buffer._append_slot(self.fan.id, self.post.id, False), stalled_seq + 1)
+        like_buffer._add_delta(self.post.id, -1)
+        self.assertEqual(like_buffer.flush(), 1)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+        self.assertEqual(like_buffer.pending_state(self.fan.id, [self.post.id])[1], {})
+
+
+@mock.patch.object(Config, 'events_heartbeat', 1)
+class EventStreamTests(SocialStackTestCase):
+    """
+    The event stream opens with a single-use ticket and carries events
+    published once their transaction commits.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create(username="listener")
+
+    def test_tickets_are_single_use(self):
+        response = self.api_client(self.user).post('/social/events/ticket/')
+        self.assertEqual(response.status_code, 200)
+        ticket = response.json()["ticket"]
+
+        self.assertEqual(async_to_sync(events.redeem_stream_ticket)(ticket), self.user.id)
+        self.assertIsNone(async_to_sync(events.redeem_stream_ticket)(ticket))
+        self.assertIsNone(async_to_sync(events.redeem_stream_ticket)("made-up"))
+
+    def test_stream_requires_a_ticket(self):
+        self.assertEqual(self.client.get('/social/events/').status_code, 401)
+        # Access tokens (header or ?token=) are not accepted
+        access = str(get_token_for_user(self.user).access_token)
+        self.assertEqual(self.client.get('/social/events/', {'token': access}).status_code, 401)
+        self.assertEqual(self.client.get('/social/events/', HTTP_AUTHORIZATION=f"Bearer {access}").status_code, 401)
+
+    async def test_stream_delivers_published_events(self):
+        ticket = events.issue_stream_ticket(self.user.id)
+        response = await self.async_client.get('/social/events/', {'ticket': ticket})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b"retry: "))
+        events.get_channel_layer().publish({"type": events.POST_LIKES, "data": {"post_id": 7, "likes_count": 2}})
+        chunk = await anext(stream)
+        await stream.aclose()
+
+        self.assertIn(b"event: post.likes\n", chunk)
+        self.assertIn(b'data: {"post_id": 7, "likes_count": 2}', chunk)
+
+    def test_events_are_published_on_commit(self):
+        with mock.patch.object(events, 'get_channel_layer') as layer:
+            with self.captureOnCommitCallbacks(execute=True):
+                post = models.UserPost.objects.create(user=self.user, post_desc="post")
+                layer.return_value.publish.assert_not_called()
+
+        layer.return_value.publish.assert_called_once_with(
+            {"type": events.POST_CREATED, "data": {"post_id": post.id, "user_id": self.user.id}}
+        )
+
+
+class UserAutocompleteTests(SocialStackTestCase):
+    """
+    Autocomplete needs a minimum prefix, and only public profile changes drop its cached results.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.viewer = User.objects.create(username="viewer")
+        cls.match = User.objects.create(username="annabel", first_name="Anna", last_name="Bell")
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.api_client(self.viewer)
+
+    def autocomplete(self, prefix):
+        response = self.client.get('/social/users/autocomplete/', {'q': prefix})
+        self.assertEqual(response.status_code, 200)
+        return [user['username'] for user in response.json()['users']]
+
+    def test_short_prefixes_do_not_query(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.autocomplete("an"), [])
+        self.assertEqual(self.autocomplete("ann"), ["annabel"])
+
+    def test_only_public_profile_changes_invalidate(self):
+        version = get_version(USERS_VERSION)
+
+        self.match.last_login = timezone.now()
+        self.match.save(update_fields=['last_login'])
+        self.assertEqual(get_version(USERS_VERSION), version)
+
+        self.match.first_name = "Annie"
+        self.match.save(update_fields=['first_name'])
+        self.assertNotEqual(get_version(USERS_VERSION), version)
+
+    @mock.patch.object(Config, 'user_search_candidates', 50)
+    def test_postgres_ranks_a_bounded_candidate_set(self):
+        # Compiled for Postgres without connecting to one
+        postgres = PostgresDatabaseWrapper(
+            {**connection.settings_dict, "ENGINE": "django.db.backends.postgresql"}, "postgres"
+        )
+        with mock.patch('social.search.full_text_search_available', return_value=True):
+            queryset = search._rank_users(search._user_matches("ann", "istartswith"), "ann")
+        sql, _ = queryset.query.get_compiler(connection=postgres).as_sql()
+
+        candidates = sql[sql.index("IN (SELECT"):sql.index("LIMIT 50)")]
+        self.assertIn('UPPER(U0."username") %%> (%s)', candidates)
+        self.assertNotIn("ORDER BY", candidates)
+        self.assertIn("WORD_SIMILARITY", sql)
+
+
+class RendererTests(SocialStackTestCase):
+    """
+    orjson, stdlib and msgpack output carry the same values, datetimes included.
+    """
+
+    def payload(self):
+        # In the current time zone, as the projections emit it
+        created_at = timezone.localtime()
+        return created_at, {
+            "socialPosts": [{"id": 1, "created_at_str": created_at, "post_desc": "h\u00e9llo"}],
+            "users": {1: {"id": 1}},
+        }
+
+    def test_json_matches_stdlib_encoding(self):
+        created_at, payload = self.payload()
+        rendered = json.loads(FastJSONRenderer().render(payload))
+
+        self.assertEqual(rendered, json.loads(json.dumps(payload, cls=encoders.JSONEncoder)))
+        self.assertEqual(
+            rendered["socialPosts"][0]["created_at_str"], DateTimeField().to_representation(created_at)
+        )
+
+    def test_msgpack_matches_json(self):
+        _, payload = self.payload()
+        unpacked = msgpack.unpackb(MessagePackRenderer().render(payload), strict_map_key=False)
+
+        self.assertEqual(
+            json.loads(json.dumps(unpacked)), json.loads(FastJSONRenderer().render(payload))
+        )
+
+    def test_feed_negotiates_msgpack(self):
+        viewer = User.objects.create(username="viewer")
+        models.UserPost.objects.create(user=viewer, post_desc="post")
+        client = self.api_client(viewer)
+
+        response = client.get('/social/posts/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(response.content, MessagePackRenderer().render(response.data))
+
+
+@mock.patch.object(Config, 'compression_min_size', 200)
+class CompressionTests(SocialStackTestCase):
+    """
+    API responses are compressed as negotiated, above the size threshold only.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.viewer = User.objects.create(username="viewer")
+        for index in range(10):
+            models.UserPost.objects.create(user=cls.viewer, post_desc=f"post {index}")
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.api_client(self.viewer)
+
+    def test_gzip_feed_round_trips(self):
+        plain = self.client.get('/social/posts/')
+        response = self.client.get('/social/posts/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertLess(len(response.content), len(plain.content))
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    def test_small_and_unaccepted_bodies_are_not_compressed(self):
+        response = self.client.get('/social/posts/', HTTP_ACCEPT_ENCODING='identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+        with mock.patch.object(Config, 'compression_min_size', 10 ** 6):
+            response = self.client.get('/social/posts/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_encoding_negotiation(self):
+        self.assertEqual(choose_encoding('gzip;q=0.5, br;q=0'), 'gzip')
+        self.assertEqual(choose_encoding('*;q=0'), None)
+        self.assertEqual(choose_encoding(''), None)
+
+    @mock.patch.object(Config, 'metrics_flush_interval', 3600)
+    def test_counters_are_flushed_in_batches(self):
+        with mock.patch.object(metrics, 'buffered', metrics.CounterBuffer()):
+            plain = self.client.get('/social/posts/')
+            with mock.patch.object(metrics, 'incr') as incr:
+                for _ in range(3):
+                    response = self.client.get('/social/posts/', HTTP_ACCEPT_ENCODING='gzip')
+            incr.assert_not_called()
+
+            metrics.buffered.flush()
+
+        self.assertEqual(metrics.get("compression.responses"), 3)
+        self.assertEqual(metrics.get("compression.bytes_in"), 3 * len(plain.content))
+        output = io.StringIO()
+        call_command('show_metrics', stdout=output, stderr=io.StringIO())
+        ratio = round(len(plain.content) / len(response.content), 2)
+        self.assertIn(f"compression.ratio            {ratio}", output.getvalue())
+
+
+class GenerateDatasetTests(SocialStackTestCase):
+    """
+    generate_dataset is deterministic per seed and keeps the denormalized counters right.
+    """
+
+    def generate(self, prefix, seed=1):
+        call_command(
+            'generate_dataset', users=30, posts=60, likes_per_post=4, comments_per_post=2,
+            seed=seed, prefix=prefix, until='2026-01-01', stdout=io.StringIO()
+        )
+        posts = models.UserPost.objects.filter(user__username__startswith=prefix).order_by('id')
+        return [
+            (post.user.username[len(prefix):], post.post_desc, post.created_at, post.likes_count,
+             post.comments_count, post.postlike_set.count(), post.comments.count())
+            for post in posts.select_related('user')
+        ]
+
+    def test_same_seed_same_data(self):
+        first = self.generate("a_")
+        self.assertEqual(len(first), 60)
+        self.assertEqual(first, self.generate("b_"))
+        self.assertNotEqual(first, self.generate("c_", seed=2))
+
+        for _, _, _, likes_count, comments_count, likes, comments in first:
+            self.assertEqual((likes_count, comments_count), (likes, comments))
+        self.assertLess(max(row[3] for row in first), 31)
+
+
+class RunBenchmarksTests(SocialStackTestCase):
+    """
+    run_benchmarks writes machine-readable results and fails on regressions against a baseline.
+    """
+    databases = {'default', 'benchmark'}
+
+    def run_benchmarks(self, database='benchmark', **options):
+        call_command(
+            'run_benchmarks', database=database, sizes=[50], repeat=2, warmup=0,
+            scenarios=['feed', 'like'], stdout=io.StringIO(), **options
+        )
+
+    def test_refuses_the_production_database(self):
+        for database in (None, 'default', 'missing'):
+            with self.assertRaises(CommandError):
+                self.run_benchmarks(database=database)
+
+    def test_results_and_baseline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = f"{directory}/results.json"
+            self.run_benchmarks(output=output)
+            with open(output) as results_file:
+                results = json.load(results_file)["results"]["50"]
+
+            self.assertEqual(set(results), {"feed", "like"})
+            self.assertTrue(all(key in results["feed"] for key in ("p50_ms", "p95_ms", "queries", "peak_memory_kb")))
+            self.assertFalse(models.UserPost.objects.using('benchmark').exists())
+            self.assertFalse(User.objects.filter(username__startswith="bench_").exists())
+
+            # The same run passes against itself once timing noise is tolerated
+            self.run_benchmarks(baseline=output, latency_tolerance=100, memory_tolerance=1)
+
+            results["like"]["queries"] -= 1
+            with open(output, "w") as baseline_file:
+                json.dump({"results": {"50": results}}, baseline_file)
+            with self.assertRaises(CommandError):
+                self.run_benchmarks(baseline=output, latency_tolerance=100, memory_tolerance=1)
+
+
+@mock.patch.object(Config, 'image_uploader', 'accounts.uploaders.local_upload')
+@mock.patch.object(Config, 'image_process_workers', 0)
+class PostImageUploadTests(SocialStackTestCase):
+    """
+    Post images go through the job queue: enqueued with the post, uploaded
+    by the worker with local_upload, or marked failed once out of attempts.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.author = User.objects.create(username="author")
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media = override_settings(MEDIA_ROOT=directory.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.client = self.api_client(self.author)
+
+    def create_post(self):
+        image = io.BytesIO()
+        Image.new("RGB", (120, 80), "orange").save(image, format="PNG")
+        response = self.client.post('/social/posts/', {
+            "desc": "with image", "imageUrl": SimpleUploadedFile("photo.png", image.getvalue()),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        post = models.UserPost.objects.get(post_desc="with image")
+        self.assertEqual((post.imageurl, post.image_status), (None, IMAGE_STATUS_PENDING))
+        self.assertEqual(Job.objects.get().name, "upload_post_image")
+        return post
+
+    def test_worker_uploads_the_image(self):
+        post = self.create_post()
+
+        self.assertEqual(run_pending(), 1)
+
+        post.refresh_from_db()
+        self.assertEqual(post.image_status, IMAGE_STATUS_READY)
+        self.assertIn("/media/user_posts/", post.imageurl)
+        name = post.imageurl.split("/media/", 1)[1]
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(default_storage.listdir(Config.upload_staging_dir)[1], [])
+        self.assertEqual(Job.objects.get().status, Job.STATUS_DONE)
+
+    @mock.patch.object(Config, 'jobs_max_attempts', 1)
+    def test_failed_upload_marks_the_post(self):
+        post = self.create_post()
+
+        with mock.patch('accounts.uploaders.local_upload', side_effect=OSError("storage down")), \
+                self.assertLogs('jobs.queue', level='ERROR'):
+            self.assertEqual(run_pending(), 1)
+
+        post.refresh_from_db()
+        self.assertEqual((post.imageurl, post.image_status), (None, IMAGE_STATUS_FAILED))
+        self.assertEqual(default_storage.listdir(Config.upload_staging_dir)[1], [])
+        self.assertEqual(Job.objects.get().status, Job.STATUS_FAILED)
+
+
+class SQLiteMigrationTests(TransactionTestCase):
+    """
+    The Postgres-only indexes and extension stay out of the way of SQLite migrations,
+    including the table rebuilds of later AddField/AlterField operations.
+    """
+
+    def migrate(self, *args):
+        call_command('migrate', *args, verbosity=0, stdout=io.StringIO())
+
+    def index_names(self, table):
+        with connection.cursor() as cursor:
+            return set(connection.introspection.get_constraints(cursor, table))
+
+    def test_migrations_round_trip(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("SQLite only")
+        self.migrate('social', '0005')
+        self.migrate('accounts', '0009')
+        self.migrate()
+
+        self.assertNotIn('userpost_post_desc_fts', self.index_names(models.UserPost._meta.db_table))
+        self.assertFalse({'user_username_trgm', 'user_first_name_trgm', 'user_last_name_trgm'}
+                         & self.index_names(User._meta.db_table))
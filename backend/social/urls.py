@@ -6,6 +6,11 @@ urlpatterns = [
     path('dashboard/<int:id>/', views.UserDashboard.as_view(), name='user_dashboard_with_id'),
     path('dashboard/', views.UserDashboard.as_view(), name='user_dashboard'),
     path('like/<int:id>/', views.PostsLike.as_view(), name='like_post'),
+    path('likes/batch/', views.PostsLikeBatch.as_view(), name='like_posts_batch'),
     path('comment/<int:id>/', views.PostsComment.as_view(), name='comment_post'),
+    path('comment/<int:id>/like/', views.CommentsLike.as_view(), name='like_comment'),
     path('search/<str:search_text>/', views.SearchUsersPosts.as_view(), name='search_users_posts'),
+    path('users/autocomplete/', views.UserAutocomplete.as_view(), name='user_autocomplete'),
+    path('events/', views.feed_events, name='feed_events'),
+    path('events/ticket/', views.EventStreamTicket.as_view(), name='feed_events_ticket'),
 ]
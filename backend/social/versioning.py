@@ -0,0 +1,13 @@
+from rest_framework.versioning import QueryParameterVersioning
+
+
+class FeedVersioning(QueryParameterVersioning):
+    """
+    Selects the feed payload shape with `?version=`.
+
+    Version 1 (default) is the original shape; version 2 is the compact shape
+    where posts and comments reference user_id and authors are sideloaded.
+    """
+    default_version = '1'
+    allowed_versions = ('1', '2')
+    compact_version = '2'
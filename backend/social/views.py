@@ -1,34 +1,39 @@
+import asyncio
+import time
+from accounts.authentication import CachedJWTAuthentication
 from accounts.models import User
-from collections import defaultdict, OrderedDict
+from accounts.tokens import current_profile_version
+from collections import defaultdict
 from configuration import Config
-from django.db.models.functions import Coalesce
-from django.db.models import Count, Value, Case, When, BooleanField, Q
+from django.db.models.functions import RowNumber
+from django.core.cache import cache
+from django.db.models import F, Window
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
 from rest_framework import permissions, generics
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from social import serializers, models
+from SocialStack.conditional import conditional_response
+from social import events, like_buffer, models, projections, serializers
+from social.cache import autocomplete_cache_key, feed_etag, feed_page_cache_key
+from social.pagination import KeysetCommentPagination, get_post_paginator
+from social.search import SEARCH_ORDER_RECENT, autocomplete_users, search_posts, search_users
+from social.versioning import FeedVersioning
 
 def get_public_posts_queryset(request, search=None):
     """
-    Builds the base queryset for public posts with annotations for likes
-    and ownership flags.
-    """
-    base_queryset = models.UserPost.objects.annotate(
-        # Ensures likes_count is 0 instead of None
-        likes_count=Coalesce(Count('likes', distinct=True), Value(0)),
-        # Helper boolean to identify if the post belongs to the requesting user
-        same_user=Case(
-            When(user__username=request.user.username, then=Value(True)),
-            default=Value(False),
-            output_field=BooleanField()
-        )
-    ).select_related('user').prefetch_related('comments__user', 'likes')
+    Builds the base queryset for public posts. Viewer-specific flags
+    (same_user, is_liked) are overlaid per request after pagination.
+    """
+    # likes_count is a denormalized column, so no per-request aggregation is needed
+    base_queryset = models.UserPost.objects.select_related('user')
 
-    # Apply search filter if search_text is provided
-    return base_queryset.filter(post_desc__icontains=search) if search else base_queryset
+    # Apply search filter if search_text is provided; `?order=relevance` ranks matches
+    if search:
+        order = request.query_params.get('order', SEARCH_ORDER_RECENT)
+        return search_posts(base_queryset, search, order)
+    return base_queryset
 
 def get_user_dashboard_queryset(request, user_id=None):
     """
@@ -39,16 +44,7 @@ def get_user_dashboard_queryset(request, user_id=None):
     else:
         filters = {"user": request.user}
 
-    return models.UserPost.objects.filter(
-        **filters
-    ).annotate(
-        likes_count=Coalesce(Count('likes', distinct=True), Value(0)),
-        same_user=Case(
-            When(user__username=request.user.username, then=Value(True)),
-            default=Value(False),
-            output_field=BooleanField()
-        )
-    ).select_related('user').prefetch_related('comments__user', 'likes')
+    return models.UserPost.objects.filter(**filters).select_related('user')
 
 def get_dashboard_information(request, user_id=None):
     """
@@ -65,19 +61,69 @@ def get_dashboard_information(request, user_id=None):
         "gender": user.gender
     }
 
-def build_paginated_posts_response(request, queryset, response_data=None):
+def build_posts_page(request, paginator, queryset):
     """
-    Handles the heavy lifting of pagination, including manual hydration
-    of 'is_liked' status and nested comments for the current page.
+    Paginates and renders the user-independent part of a posts page:
+    pagination metadata, posts and their latest comments.
     """
-    if response_data is None:
-        response_data = {}
+    # Rows are projected straight from values_list() tuples; see social.projections
+    paginated_posts_response = paginator.paginate_queryset(
+        projections.post_rows(queryset), request
+    )
+    post_ids = [post.id for post in paginated_posts_response]
 
-    paginator = CustomPostPagination()
-    paginated_posts_response = paginator.paginate_queryset(queryset, request)
+    # Fetch only the latest comments of every post on the page in one query.
+    # ROW_NUMBER() restarts per post, so a viral post can't inflate the page.
+    page_comments = list(projections.comment_rows(
+        models.UserComment.objects.filter(
+            post__id__in=post_ids
+        ).annotate(
+            post_row_number=Window(
+                expression=RowNumber(),
+                partition_by=[F('post_id')],
+                order_by=[F('created_at').desc(), F('id').desc()]
+            )
+        ).filter(
+            post_row_number__lte=Config.comments_per_post
+        ).order_by('-created_at')
+    ))
 
-    # Extract IDs to optimize subsequent lookups for likes and comments
-    post_ids = [post.id for post in paginated_posts_response]
+    if request.version == FeedVersioning.compact_version:
+        payload = projections.compact_posts_payload(paginated_posts_response, page_comments)
+    else:
+        payload = projections.full_posts_payload(paginated_posts_response, page_comments)
+
+    response = {
+        "socialPosts": payload.pop("socialPosts"),
+        "userLikedPosts": [],
+        **payload
+    }
+    return paginator.get_paginated_response(response).data
+
+def liked_comment_ids(user, comment_ids):
+    """
+    The subset of `comment_ids` the user has liked, in one query (none for an empty page).
+    """
+    if not comment_ids:
+        return set()
+    return set(
+        models.CommentLike.objects.filter(
+            user=user, comment_id__in=comment_ids
+        ).values_list('comment_id', flat=True)
+    )
+
+def apply_viewer_overlay(request, page_data):
+    """
+    Fills in the per-user fields of a rendered page: is_liked, same_user
+    and userLikedPosts, using a single PostLike lookup, and is_liked of the
+    embedded comments with a single CommentLike lookup.
+
+    With the write-behind like buffer on, buffered intents and pending
+    likes_count deltas are applied on top (one cache round trip).
+    """
+    results = page_data['results']
+    posts = results['socialPosts']
+    post_ids = [post['id'] for post in posts]
 
     # Batch check which posts the current user has liked
     liked_posts = list(
@@ -87,89 +133,72 @@ def build_paginated_posts_response(request, queryset, response_data=None):
         ).values_list('post__id', flat=True)
     )
 
-    # Inject the is_liked status into the model instances before serialization
-    for post in paginated_posts_response:
-        post.is_liked = post.id in liked_posts
-
-    # Fetch all relevant comments in one query to avoid N+1 issues
-    comments_qs = models.UserComment.objects.filter(
-        post__id__in=post_ids
-    ).select_related(
-        'user'
-    ).order_by('-created_at')
-
-    # Group comments by post_id using a dictionary
-    comments_dict = defaultdict(list)
-    comment_serializer = serializers.CommentSerializer(comments_qs, many=True)
-    for comment_data in comment_serializer.data:
-        comments_dict[comment_data['post_id']].append(comment_data)
-
-    serializer = serializers.PostSerializer(paginated_posts_response, many=True)
-
-    # Attach the grouped comments to each post object
-    posts_with_comments = []
-    for post_data in serializer.data:
-        post_data['comments'] = comments_dict.get(post_data['id'], [])
-        posts_with_comments.append(post_data)
-
-    response = {
-        "socialPosts": posts_with_comments,
-        "userLikedPosts": liked_posts,
-        "userComments": dict(comments_dict)
-    }
-
-    return paginator.get_paginated_response(response | response_data)
-
-
-class CustomPostPagination(PageNumberPagination):
+    liked_post_ids = set(liked_posts)
+    if like_buffer.enabled():
+        intents, deltas = like_buffer.pending_state(request.user.id, post_ids)
+        for post_id, liked in intents.items():
+            if liked:
+                liked_post_ids.add(post_id)
+            else:
+                liked_post_ids.discard(post_id)
+        liked_posts = [post_id for post_id in post_ids if post_id in liked_post_ids]
+        for post in posts:
+            if post['id'] in deltas:
+                post['likes_count'] = max(post['likes_count'] + deltas[post['id']], 0)
+
+    for post in posts:
+        post['same_user'] = int(post['user_id']) == request.user.id
+        post['is_liked'] = post['id'] in liked_post_ids
+
+    # Comments are nested in posts (and also grouped under userComments in v1)
+    comments = [comment for post in posts for comment in post['comments']]
+    for post_comments in results.get('userComments', {}).values():
+        comments.extend(post_comments)
+    liked_comments = liked_comment_ids(request.user, {comment['id'] for comment in comments})
+    for comment in comments:
+        comment['is_liked'] = comment['id'] in liked_comments
+
+    results['userLikedPosts'] = liked_posts
+    return page_data
+
+def build_paginated_posts_response(request, queryset, response_data=None, cache_pages=False):
     """
-    Custom paginator that provides a full list of page URLs and total page counts.
+    Handles the heavy lifting of pagination, including manual hydration
+    of 'is_liked' status and nested comments for the current page.
+    Page-number pagination is used unless the request opts into cursor mode,
+    and `?version=2` switches to the compact payload with sideloaded users.
+
+    With cache_pages, the user-independent page is shared between users
+    through the cache and only the viewer overlay is computed per request.
     """
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = int(Config.posts_per_page)
+    if response_data is None:
+        response_data = {}
 
-    def get_paginated_response(self, data):
-        total_pages = self.page.paginator.num_pages
-        current_page = self.page.number
+    paginator = get_post_paginator(request)
 
-        # Build list of metadata for each page available
-        page_urls = []
-        for page_num in range(1, total_pages + 1):
-            url = self.request.build_absolute_uri()
+    cache_key = None
+    page_data = None
+    if cache_pages and Config.feed_cache_ttl > 0:
+        cache_key = feed_page_cache_key(request)
+        page_data = cache.get(cache_key)
 
-            if '?' in url:
-                base_url = url.split('?')[0]
-                query_params = self.request.GET.copy()
-                query_params['page'] = page_num
-                page_url = f"{base_url}?{query_params.urlencode()}"
-            else:
-                page_url = f"{url}?page={page_num}"
-
-            page_urls.append({
-                'page': page_num,
-                'url': page_url,
-                'is_current': page_num == current_page
-            })
-
-        return Response(OrderedDict([
-            ('count', self.page.paginator.count),
-            ('total_pages', total_pages),
-            ('current_page', current_page),
-            ('page_size', self.page_size),
-            ('next', self.get_next_link()),
-            ('previous', self.get_previous_link()),
-            ('pages', page_urls),
-            ('results', data)
-        ]))
+    if page_data is None:
+        page_data = build_posts_page(request, paginator, queryset)
+        if cache_key:
+            cache.set(cache_key, page_data, Config.feed_cache_ttl)
+
+    apply_viewer_overlay(request, page_data)
+    page_data['results'].update(response_data)
+    return Response(page_data)
 
 
 class SocialPostsAPIView(generics.ListCreateAPIView):
     """
     Main feed API for viewing, creating, updating, and deleting posts.
     """
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    versioning_class = FeedVersioning
 
     def get_serializer_class(self):
         # Dynamically switch serializers based on the HTTP method
@@ -187,7 +216,12 @@ class SocialPostsAPIView(generics.ListCreateAPIView):
         response_data = {
             "permissionToDelete": request.user.is_admin
         }
-        return build_paginated_posts_response(request, queryset, response_data)
+        # The global feed is the same for everyone, so its pages are shared via the cache
+        return conditional_response(
+            request,
+            feed_etag(request, "feed"),
+            lambda: build_paginated_posts_response(request, queryset, response_data, cache_pages=True)
+        )
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer_class()(
@@ -204,6 +238,7 @@ class SocialPostsAPIView(generics.ListCreateAPIView):
                         "id": post.id,
                         "post_desc": post.post_desc,
                         "imageurl": post.imageurl if post.imageurl else None,
+                        "image_status": post.image_status,
                         "created_at": post.created_at
                     }
                 },
@@ -250,7 +285,8 @@ class SocialPostsAPIView(generics.ListCreateAPIView):
 
         post.post_desc = edited_comment
         post.editedPost = True
-        post.save()
+        # Only the edited columns: a full save would write back stale likes_count/comments_count
+        post.save(update_fields=['post_desc', 'editedPost', 'updated_at'])
 
         return Response(
             {
@@ -301,10 +337,20 @@ class UserDashboard(APIView):
     """
     API endpoint to retrieve posts and profile info for a specific user's dashboard.
     """
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    versioning_class = FeedVersioning
 
     def get(self, request, id=None):
+        # userDashboardInformation shows fields (email) whose edits leave the
+        # feed version alone; every profile edit bumps the user's profile_version
+        profile_version = current_profile_version(id or request.user.id)
+        return conditional_response(
+            request, feed_etag(request, "dashboard", profile_version),
+            lambda: self.build_response(request, id)
+        )
+
+    def build_response(self, request, id):
         queryset = get_user_dashboard_queryset(request, id)
         queryset = queryset.order_by('-created_at')
 
@@ -320,41 +366,103 @@ class PostsLike(APIView):
     """
     Handles toggling a like on a specific post.
     """
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
-    queryset = models.UserPost.objects.all()
 
     def post(self, request, id):
-        post_data = request.data
-        post = self.queryset.filter(id=id).first()
+        liked = bool(request.data.get("liked", False))
 
-        if not post:
+        if like_buffer.enabled():
+            # Write-behind: recorded in the cache, written by flush_like_buffer
+            result = like_buffer.record_likes(request.user, [(id, liked)]).get(id)
+        else:
+            # One idempotent statement: the PostLike row and likes_count change together
+            result = models.UserPost.set_like(id, request.user, liked)
+        if result is None:
             return Response({"error": "Post not found"}, status=Config.not_found)
 
-        # Logic to add or remove user from the ManyToMany 'likes' field
-        if post_data.get("liked", False):
-            post.likes.add(request.user)
+        _, likes_count = result
+        return Response({"liked": liked, "likes_count": likes_count}, status=Config.success)
+
+
+class PostsLikeBatch(APIView):
+    """
+    Applies a list of queued {post_id, liked} actions (e.g. replayed by an
+    offline client) in one request and one transaction.
+
+    Every entry reports the outcome of its own action, so a post may only
+    appear once; clients send the last queued action per post. Batches
+    with repeated posts are rejected with 400.
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = serializers.LikeOperationSerializer(
+            data=request.data, many=True, max_length=Config.likes_batch_max_size
+        )
+        if not serializer.is_valid():
+            return Response(
+                {"error": "Invalid like operations", "details": serializer.errors},
+                status=Config.bad_request
+            )
+
+        operations = [(item["post_id"], item["liked"]) for item in serializer.validated_data]
+        if like_buffer.enabled():
+            applied = like_buffer.record_likes(request.user, operations)
         else:
-            post.likes.remove(request.user)
+            applied = models.UserPost.set_likes(request.user, operations)
 
-        post.save()
-        return Response(status=Config.success)
+        results = []
+        for post_id, _ in operations:
+            if post_id in applied:
+                liked, likes_count = applied[post_id]
+                results.append({"post_id": post_id, "status": "ok", "liked": liked, "likes_count": likes_count})
+            else:
+                results.append({"post_id": post_id, "status": "not_found"})
+
+        return Response({"results": results}, status=Config.success)
 
 
 class PostsComment(APIView):
     """
-    Handles creating a new comment on a specific post.
+    Handles listing and creating comments on a specific post.
     """
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
+    def get(self, request, id):
+        """
+        Pages through a post's comments, newest first, using a (created_at, id)
+        cursor served by the (post, -created_at) index.
+        """
+        post_instance = get_object_or_404(models.UserPost, id=id)
+        queryset = models.UserComment.objects.filter(
+            post=post_instance
+        ).select_related('user')
+
+        paginator = KeysetCommentPagination()
+        comments = paginator.paginate_queryset(queryset, request, view=self)
+        liked_comments = liked_comment_ids(request.user, [comment.id for comment in comments])
+        for comment in comments:
+            comment.is_liked = comment.id in liked_comments
+        serializer = serializers.CommentSerializer(comments, many=True)
+
+        return paginator.get_paginated_response({
+            "comments": serializer.data,
+            "commentsCount": post_instance.comments_count
+        })
+
     def post(self, request, id):
         post_instance = get_object_or_404(models.UserPost, id=id)
         serializer = serializers.CommentSerializer(data=request.data)
 
         if serializer.is_valid():
-            # Injecting user and post relationship during save
-            serializer.save(user=request.user, post=post_instance)
+            # Injecting user and post relationship during save; comments_count is bumped with it
+            serializer.instance = post_instance.add_comment(
+                user=request.user,
+                **serializer.validated_data
+            )
 
             return Response(
                 {
@@ -370,28 +478,36 @@ class PostsComment(APIView):
         )
 
 
+class CommentsLike(APIView):
+    """
+    Handles liking/unliking a specific comment.
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, id):
+        liked = bool(request.data.get("liked", False))
+
+        # Same idempotent single-statement path as post likes
+        result = models.UserComment.set_like(id, request.user, liked)
+        if result is None:
+            return Response({"error": "Comment not found"}, status=Config.not_found)
+
+        _, likes_count = result
+        return Response({"liked": liked, "likes_count": likes_count}, status=Config.success)
+
+
 class SearchUsersPosts(APIView):
     """
     Unified search endpoint that returns both matching users and matching posts.
     """
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    versioning_class = FeedVersioning
 
     def get_users_queryset(self, search_text):
         """Finds up to 10 users whose name or username matches the search string."""
-        default_image = ""
-        users = list(
-            User.objects.filter(
-                Q(username__icontains=search_text) |
-                Q(first_name__icontains=search_text) |
-                Q(last_name__icontains=search_text)
-            ).annotate(
-                imageUrl=Coalesce('profile_image', Value(default_image))
-            ).values(
-                "id", "first_name", "last_name", "username", "imageUrl", "gender"
-            )
-        )
-        return users
+        return search_users(search_text, limit=10)
 
     def get(self, request, search_text):
         # Validate and return search results
@@ -403,8 +519,8 @@ class SearchUsersPosts(APIView):
         """Aggregates user search results and paginated post search results."""
         users = self.get_users_queryset(search_text)
 
+        # Ordering (recency or relevance) is applied by the search itself
         queryset = get_public_posts_queryset(self.request, search_text)
-        queryset = queryset.order_by('-created_at')
 
         # Reuse the existing pagination logic
         posts_response = build_paginated_posts_response(self.request, queryset)
@@ -413,4 +529,94 @@ class SearchUsersPosts(APIView):
         return {
             "users": users,
             "posts": posts
-        }
\ No newline at end of file
+        }
+
+
+class UserAutocomplete(APIView):
+    """
+    Typeahead endpoint returning a handful of users by username/name prefix.
+
+    Results depend only on the prefix, so they are cached per prefix and
+    the response may be reused by the client for a short time. Prefixes
+    shorter than AUTOCOMPLETE_MIN_LENGTH return nothing: the trigram
+    indexes cannot serve them, and they would scan the whole user table.
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        prefix = request.query_params.get("q", "").strip()
+        if len(prefix) < Config.autocomplete_min_length:
+            return Response({"users": []}, status=Config.success)
+
+        cache_key = autocomplete_cache_key(prefix)
+        users = cache.get(cache_key)
+        if users is None:
+            users = autocomplete_users(prefix, limit=Config.autocomplete_limit)
+            cache.set(cache_key, users, Config.autocomplete_cache_ttl)
+
+        response = Response({"users": users}, status=Config.success)
+        patch_cache_control(response, private=True, max_age=Config.autocomplete_cache_ttl)
+        return response
+
+
+class EventStreamTicket(APIView):
+    """
+    Issues a single-use ticket for opening social/events/ with EventSource,
+    which cannot send the Authorization header.
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        ticket = events.issue_stream_ticket(request.user.id)
+        return Response({"ticket": ticket, "expires_in": Config.events_ticket_ttl}, status=Config.success)
+
+
+async def stream_feed_events():
+    """
+    Yields SSE messages until Config.events_max_duration passes; the client
+    then reconnects with a fresh ticket.
+    """
+    layer = events.get_channel_layer()
+    subscription = layer.subscribe()
+    deadline = time.time() + Config.events_max_duration
+    try:
+        yield f"retry: {Config.events_retry_ms}\n\n"
+        while time.time() < deadline:
+            timeout = min(Config.events_heartbeat, max(deadline - time.time(), 0))
+            try:
+                event = await subscription.get(timeout)
+            except asyncio.TimeoutError:
+                # Comment line; keeps proxies from closing idle connections
+                yield ": keepalive\n\n"
+                continue
+            yield events.format_sse(event)
+    finally:
+        layer.unsubscribe(subscription)
+
+
+async def feed_events(request):
+    """
+    Server-Sent Events stream of feed changes (new posts, like counts,
+    comments) that replaces polling social/posts/.
+
+    Opened with `?ticket=` from social/events/ticket/. Redeeming it only
+    touches the cache, so an open stream holds no database connection.
+    """
+    # require_GET does not wrap coroutine views on Django 4.2
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    user_id = await events.redeem_stream_ticket(request.GET.get('ticket'))
+    if user_id is None:
+        return JsonResponse({"error": "A valid stream ticket is required"}, status=Config.unauthorized)
+
+    response = StreamingHttpResponse(
+        stream_feed_events(),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Disable response buffering in nginx-style proxies
+    response['X-Accel-Buffering'] = 'no'
+    return response